@@ -11,29 +11,62 @@ import shutil
 import subprocess
 import tempfile
 import string
-from typing import Dict, List, Optional, Tuple
+import time
+from collections import Counter, deque
+from itertools import repeat
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
 from io import StringIO
 from pathlib import Path
 
 import ezdxf
+from ezdxf.addons import iterdxf
+from ezdxf import recover
 from colorama import Fore, Style
 import logging
 
 from semanticMemory import (
-    collection, generate_embedding_id, file_exists_in_database,
+    collection, generate_embedding_id, get_stored_metadata,
     default_ef
 )
-from utils import grok_client, openai_client
-from config import ENABLE_DWG_CONVERSION
+from utils import grok_client, openai_client, grok_complete, openai_complete
+from config import (
+    ENABLE_DWG_CONVERSION, DWG_STREAMING_THRESHOLD_MB, DWG_WORKERS, DWG_FILE_TIMEOUT, DWG_LAYOUT_WORKERS,
+    ENABLE_EXTRACTION_CACHE, ODA_BATCH_SIZE, ODA_TIMEOUT_PER_FILE, ODA_CONVERTER_PATH,
+    ODA_CACHE_FILE, DWG_INDEX_MODE, DWG_EXTRACT_WORKERS, DWG_PARALLEL_THRESHOLD_MB,
+    DWG_SAMPLE_THRESHOLD_MB, DWG_SAMPLE_MEMORY_MB, DWG_NEAR_DUPLICATE_THRESHOLD, ODA_MAX_CONCURRENCY
+)
+from dxfScanner import is_ascii_dxf, scan_dxf_structure
+from conversionService import STATUS_CONVERTED, STATUS_TIMEOUT, ConversionService
+from drawingProbe import FORMAT_BINARY_DXF, FORMAT_DWG, FORMAT_DXF, detect_format
+from entityStore import EntityStore, as_entity_store
+from extractionCache import ExtractionCache, extraction_cache
+from llmCache import llm_cache
+import drawingStore
+from blockLibrary import referenced_blocks
+from spatialIndex import save_drawing_index
+from entityTable import load_entity_table, save_entity_table
+from geometryStore import save_drawing_geometry
+from entityHandlers import ENTITY_HANDLERS, collect_entities, extract_entities, extract_entity
+from dxfPartition import extract_partition, partition_entities_section
+from streamingSummary import StreamingSummary, summarize_entities
+from entityFingerprint import compute_delta, fingerprint_entities, load_fingerprints, save_fingerprints
+from nearDuplicate import drawing_signature, find_near_duplicates, save_signature
 
 # Silence noisy ezdxf logging
 logging.getLogger("ezdxf").setLevel(logging.ERROR)
 
 def find_oda_converter() -> Optional[str]:
     """
-    Automatically search for ODA File Converter across all drives and common paths.
+    Automatically search for ODA File Converter on PATH, across all drives and common paths.
     Returns path if found, None otherwise.
     """
+    # Installed on PATH (the Linux package links /usr/bin/ODAFileConverter)
+    for command in ("ODAFileConverter", "ODAFileConverter.exe"):
+        found = shutil.which(command)
+        if found:
+            return found
+    
     # Common installation folder names
     search_dirs = [
         "ODA",
@@ -76,81 +109,271 @@ def find_oda_converter() -> Optional[str]:
     
     return None
 
-# Find ODA File Converter automatically
-ODA_CONVERTER_PATH = find_oda_converter()
-DWG_CONVERSION_AVAILABLE = ENABLE_DWG_CONVERSION and ODA_CONVERTER_PATH is not None
+
+def _file_stamp(path: str) -> Optional[Dict]:
+    """Path, size and modification time used to check a remembered converter location."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _load_cached_oda_path() -> Optional[str]:
+    """Converter path saved by an earlier search, if that file is still unchanged."""
+    try:
+        with open(ODA_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or not cached.get('path'):
+        return None
+    return cached['path'] if _file_stamp(cached['path']) == cached else None
+
+
+def _save_cached_oda_path(path: str) -> None:
+    stamp = _file_stamp(path)
+    if not stamp:
+        return
+    try:
+        with open(ODA_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(stamp, f, indent=2)
+    except OSError:
+        pass
+
+
+# Resolved on first use by get_oda_converter_path(); a miss is only remembered for
+# ODA_LOOKUP_RETRY_SECONDS, so a converter installed later is still picked up
+_oda_converter_path: Optional[str] = None
+_oda_lookup_done = False
+_oda_missed_at: Optional[float] = None
+ODA_LOOKUP_RETRY_SECONDS = 60
+
+
+def get_oda_converter_path() -> Optional[str]:
+    """
+    Locate ODA File Converter the first time a DWG needs converting.
+    
+    Uses the ODA_CONVERTER_PATH setting when given (a file path or a command on
+    PATH); otherwise the location remembered in ODA_CACHE_FILE if the executable
+    is unchanged, and only then the full search of find_oda_converter(), whose
+    result is saved for later runs. A found path is kept for the life of the
+    process; when nothing is found the lookup is repeated after ODA_LOOKUP_RETRY_SECONDS.
+    """
+    global _oda_converter_path, _oda_lookup_done, _oda_missed_at
+    if _oda_lookup_done:
+        return _oda_converter_path
+    if _oda_missed_at is not None and time.monotonic() - _oda_missed_at < ODA_LOOKUP_RETRY_SECONDS:
+        return None
+    
+    if ODA_CONVERTER_PATH:
+        if os.path.isfile(ODA_CONVERTER_PATH):
+            path = ODA_CONVERTER_PATH
+        else:
+            path = shutil.which(ODA_CONVERTER_PATH)
+    else:
+        path = _load_cached_oda_path()
+        if not path:
+            path = find_oda_converter()
+            if path:
+                _save_cached_oda_path(path)
+    
+    _oda_converter_path = path
+    _oda_lookup_done = bool(path)
+    _oda_missed_at = None if path else time.monotonic()
+    return path
+
+
+def is_dwg_conversion_available() -> bool:
+    """True if DWG conversion is enabled and ODA File Converter can be found."""
+    return ENABLE_DWG_CONVERSION and get_oda_converter_path() is not None
+
+
+# Shared by every DWGProcessor of this process, created on first use by get_conversion_service()
+_conversion_service: Optional[ConversionService] = None
+
+
+def get_conversion_service() -> ConversionService:
+    """
+    The process-wide DWG conversion service: at most ODA_MAX_CONCURRENCY converter
+    processes at once, each limited to ODA_TIMEOUT_PER_FILE seconds.
+    """
+    global _conversion_service
+    if _conversion_service is None:
+        # Looked up per job, so a converter installed later is picked up (see get_oda_converter_path)
+        _conversion_service = ConversionService(lambda: get_oda_converter_path(),
+                                                max_workers=ODA_MAX_CONCURRENCY,
+                                                timeout=ODA_TIMEOUT_PER_FILE)
+    return _conversion_service
+
+
+# 'full' loads the whole document, 'streaming' reads modelspace entities one at a time,
+# 'text' only decodes annotations (text, dimensions, attributes) and block inserts,
+# 'sample' keeps fixed-memory summary statistics of modelspace instead of the entities
+EXTRACTION_MODES = ('full', 'streaming', 'text', 'sample')
+
+# Bump whenever extract_dwg_data() output changes so cached extractions are not reused
+EXTRACTOR_VERSION = "7"
+
+# Byte ranges per extraction worker when one DXF is split (uneven entity costs even out)
+PARTITIONS_PER_WORKER = 2
+
+# Layout name ezdxf gives model space
+MODEL_LAYOUT = 'Model'
+
+# Layout tag of paper space entities found by the text-first scan, which does not resolve sheet names
+PAPER_SPACE_LAYOUT = '*Paper_Space'
+
+# Annotation entities whose text goes into text_content in text mode
+TEXT_MODE_TYPES = ('TEXT', 'MTEXT', 'DIMENSION', 'ATTRIB')
 
 
 class DWGProcessor:
     """Handles DWG file processing and conversion to vector embeddings."""
 
-    def __init__(self):
-        self.supported_entities = [
-            'LINE', 'CIRCLE', 'ARC', 'LWPOLYLINE', 'POLYLINE',
-            'TEXT', 'MTEXT', 'INSERT', 'DIMENSION', 'HATCH'
-        ]
+    def __init__(self, cache: Optional[ExtractionCache] = None):
         self.temp_dir = None
+        # Extraction cache; pass an ExtractionCache to use a different location
+        self.cache = cache or (extraction_cache if ENABLE_EXTRACTION_CACHE else None)
+        # Worker processes reading one large streamed DXF (1 = a single sequential pass)
+        self.extract_workers = DWG_EXTRACT_WORKERS
+        # Memory budget of sample mode summaries (see streamingSummary)
+        self.sample_memory_mb = DWG_SAMPLE_MEMORY_MB
+        # Extraction mode for database ingestion (None = pick full or streaming by size)
+        self.index_mode = None if DWG_INDEX_MODE == 'auto' else DWG_INDEX_MODE
+        # Similarity at which a new drawing reuses the AI analysis of an indexed one (see nearDuplicate)
+        self.near_duplicate_threshold = DWG_NEAR_DUPLICATE_THRESHOLD
+
+    @property
+    def supported_entities(self) -> List[str]:
+        """DXF entity types with a registered handler (see entityHandlers.register_entity_handler)."""
+        return list(ENTITY_HANDLERS)
 
     def _convert_dwg_to_dxf(self, dwg_path: str, silent: bool = False) -> Optional[str]:
         """
-        Convert DWG to DXF using ODA File Converter.
+        Convert DWG to DXF using ODA File Converter, through the shared conversion
+        service (bounded concurrency, per-job timeout; see get_conversion_service).
         Returns path to temporary DXF file or None if conversion fails.
         """
-        if not DWG_CONVERSION_AVAILABLE:
+        if not is_dwg_conversion_available():
             return None
 
         try:
-            if not self.temp_dir:
-                self.temp_dir = tempfile.mkdtemp()
+            result = get_conversion_service().convert(dwg_path)
+        except Exception as e:
+            if not silent:
+                print(Fore.RED + f"✗ Error: {str(e)[:30]}" + Style.RESET_ALL)
+            return None
 
-            output_dir = tempfile.mkdtemp(dir=self.temp_dir)
-            input_folder = os.path.dirname(dwg_path)
-            input_file = os.path.basename(dwg_path)
+        if not silent:
+            if result['status'] == STATUS_CONVERTED:
+                print(Fore.GREEN + "✓ Converted" + Style.RESET_ALL, end=' ')
+            elif result['status'] == STATUS_TIMEOUT:
+                print(Fore.RED + "✗ Timeout" + Style.RESET_ALL)
+            elif result.get('returncode'):
+                print(Fore.RED + f"✗ ODA Error (code {result['returncode']})" + Style.RESET_ALL)
+            else:
+                print(Fore.YELLOW + "✗ DXF not created" + Style.RESET_ALL)
+        return result['dxf_path']
 
-            # Build command - NO shell quoting needed when using list
+    def convert_dwg_batch(self, dwg_paths: List[str], silent: bool = False) -> Dict[str, Optional[str]]:
+        """
+        Convert many DWG files with one ODA File Converter run per source folder.
+        
+        A group that holds every DWG in its folder is converted in place with the
+        "*.DWG" filter; any other group is first staged into a temporary folder
+        (hard links, or copies across drives). Files a group run did not produce
+        are retried one at a time with _convert_dwg_to_dxf().
+        
+        Returns:
+            Dict mapping each DWG path to its temporary DXF path, or None if the file
+            could not be converted. Non-DWG files and files with a cached extraction
+            are left out, as is everything when ODA File Converter is not available.
+        """
+        dwg_paths = [path for path in dwg_paths if _is_dwg(path) and not self._is_cached(path)]
+        if not dwg_paths or not is_dwg_conversion_available():
+            return {}
+        
+        if not self.temp_dir:
+            self.temp_dir = tempfile.mkdtemp()
+        
+        groups: Dict[str, List[str]] = {}
+        for path in dwg_paths:
+            groups.setdefault(os.path.dirname(os.path.abspath(path)), []).append(path)
+        
+        converted = {}
+        for folder, paths in groups.items():
+            converted.update(self._convert_dwg_group(folder, paths))
+        
+        retried = [path for path, dxf_path in converted.items() if not dxf_path]
+        for path in retried:
+            converted[path] = self._convert_dwg_to_dxf(path, silent=True)
+        
+        if not silent:
+            ok = sum(1 for dxf_path in converted.values() if dxf_path)
+            print(Fore.GREEN + f"✓ Converted {ok}/{len(converted)} DWG files in {len(groups)} batch(es)"
+                  + (f", {len(retried)} retried singly" if retried else '') + Style.RESET_ALL)
+        
+        return converted
+
+    def _is_cached(self, dwg_path: str) -> bool:
+        """True if a full extraction of this file's content is already cached."""
+        if not self.cache:
+            return False
+        key = self.cache.make_key(dwg_path, EXTRACTOR_VERSION, 'full')
+        return bool(key) and self.cache.contains(key)
+
+    def _convert_dwg_group(self, folder: str, paths: List[str]) -> Dict[str, Optional[str]]:
+        """Convert DWG files from one folder in a single ODA File Converter run."""
+        output_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        stage_dir = None
+        
+        try:
+            folder_dwgs = {f for f in os.listdir(folder) if f.lower().endswith('.dwg')}
+        except OSError:
+            folder_dwgs = set()
+        
+        try:
+            input_folder = folder
+            if {os.path.basename(path) for path in paths} != folder_dwgs:
+                # Only convert the requested files, not everything in their folder
+                stage_dir = tempfile.mkdtemp(dir=self.temp_dir)
+                for path in paths:
+                    target = os.path.join(stage_dir, os.path.basename(path))
+                    try:
+                        os.link(path, target)
+                    except OSError:
+                        shutil.copy2(path, target)
+                input_folder = stage_dir
+            
             cmd = [
-                ODA_CONVERTER_PATH,
+                get_oda_converter_path(),
                 input_folder,
                 output_dir,
                 "ACAD2018",
                 "DXF",
                 "0",
                 "1",
-                input_file
+                "*.DWG"
             ]
-
-            # Run converter
-            result = subprocess.run(
+            subprocess.run(
                 cmd,
                 capture_output=True,
                 text=True,
-                timeout=90
+                timeout=ODA_TIMEOUT_PER_FILE * len(paths)
             )
-
-            # Check for output file
-            expected_dxf = os.path.join(output_dir, os.path.splitext(input_file)[0] + ".dxf")
-            
-            if os.path.exists(expected_dxf):
-                if not silent:
-                    print(Fore.GREEN + "✓ Converted" + Style.RESET_ALL, end=' ')
-                return expected_dxf
-            else:
-                if result.returncode != 0:
-                    if not silent:
-                        print(Fore.RED + f"✗ ODA Error (code {result.returncode})" + Style.RESET_ALL)
-                else:
-                    if not silent:
-                        print(Fore.YELLOW + "✗ DXF not created" + Style.RESET_ALL)
-                return None
-
-        except subprocess.TimeoutExpired:
-            if not silent:
-                print(Fore.RED + "✗ Timeout" + Style.RESET_ALL)
-            return None
-        except Exception as e:
-            if not silent:
-                print(Fore.RED + f"✗ Error: {str(e)[:30]}" + Style.RESET_ALL)
-            return None
+        except (subprocess.TimeoutExpired, OSError):
+            pass  # whatever was not written gets retried per file
+        finally:
+            if stage_dir:
+                shutil.rmtree(stage_dir, ignore_errors=True)
+        
+        # Map outputs back to inputs; ODA may change the case of the extension
+        outputs = {f.lower(): os.path.join(output_dir, f) for f in os.listdir(output_dir)}
+        return {
+            path: outputs.get(os.path.splitext(os.path.basename(path))[0].lower() + '.dxf')
+            for path in paths
+        }
 
     def __del__(self):
         """Cleanup temporary directories."""
@@ -160,81 +383,116 @@ class DWGProcessor:
             except:
                 pass
 
-    def extract_dwg_data(self, dwg_path: str, silent: bool = False) -> Optional[Dict]:
+    def _select_extraction_mode(self, dwg_path: str) -> str:
+        """
+        Pick 'streaming' for very large DXF files, and for large ones when they can be
+        split across extraction workers (DWG_PARALLEL_THRESHOLD_MB); 'sample' for files
+        too large to hold their entities (DWG_SAMPLE_THRESHOLD_MB); 'full' otherwise.
+        """
+        try:
+            size_mb = os.path.getsize(dwg_path) / (1024 * 1024)
+        except OSError:
+            return 'full'
+        threshold = DWG_STREAMING_THRESHOLD_MB
+        if self.extract_workers > 1:
+            threshold = min(threshold, DWG_PARALLEL_THRESHOLD_MB)
+        if size_mb >= threshold and is_ascii_dxf(dwg_path):
+            return 'sample' if size_mb >= DWG_SAMPLE_THRESHOLD_MB else 'streaming'
+        return 'full'
+
+    def extract_dwg_data(self, dwg_path: str, silent: bool = False,
+                         mode: Optional[str] = None, use_cache: bool = True,
+                         converted_path: Optional[str] = None) -> Optional[Dict]:
         """
         Extract structured data from DWG file.
         
+        Args:
+            dwg_path: Path to DWG/DXF file
+            silent: Suppress output messages
+            mode: 'full' loads the whole document, 'streaming' iterates modelspace
+                entities straight from disk with roughly constant memory, 'text' scans
+                raw tags for annotations and block inserts only (for fast indexing),
+                'sample' streams modelspace into fixed-memory summary statistics.
+                None picks 'streaming' for DXF files above DWG_STREAMING_THRESHOLD_MB
+                and 'sample' above DWG_SAMPLE_THRESHOLD_MB.
+            use_cache: Reuse a cached extraction of identical file content
+            converted_path: DXF already converted from dwg_path (see convert_dwg_batch());
+                it is read instead of converting again and deleted afterwards
+        
         Returns:
-            Dict with keys: entities, layers, blocks, metadata, text_content
+            Dict with keys: entities, layers, blocks, block_definitions, metadata, text_content
+            (and summary in sample mode)
         """
-        dxf_path = None
+        dxf_path = converted_path
         
         try:
-            # First try to read as DXF directly
-            try:
-                doc = ezdxf.readfile(dwg_path)
-            except ezdxf.DXFError:
-                # Not a DXF, try to convert from DWG
-                if not silent:
-                    print(Fore.YELLOW + "Converting..." + Style.RESET_ALL, end=' ')
-                
-                dxf_path = self._convert_dwg_to_dxf(dwg_path, silent=silent)
-                if not dxf_path:
+            if mode is None:
+                mode = self._select_extraction_mode(dwg_path)
+            if mode not in EXTRACTION_MODES:
+                raise ValueError(f"Unknown extraction mode: {mode}")
+
+            cache_key = None
+            if use_cache and self.cache:
+                cache_key = self.cache.make_key(dwg_path, EXTRACTOR_VERSION, mode)
+                data = self.cache.get(cache_key) if cache_key else None
+                if data:
+                    # Same content may live under another name
+                    data['metadata']['filename'] = os.path.basename(dwg_path)
+                    data['metadata']['filepath'] = os.path.abspath(dwg_path)
                     if not silent:
-                        print(Fore.RED + "✗ Conversion failed" + Style.RESET_ALL)
-                    return None
-                
-                doc = ezdxf.readfile(dxf_path)
-            
-            modelspace = doc.modelspace()
-            
-            # Extract entities
-            entities = []
-            text_elements = []
-            layers_used = set()
-            
-            for entity in modelspace:
-                if entity.dxftype() not in self.supported_entities:
-                    continue
+                        print(Fore.GREEN + f"✓ {data['metadata']['entity_count']} entities (cached)" + Style.RESET_ALL)
+                    return data
+
+            if mode in ('streaming', 'text', 'sample'):
+                source_path = dxf_path or dwg_path
+                if not dxf_path and not is_ascii_dxf(dwg_path):
+                    if not silent:
+                        print(Fore.YELLOW + "Converting..." + Style.RESET_ALL, end=' ')
+                    dxf_path = self._convert_dwg_to_dxf(dwg_path, silent=silent)
+                    if not dxf_path:
+                        if not silent:
+                            print(Fore.RED + "✗ Conversion failed" + Style.RESET_ALL)
+                        return None
+                    source_path = dxf_path
+                if mode == 'text':
+                    data = self._extract_text_first(source_path, dwg_path)
+                elif mode == 'sample':
+                    data = self._extract_sample(source_path, dwg_path)
+                else:
+                    data = self._extract_streaming(source_path, dwg_path)
+            else:
+                # Route by the first bytes: a DWG goes straight to conversion, a DXF is read
+                # (recovering a damaged one) and only unrecognized content tries both
+                source_format = FORMAT_DXF if dxf_path else detect_format(dwg_path)
+                doc = None
+                if source_format in (FORMAT_DXF, FORMAT_BINARY_DXF):
+                    doc = self._read_dxf(dxf_path or dwg_path, silent=silent)
+                elif source_format is None:
+                    try:
+                        doc = ezdxf.readfile(dwg_path)
+                    except (ezdxf.DXFError, OSError):
+                        pass  # not readable as DXF, so try converting it as a DWG
                 
-                entity_data = self._extract_entity_data(entity)
-                if entity_data:
-                    entities.append(entity_data)
-                    layers_used.add(entity.dxf.layer)
+                if doc is None:
+                    if not silent:
+                        print(Fore.YELLOW + "Converting..." + Style.RESET_ALL, end=' ')
                     
-                    # Collect text content for semantic search
-                    if entity.dxftype() in ['TEXT', 'MTEXT']:
-                        text_elements.append(entity.dxf.text)
-            
-            # Extract blocks (component definitions)
-            blocks = self._extract_blocks(doc)
-            
-            # Extract layers with properties
-            layers = self._extract_layers(doc, layers_used)
-            
-            # Document metadata
-            metadata = {
-                'filename': os.path.basename(dwg_path),
-                'filepath': os.path.abspath(dwg_path),
-                'dxf_version': doc.dxfversion,
-                'entity_count': len(entities),
-                'layer_count': len(layers),
-                'block_count': len(blocks)
-            }
+                    dxf_path = self._convert_dwg_to_dxf(dwg_path, silent=silent)
+                    if not dxf_path:
+                        if not silent:
+                            print(Fore.RED + "✗ Conversion failed" + Style.RESET_ALL)
+                        return None
+                    
+                    doc = self._read_dxf(dxf_path, silent=silent)
+                data = self._extract_document(doc, dwg_path)
             
-            # Concatenate all text for embedding
-            text_content = ' '.join(text_elements) if text_elements else ''
+            if cache_key:
+                self.cache.put(cache_key, data)
             
             if not silent:
-                print(Fore.GREEN + f"✓ {len(entities)} entities" + Style.RESET_ALL)
+                print(Fore.GREEN + f"✓ {data['metadata']['entity_count']} entities" + Style.RESET_ALL)
             
-            return {
-                'entities': entities,
-                'layers': layers,
-                'blocks': blocks,
-                'metadata': metadata,
-                'text_content': text_content
-            }
+            return data
             
         except ezdxf.DXFError as e:
             if not silent:
@@ -252,73 +510,281 @@ class DWGProcessor:
                 except:
                     pass
 
-    def _extract_entity_data(self, entity) -> Optional[Dict]:
-        """Extract relevant data from a single entity."""
+    def _read_dxf(self, dxf_path: str, silent: bool = False):
+        """
+        Load a DXF document, falling back to ezdxf's recover mode for files with
+        structural damage (invalid group codes, broken tables, ...).
+        
+        Raises:
+            ezdxf.DXFError: the file could not be read even in recover mode
+        """
         try:
-            base_data = {
-                'type': entity.dxftype(),
-                'layer': entity.dxf.layer,
-                'color': entity.dxf.color if hasattr(entity.dxf, 'color') else None,
+            return ezdxf.readfile(dxf_path)
+        except (ezdxf.DXFStructureError, UnicodeDecodeError):
+            doc, auditor = recover.readfile(dxf_path)
+            if not silent:
+                print(Fore.YELLOW + f"Recovered damaged DXF ({len(auditor.fixes)} fixes)" + Style.RESET_ALL, end=' ')
+            return doc
+
+    def _extract_document(self, doc, dwg_path: str) -> Dict:
+        """Extract data from a fully loaded ezdxf document: model space and every paper space layout."""
+        layout_names = doc.layouts.names_in_taborder()
+        entities = EntityStore()
+        text_elements = []
+        for layout_entities, layout_texts in self._collect_layouts([doc.layouts.get(name) for name in layout_names]):
+            entities.extend(layout_entities)
+            text_elements.extend(layout_texts)
+        layers_used = set(entities.layer_names)
+        
+        # Extract blocks (component definitions)
+        blocks, block_definitions = self._extract_blocks(doc)
+        
+        # Extract layers with properties
+        layers = self._extract_layers(doc, layers_used)
+        
+        return self._build_dwg_data(dwg_path, doc.dxfversion, entities, text_elements,
+                                    layers, blocks, mode='full', block_definitions=block_definitions,
+                                    layout_names=layout_names)
+
+    def _collect_layouts(self, layouts) -> List[Tuple[EntityStore, List[str]]]:
+        """
+        Collect the entities of each layout, tagged with the layout name.
+        
+        Multi-sheet drawings are extracted in a thread pool of DWG_LAYOUT_WORKERS,
+        one layout per task; results keep the order of `layouts`.
+        """
+        layouts = [layout for layout in layouts if len(layout)]
+        
+        def collect(layout):
+            entities, text_elements, _ = self._collect_entities(layout, layout=layout.name)
+            return entities, text_elements
+        
+        if len(layouts) < 2 or DWG_LAYOUT_WORKERS < 2:
+            return [collect(layout) for layout in layouts]
+        with ThreadPoolExecutor(max_workers=min(DWG_LAYOUT_WORKERS, len(layouts))) as pool:
+            return list(pool.map(collect, layouts))
+
+    def _extract_streaming(self, dxf_path: str, dwg_path: str) -> Dict:
+        """
+        Extract data from an ASCII DXF file without loading the document.
+        
+        Layers and block summaries come from a light tag scan of the TABLES and
+        BLOCKS sections; modelspace entities are then read one at a time. Paper space
+        layouts and block geometry are not read, so use full mode for those.
+        """
+        structure = scan_dxf_structure(dxf_path)
+        
+        ranges = []
+        if self.extract_workers > 1:
+            ranges = partition_entities_section(dxf_path, self.extract_workers * PARTITIONS_PER_WORKER)
+        if len(ranges) > 1:
+            entities, text_elements = self._collect_partitions(dxf_path, ranges, structure['encoding'])
+            layers_used = set(entities.layer_names)
+        else:
+            entities, text_elements, layers_used = self._collect_entities(
+                iterdxf.modelspace(dxf_path, types=self.supported_entities), layout=MODEL_LAYOUT
+            )
+        
+        layers = []
+        for layer_name in layers_used:
+            layer = structure['layers'].get(layer_name.lower())
+            if layer:
+                layers.append(dict(layer))
+        
+        return self._build_dwg_data(dwg_path, structure['dxf_version'], entities, text_elements,
+                                    layers, structure['blocks'], mode='streaming')
+
+    def _collect_partitions(self, dxf_path: str, ranges: List[Tuple[int, int]],
+                            encoding: str) -> Tuple[EntityStore, List[str]]:
+        """
+        Collect modelspace entities of byte ranges of the ENTITIES section in worker
+        processes (see dxfPartition), merged in file order.
+        """
+        workers = min(self.extract_workers, len(ranges))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(
+                extract_partition, repeat(dxf_path), [start for start, _ in ranges],
+                [end for _, end in ranges], repeat(encoding), repeat(MODEL_LAYOUT)
+            ))
+        
+        entities = EntityStore()
+        text_elements = []
+        for part_entities, part_texts in parts:
+            entities.extend(part_entities)
+            text_elements.extend(part_texts)
+        return entities, text_elements
+
+    def _extract_sample(self, dxf_path: str, dwg_path: str) -> Dict:
+        """
+        Summarize an ASCII DXF file in memory bounded by sample_memory_mb.
+        
+        Modelspace entities are streamed as in streaming mode but only folded into a
+        StreamingSummary (counts, value sketches, a text sample); the returned
+        entities are empty and data['summary'] holds the summary.
+        """
+        structure = scan_dxf_structure(dxf_path)
+        
+        summary = StreamingSummary(self.sample_memory_mb)
+        for record in extract_entities(iterdxf.modelspace(dxf_path, types=self.supported_entities)):
+            record['layout'] = MODEL_LAYOUT
+            summary.add(record)
+        stats = summary.finish()
+        
+        layers = [dict(structure['layers'][name.lower()]) for name in stats['layers']
+                  if name.lower() in structure['layers']]
+        return self._build_dwg_data(dwg_path, structure['dxf_version'], EntityStore(), stats['texts'],
+                                    layers, structure['blocks'], mode='sample', summary=stats)
+
+    def _extract_text_first(self, dxf_path: str, dwg_path: str) -> Dict:
+        """
+        Extract only what semantic indexing needs from an ASCII DXF file.
+        
+        One raw tag scan (see dxfScanner.scan_dxf_structure) collects layers, block
+        summaries, every TEXT, MTEXT, DIMENSION and ATTRIB, and the INSERTs; no
+        geometry is decoded. metadata['entity_types'] still counts every entity
+        type in the drawing, and entity_count the supported ones.
+        """
+        structure = scan_dxf_structure(dxf_path, annotations=True)
+        
+        entities = EntityStore()
+        text_elements = []
+        for record in structure['annotations']:
+            record['layout'] = PAPER_SPACE_LAYOUT if record.pop('paperspace') else MODEL_LAYOUT
+            entities.append_record(record)
+            text = record.get('text')
+            if record['type'] in TEXT_MODE_TYPES and text and text != '<>':
+                text_elements.append(text)
+        
+        layers = [dict(structure['layers'][name.lower()]) for name in sorted(structure['layers_used'])
+                  if name.lower() in structure['layers']]
+        
+        data = self._build_dwg_data(dwg_path, structure['dxf_version'], entities, text_elements,
+                                    layers, structure['blocks'], mode='text')
+        entity_types = structure['entity_types']
+        data['metadata']['entity_types'] = entity_types
+        data['metadata']['entity_count'] = sum(count for etype, count in entity_types.items()
+                                               if etype in self.supported_entities)
+        return data
+
+    def _collect_entities(self, entity_iter, layout: str = '') -> Tuple[EntityStore, List[str], set]:
+        """Run the entity handlers over an iterable of DXF entities, tagging them with `layout`."""
+        entities, text_elements = collect_entities(entity_iter, layout=layout)
+        return entities, text_elements, set(entities.layer_names)
+
+    def _build_dwg_data(self, dwg_path: str, dxf_version: str, entities: EntityStore,
+                        text_elements: List[str], layers: List[Dict], blocks: List[Dict],
+                        mode: str, block_definitions: Optional[Dict[str, EntityStore]] = None,
+                        layout_names: Optional[List[str]] = None,
+                        summary: Optional[Dict] = None) -> Dict:
+        """
+        Assemble the extract_dwg_data() result dictionary.
+        
+        With a `summary` (sample mode, see streamingSummary), counts come from the
+        summary instead of `entities`, which is then empty.
+        """
+        # How often the layouts reference each block
+        if summary is not None:
+            insert_counts = Counter(summary['insert_counts'])
+            insert_names = list(insert_counts)
+        else:
+            insert_names = list(entities.column('INSERT', 'block_name'))
+            insert_counts = Counter(insert_names)
+        for block in blocks:
+            block['insert_count'] = insert_counts[block['name']]
+        
+        # Text inside referenced blocks (title blocks, part labels) is indexed once per block
+        block_text = {block['name']: block['texts'] for block in blocks}
+        for name in referenced_blocks(insert_names, blocks):
+            text_elements = text_elements + [text for text in block_text[name] if text]
+        
+        # Entity and text counts per layout (sheet)
+        if summary is not None:
+            layouts = summary['layout_counts']
+        else:
+            entity_counts = entities.layout_counts()
+            text_counts = entities.layout_counts(['TEXT', 'MTEXT'])
+            layouts = {
+                name: {'entity_count': entity_counts.get(name, 0), 'text_count': text_counts.get(name, 0)}
+                for name in (layout_names or entities.layout_names)
             }
-            
-            # Entity-specific data extraction
-            if entity.dxftype() == 'LINE':
-                base_data.update({
-                    'start': f"{entity.dxf.start.x:.2f},{entity.dxf.start.y:.2f}",
-                    'end': f"{entity.dxf.end.x:.2f},{entity.dxf.end.y:.2f}",
-                    'length': f"{entity.dxf.start.distance(entity.dxf.end):.2f}"
-                })
-            
-            elif entity.dxftype() == 'CIRCLE':
-                base_data.update({
-                    'center': f"{entity.dxf.center.x:.2f},{entity.dxf.center.y:.2f}",
-                    'radius': f"{entity.dxf.radius:.2f}",
-                    'diameter': f"{entity.dxf.radius * 2:.2f}"
-                })
-            
-            elif entity.dxftype() == 'ARC':
-                base_data.update({
-                    'center': f"{entity.dxf.center.x:.2f},{entity.dxf.center.y:.2f}",
-                    'radius': f"{entity.dxf.radius:.2f}",
-                    'start_angle': f"{entity.dxf.start_angle:.2f}",
-                    'end_angle': f"{entity.dxf.end_angle:.2f}"
-                })
-            
-            elif entity.dxftype() in ['TEXT', 'MTEXT']:
-                base_data.update({
-                    'text': entity.dxf.text,
-                    'height': f"{entity.dxf.height:.2f}" if hasattr(entity.dxf, 'height') else None,
-                    'position': f"{entity.dxf.insert.x:.2f},{entity.dxf.insert.y:.2f}" if hasattr(entity.dxf, 'insert') else None
-                })
-            
-            elif entity.dxftype() == 'INSERT':  # Block reference
-                base_data.update({
-                    'block_name': entity.dxf.name,
-                    'position': f"{entity.dxf.insert.x:.2f},{entity.dxf.insert.y:.2f}",
-                    'scale': f"{entity.dxf.xscale:.2f},{entity.dxf.yscale:.2f}" if hasattr(entity.dxf, 'xscale') else None
-                })
-            
-            elif entity.dxftype().startswith('DIMENSION'):
-                base_data.update({
-                    'measurement': f"{entity.get_measurement():.2f}" if hasattr(entity, 'get_measurement') else None,
-                    'text': entity.dxf.text if hasattr(entity.dxf, 'text') else None
-                })
-            
-            return base_data
-            
-        except Exception:
-            return None
+        
+        # Document metadata
+        metadata = {
+            'filename': os.path.basename(dwg_path),
+            'filepath': os.path.abspath(dwg_path),
+            'dxf_version': dxf_version,
+            'entity_count': summary['entity_count'] if summary is not None else len(entities),
+            'layer_count': len(layers),
+            'block_count': len(blocks),
+            'layout_count': len(layouts),
+            'layouts': layouts,
+            'extraction_mode': mode
+        }
+        
+        # Concatenate all text for embedding
+        text_content = ' '.join(text_elements) if text_elements else ''
+        
+        data = {
+            'entities': entities,
+            'layers': layers,
+            'blocks': blocks,
+            'block_definitions': block_definitions or {},
+            'metadata': metadata,
+            'text_content': text_content
+        }
+        if summary is not None:
+            metadata['entity_types'] = summary['type_counts']
+            data['summary'] = summary
+        return data
+
+    def _extract_entity_data(self, entity) -> Optional[Dict]:
+        """
+        Extract relevant data from a single entity (see entityHandlers.extract_entity).
+        
+        Coordinates are returned as (x, y) tuples and measurements as floats;
+        EntityStore keeps them at full precision. Polylines, hatches and curves also
+        return their vertex paths under 'paths' (see geometryStore).
+        """
+        return extract_entity(entity)
     
-    def _extract_blocks(self, doc) -> List[Dict]:
-        """Extract block definitions from document."""
+    def _extract_blocks(self, doc) -> Tuple[List[Dict], Dict[str, EntityStore]]:
+        """
+        Extract block definitions from document.
+        
+        Each definition is walked once: its entities are kept in block coordinates
+        (see blockLibrary.expand_inserts) and summarized with its base point,
+        per-type counts, text and the names of nested blocks.
+        
+        Returns:
+            Tuple of (block summaries, block-local EntityStore by block name)
+        """
         blocks = []
+        definitions = {}
         for block in doc.blocks:
-            if not block.name.startswith('*'):  # Skip model/paper space
-                blocks.append({
-                    'name': block.name,
-                    'entity_count': len(list(block))
-                })
-        return blocks
+            if block.name.startswith('*'):  # Skip model/paper space
+                continue
+            
+            members = list(block)
+            entity_types = {}
+            block_refs = []
+            for entity in members:
+                etype = entity.dxftype()
+                entity_types[etype] = entity_types.get(etype, 0) + 1
+                if etype == 'INSERT' and entity.dxf.name not in block_refs:
+                    block_refs.append(entity.dxf.name)
+            
+            store, texts, _ = self._collect_entities(members)
+            definitions[block.name] = store
+            base_point = block.block.dxf.base_point
+            blocks.append({
+                'name': block.name,
+                'base_point': (float(base_point[0]), float(base_point[1])),
+                'entity_count': len(members),
+                'entity_types': entity_types,
+                'texts': texts,
+                'block_refs': block_refs
+            })
+        return blocks, definitions
     
     def _extract_layers(self, doc, used_layers: set) -> List[Dict]:
         """Extract layer information."""
@@ -351,13 +817,17 @@ class DWGProcessor:
         # Write header
         writer.writerow(['Type', 'Layer', 'Color', 'Property', 'Value'])
         
-        # Write entities
+        # Write entities (EntityStore rows or legacy dicts, left unmodified)
         for entity in dwg_data['entities']:
-            entity_type = entity.pop('type')
-            layer = entity.pop('layer')
-            color = entity.pop('color', '')
+            entity_type = entity.get('type')
+            layer = entity.get('layer')
+            color = entity.get('color', '')
             
             for key, value in entity.items():
+                if key in ('type', 'layer', 'color'):
+                    continue
+                if key == 'layout' and value == MODEL_LAYOUT:
+                    continue  # only paper space entities get a layout row
                 if value is not None:
                     writer.writerow([entity_type, layer, color, key, value])
         
@@ -389,54 +859,43 @@ class DWGProcessor:
         Enhances embeddings with dimensional and structural information.
         """
         nl_descriptions = []
+        entities = as_entity_store(dwg_data['entities'])
+        
+        # Value statistics: sample mode summarized them while streaming (see streamingSummary)
+        summary = dwg_data.get('summary')
+        fields = summary['fields'] if summary else summarize_entities(entities)
     
-        # Count entities by type
-        entity_counts = {}
-        for entity in dwg_data['entities']:
-            etype = entity['type']
-            entity_counts[etype] = entity_counts.get(etype, 0) + 1
-    
-        # Describe counts in natural language
-        for etype, count in sorted(entity_counts.items()):
+        # Describe counts in natural language (text and sample modes keep counts of entities they did not keep)
+        type_counts = dwg_data.get('metadata', {}).get('entity_types') or entities.type_counts()
+        for etype, count in sorted(type_counts.items()):
             nl_descriptions.append(f"{count} {etype.lower()} elements")
     
-        # Extract specific dimensions from circles
-        circle_radii = []
-        for entity in dwg_data['entities']:
-            if entity['type'] == 'CIRCLE':
-                radius = entity.get('radius', '').replace('f', '')
-                try:
-                    circle_radii.append(float(radius))
-                except (ValueError, AttributeError):
-                    pass
-    
-        if circle_radii:
-            min_r = min(circle_radii)
-            max_r = max(circle_radii)
-            nl_descriptions.append(f"circles with radii from {min_r:.2f} to {max_r:.2f}")
+        # Specific dimensions from circles
+        radius = fields['circle_radius']
+        if radius:
+            nl_descriptions.append(f"circles with radii from {radius['min']:.2f} to {radius['max']:.2f}")
     
-        # Extract line lengths
-        line_lengths = []
-        for entity in dwg_data['entities']:
-            if entity['type'] == 'LINE':
-                length = entity.get('length', '').replace('f', '')
-                try:
-                    line_lengths.append(float(length))
-                except (ValueError, AttributeError):
-                    pass
+        # Line lengths
+        length = fields['line_length']
+        if length:
+            nl_descriptions.append(f"lines ranging from {length['min']:.2f} to {length['max']:.2f} in length")
     
-        if line_lengths:
-            min_l = min(line_lengths)
-            max_l = max(line_lengths)
-            nl_descriptions.append(f"lines ranging from {min_l:.2f} to {max_l:.2f} in length")
+        # Polyline outlines and hatched regions
+        perimeter, vertices, area = fields['polyline_perimeter'], fields['polyline_vertices'], fields['polyline_area']
+        if perimeter:
+            vertex_total = int(vertices['sum']) if vertices else 0
+            nl_descriptions.append(f"polylines from {perimeter['min']:.2f} to {perimeter['max']:.2f} in length "
+                                   f"with {vertex_total} vertices")
+        if area:
+            nl_descriptions.append(f"{area['count']} closed outlines enclosing {area['min']:.2f} to "
+                                   f"{area['max']:.2f} square units")
+        hatch_area = fields['hatch_area']
+        if hatch_area:
+            nl_descriptions.append(f"{hatch_area['count']} hatched regions covering {hatch_area['sum']:.2f} square units")
     
         # Extract text content (important labels, notes, dimensions)
-        text_items = []
-        for entity in dwg_data['entities']:
-            if entity['type'] in ['TEXT', 'MTEXT']:
-                text = entity.get('text', '')
-                if text and len(text.strip()) > 0:
-                    text_items.append(text.strip())
+        texts = summary['texts'] if summary else entities.texts(('TEXT', 'MTEXT'))
+        text_items = [text.strip() for text in texts if text.strip()]
     
         if text_items:
             # Limit to first 5 text items to avoid overwhelming the description
@@ -460,13 +919,9 @@ class DWGProcessor:
     def create_description(self, dwg_data: Dict) -> str:
         """Generate a natural language description of the DWG file using AI."""
         meta = dwg_data['metadata']
-        entities = dwg_data['entities']
         
         # Count entity types
-        entity_counts = {}
-        for entity in entities:
-            etype = entity['type']
-            entity_counts[etype] = entity_counts.get(etype, 0) + 1
+        entity_counts = meta.get('entity_types') or as_entity_store(dwg_data['entities']).type_counts()
         
         # Build structured data for AI
         structured_summary = {
@@ -523,25 +978,16 @@ Keep it concise and technical."""
         # Try Grok first
         if grok_client:
             try:
-                resp = grok_client.chat(
-                    [{"role": "user", "content": prompt}],
-                    model="grok-3-fast-beta"
-                )
-                if resp and "choices" in resp:
-                    return resp["choices"][0]["message"]["content"].strip()
+                result = grok_complete(prompt, model="grok-3-fast-beta")
+                if result is not None:
+                    return result
             except Exception:
                 pass
         
         # Fallback to OpenAI
         if openai_client:
             try:
-                resp = openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.3,
-                    max_tokens=200
-                )
-                return resp.choices[0].message.content.strip()
+                return openai_complete(prompt, model="gpt-4o-mini", temperature=0.3, max_tokens=200)
             except Exception:
                 pass
         
@@ -580,12 +1026,8 @@ Return ONLY valid JSON, no markdown formatting."""
         # Try Grok first
         if grok_client:
             try:
-                resp = grok_client.chat(
-                    [{"role": "user", "content": prompt}],
-                    model="grok-3-fast-beta"
-                )
-                if resp and "choices" in resp:
-                    result = resp["choices"][0]["message"]["content"].strip()
+                result = grok_complete(prompt, model="grok-3-fast-beta")
+                if result is not None:
                     # Remove markdown code blocks if present
                     if result.startswith("```"):
                         result = '\n'.join([line for line in result.split('\n') 
@@ -597,13 +1039,7 @@ Return ONLY valid JSON, no markdown formatting."""
         # Fallback to OpenAI
         if openai_client:
             try:
-                resp = openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.2,
-                    max_tokens=600
-                )
-                result = resp.choices[0].message.content.strip()
+                result = openai_complete(prompt, model="gpt-4o-mini", temperature=0.2, max_tokens=600)
                 # Remove markdown code blocks if present
                 if result.startswith("```"):
                     result = '\n'.join([line for line in result.split('\n') 
@@ -614,13 +1050,221 @@ Return ONLY valid JSON, no markdown formatting."""
         
         return {}
 
-    def add_to_database(self, dwg_path: str, silent: bool = False) -> bool:
+    def _content_hash(self, path: str) -> Optional[str]:
+        return (self.cache or extraction_cache).content_hash(path)
+
+    def check_revision(self, dwg_path: str, stored: Optional[Dict], mode: Optional[str] = None) -> str:
+        """
+        Compare a file with the metadata stored for it (see get_stored_metadata).
+        
+        Returns:
+            'new' (not in the database), 'unchanged', 'touched' (new timestamp,
+            same content) or 'changed' (a new revision that needs re-ingesting).
+            Records written before revisions were tracked count as unchanged, and
+            text-mode records count as changed when `mode` (default DWG_INDEX_MODE)
+            is not 'text', so the deferred geometry pass picks them up.
+        """
+        if stored is None:
+            return 'new'
+        if not stored.get('content_hash'):
+            return 'unchanged'
+        if stored.get('extraction_mode') == 'text' and (mode or self.index_mode) != 'text':
+            return 'changed'
+        try:
+            stat = os.stat(dwg_path)
+        except OSError:
+            return 'unchanged'
+        if stored.get('file_size') == stat.st_size and stored.get('file_mtime') == stat.st_mtime_ns:
+            return 'unchanged'
+        if self._content_hash(dwg_path) == stored['content_hash']:
+            return 'touched'
+        return 'changed'
+
+    def build_database_entry(self, dwg_path: str, silent: bool = False,
+                             converted_path: Optional[str] = None,
+                             previous: Optional[Dict] = None,
+                             mode: Optional[str] = None) -> Optional[Dict]:
+        """
+        Extract a DWG file and prepare its vector database record without writing it.
+        
+        With `previous` (the stored metadata of an earlier revision), the entities are
+        compared with that revision's fingerprints. If no text, dimension or block text
+        changed, the previous AI description and specs are kept and no AI calls are made.
+        The same holds when the content is unchanged and only the extraction mode
+        differs (a full pass over a drawing first indexed in text mode). A new drawing
+        nearly identical to one already stored (see nearDuplicate) takes over that
+        drawing's description and specs instead of calling the AI.
+        
+        Args:
+            dwg_path: Path to DWG file
+            silent: Suppress output messages
+            converted_path: DXF already converted from dwg_path, if any
+            previous: Stored metadata of the file's current database record, if any
+            mode: Extraction mode (see extract_dwg_data); defaults to DWG_INDEX_MODE
+            
+        Returns:
+            Dict with id, document, metadata, fingerprints and signature for write_database_entry(),
+            or None on failure
+        """
+        filename = os.path.basename(dwg_path)
+        
+        dwg_data = self.extract_dwg_data(dwg_path, silent=silent, mode=mode or self.index_mode,
+                                         converted_path=converted_path)
+        if not dwg_data:
+            return None
+        
+        embedding_id = generate_embedding_id(dwg_path)
+        content_hash = self._content_hash(dwg_path) or ''
+        extraction_mode = dwg_data['metadata']['extraction_mode']
+        
+        if extraction_mode == 'sample':
+            # Only a summary was kept: earlier sidecars stay, and the AI analysis is redone
+            fingerprints = None
+            delta = {'added': dwg_data['metadata']['entity_count'], 'removed': 0, 'unchanged': 0, 'material': True}
+        else:
+            # Spatial index sidecar for region queries (see spatialIndex.query_drawing_region)
+            save_drawing_index(embedding_id, dwg_data)
+            
+            # Polyline and hatch vertices (see geometryStore.load_drawing_geometry)
+            paths = as_entity_store(dwg_data['entities']).paths
+            if len(paths):
+                save_drawing_geometry(embedding_id, paths)
+            
+            # Entity-level delta against the stored revision
+            fingerprints = fingerprint_entities(dwg_data)
+            delta = compute_delta(load_fingerprints(embedding_id) if previous else None, fingerprints)
+        if previous and content_hash and previous.get('content_hash') == content_hash:
+            delta['material'] = False  # same file, extracted in another mode
+        reuse_ai = bool(previous) and not delta['material'] and 'description' in previous
+        
+        # Position-independent signature for near-duplicate lookups; text and sample mode
+        # see too little of the drawing, so the signature of the last full pass stays
+        signature = drawing_signature(dwg_data) if extraction_mode not in ('text', 'sample') else None
+        near_duplicate = None
+        if signature is not None and not reuse_ai:
+            near_duplicate = self.find_near_duplicate(signature, exclude=embedding_id)
+        
+        # Full entity records for get_from_database() and CSV export (see entityTable);
+        # text mode only has the annotations and sample mode none, so the table waits for a full pass
+        has_entity_table = (extraction_mode not in ('text', 'sample')
+                            and save_entity_table(embedding_id, dwg_data, source_path=dwg_path))
+        
+        if reuse_ai:
+            description = previous['description']
+            previous_specs = json.loads(previous.get('specs') or '{}')
+            ai_specs = {key: value for key, value in previous_specs.items() if key not in dwg_data['metadata']}
+            ai_analyzed = bool(previous.get('ai_analyzed'))
+        elif near_duplicate:
+            # A nearly identical drawing was already analyzed: take over its description and specs
+            source, similarity = near_duplicate
+            description = source['description']
+            source_specs = json.loads(source.get('specs') or '{}')
+            ai_specs = {key: value for key, value in source_specs.items() if key not in dwg_data['metadata']}
+            ai_analyzed = bool(source.get('ai_analyzed'))
+            if not silent:
+                print(Fore.CYAN + f"≈ {similarity:.0%} match with {source.get('filename', '')}, "
+                      f"AI analysis reused " + Style.RESET_ALL, end='')
+        else:
+            # Generate description for embedding
+            description = self.create_description(dwg_data)
+            
+            # Extract specs using AI (only if entities found)
+            ai_specs = {}
+            if dwg_data['metadata']['entity_count'] > 0:
+                ai_specs = self.extract_specs_with_ai(dwg_data)
+            ai_analyzed = bool(ai_specs)
+        
+        # Merge with metadata
+        combined_specs = {**dwg_data['metadata'], **ai_specs}
+        
+        try:
+            stat = os.stat(dwg_path)
+            file_size, file_mtime = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            file_size, file_mtime = 0, 0
+        
+        # Prepare metadata
+        metadata = {
+            'filename': filename,
+            'filepath': os.path.abspath(dwg_path),
+            'file_type': 'dwg',
+            'description': description,
+            'entity_count': dwg_data['metadata']['entity_count'],
+            'layer_count': dwg_data['metadata']['layer_count'],
+            'block_count': dwg_data['metadata']['block_count'],
+            'specs': json.dumps(combined_specs),
+            'ai_analyzed': ai_analyzed,  # Flag if AI analysis was successful
+            'content_hash': content_hash,
+            'extraction_mode': extraction_mode,
+            'file_size': file_size,
+            'file_mtime': file_mtime,
+            'revision': int((previous or {}).get('revision', 0)) + 1,
+            'delta_added': delta['added'],
+            'delta_removed': delta['removed'],
+            'material_change': delta['material']
+        }
+        if near_duplicate:
+            metadata['near_duplicate_of'] = near_duplicate[0].get('filepath', '')
+            metadata['near_duplicate_similarity'] = near_duplicate[1]
+        if not has_entity_table:
+            metadata['csv_data'] = self.convert_to_csv(dwg_data)[:1000]  # Store first 1000 chars of CSV
+        
+        # Generate natural language from CSV entity data
+        nl_from_entities = self.csv_to_natural_language(dwg_data)
+
+        # Combine everything for rich embeddings
+        searchable_text = f"{description} {nl_from_entities} {dwg_data['text_content']}"
+        
+        return {
+            'id': embedding_id,
+            'document': searchable_text,
+            'metadata': metadata,
+            'fingerprints': fingerprints,
+            'signature': signature
+        }
+    
+    def find_near_duplicate(self, signature, exclude: Optional[str] = None) -> Optional[Tuple[Dict, float]]:
+        """
+        The stored drawing most similar to a MinHash signature, if it reaches
+        near_duplicate_threshold and has a description to reuse.
+        
+        Returns:
+            Tuple of (its stored metadata, estimated similarity), or None
+        """
+        if self.near_duplicate_threshold >= 1:
+            return None
+        for drawing_id, similarity in find_near_duplicates(signature, self.near_duplicate_threshold, exclude=exclude):
+            try:
+                stored = collection.get(ids=[drawing_id])
+            except Exception:
+                continue
+            metadatas = stored.get('metadatas') or []
+            if metadatas and metadatas[0] and metadatas[0].get('description'):
+                return metadatas[0], similarity
+        return None
+
+    def refresh_file_stamp(self, dwg_path: str, stored: Dict) -> None:
+        """Record a new size/mtime for a file whose content did not change."""
+        stat = os.stat(dwg_path)
+        collection.update(
+            ids=[generate_embedding_id(dwg_path)],
+            metadatas=[{**stored, 'file_size': stat.st_size, 'file_mtime': stat.st_mtime_ns}]
+        )
+
+    def add_to_database(self, dwg_path: str, silent: bool = False,
+                        converted_path: Optional[str] = None,
+                        mode: Optional[str] = None) -> bool:
         """
         Process DWG file and add to vector database.
         
+        A new revision of a file that is already stored is re-ingested in place;
+        the AI analysis is only redone when its text or dimensions changed.
+        
         Args:
             dwg_path: Path to DWG file
             silent: Suppress output messages
+            converted_path: DXF already converted from dwg_path, if any
+            mode: Extraction mode (see extract_dwg_data); defaults to DWG_INDEX_MODE
             
         Returns:
             True if successful, False otherwise
@@ -629,64 +1273,36 @@ Return ONLY valid JSON, no markdown formatting."""
             filename = os.path.basename(dwg_path)
             
             # Check if already in database
-            if file_exists_in_database(dwg_path):
+            stored = get_stored_metadata(dwg_path)
+            status = self.check_revision(dwg_path, stored, mode)
+            if status == 'unchanged':
                 if not silent:
                     print(Fore.YELLOW + f"⚠ Already in DB" + Style.RESET_ALL)
                 return True
+            if status == 'touched':
+                self.refresh_file_stamp(dwg_path, stored)
+                if not silent:
+                    print(Fore.YELLOW + f"⚠ Already in DB (unchanged content)" + Style.RESET_ALL)
+                return True
             
             # Extract DWG data
             if not silent:
                 print(Fore.BLUE + f"[{filename}] " + Style.RESET_ALL, end='')
             
-            dwg_data = self.extract_dwg_data(dwg_path, silent=silent)
-            if not dwg_data:
+            entry = self.build_database_entry(dwg_path, silent=silent, converted_path=converted_path,
+                                              previous=stored, mode=mode)
+            if not entry:
                 return False
             
-            # Convert to CSV
-            csv_content = self.convert_to_csv(dwg_data)
-            
-            # Generate description for embedding
-            description = self.create_description(dwg_data)
-            
-            # Extract specs using AI (only if not silent and entities found)
-            ai_specs = {}
-            if dwg_data['metadata']['entity_count'] > 0:
-                ai_specs = self.extract_specs_with_ai(dwg_data)
-            
-            # Merge with metadata
-            combined_specs = {**dwg_data['metadata'], **ai_specs}
-            
-            # Create unique ID
-            embedding_id = generate_embedding_id(dwg_path)
-            
-            # Prepare metadata
-            metadata = {
-                'filename': filename,
-                'filepath': os.path.abspath(dwg_path),
-                'file_type': 'dwg',
-                'description': description,
-                'entity_count': dwg_data['metadata']['entity_count'],
-                'layer_count': dwg_data['metadata']['layer_count'],
-                'block_count': dwg_data['metadata']['block_count'],
-                'csv_data': csv_content[:1000],  # Store first 1000 chars of CSV
-                'specs': json.dumps(combined_specs),
-                'ai_analyzed': bool(ai_specs)  # Flag if AI analysis was successful
-            }
-            
-            # Generate natural language from CSV entity data
-            nl_from_entities = self.csv_to_natural_language(dwg_data)
-
-            # Combine everything for rich embeddings
-            searchable_text = f"{description} {nl_from_entities} {dwg_data['text_content']}"
-
-            collection.add(
-                ids=[embedding_id],
-                documents=[searchable_text],
-                metadatas=[metadata]
-            )
+            write_database_entry(entry)
             
             if not silent:
-                print(Fore.GREEN + f"✓ Added to DB" + Style.RESET_ALL)
+                if status == 'new':
+                    print(Fore.GREEN + f"✓ Added to DB" + Style.RESET_ALL)
+                elif not entry['metadata']['material_change']:
+                    print(Fore.GREEN + f"✓ Updated revision (metadata only)" + Style.RESET_ALL)
+                else:
+                    print(Fore.GREEN + f"✓ Reprocessed revision" + Style.RESET_ALL)
             
             return True
             
@@ -695,12 +1311,20 @@ Return ONLY valid JSON, no markdown formatting."""
                 print(Fore.RED + f"✗ Failed: {str(e)[:30]}" + Style.RESET_ALL)
             return False
     
-    def get_from_database(self, filename_or_path: str) -> Optional[Dict]:
+    def get_from_database(self, filename_or_path: str,
+                          entity_types: Optional[List[str]] = None,
+                          layers: Optional[List[str]] = None,
+                          layouts: Optional[List[str]] = None,
+                          limit: Optional[int] = None) -> Optional[Dict]:
         """
         Retrieve DWG data from database.
         
+        Entity records are read from the drawing's saved entity table, never from
+        the source file. Passing entity_types, layers, layouts or limit adds the
+        matching records under 'entities'.
+        
         Returns:
-            Dict with filename, filepath, description, csv_data, specs
+            Dict with filename, filepath, description, csv_data (a preview), specs
         """
         try:
             abs_path = filename_or_path if os.path.isabs(filename_or_path) else filename_or_path
@@ -710,23 +1334,80 @@ Return ONLY valid JSON, no markdown formatting."""
             
             if results and results.get("ids"):
                 meta = results.get("metadatas", [{}])[0] or {}
+                table = load_entity_table(embedding_id)
                 
-                return {
+                csv_data = meta.get('csv_data', '')
+                if not csv_data and table is not None:
+                    preview = {'entities': table.select(limit=50), 'layers': [], 'blocks': []}
+                    csv_data = self.convert_to_csv(preview)[:1000]
+                
+                data = {
                     'filename': meta.get('filename', os.path.basename(filename_or_path)),
                     'filepath': meta.get('filepath', filename_or_path),
                     'description': results.get('documents', [''])[0],
-                    'csv_data': meta.get('csv_data', ''),
+                    'csv_data': csv_data,
                     'entity_count': meta.get('entity_count', 0),
                     'layer_count': meta.get('layer_count', 0),
                     'block_count': meta.get('block_count', 0),
                     'specs': json.loads(meta.get('specs', '{}'))
                 }
+                if table is not None and (entity_types or layers or layouts or limit):
+                    data['entities'] = table.select(entity_types, layers, layouts, limit=limit)
+                return data
         except Exception as e:
             print(Fore.RED + f"Error retrieving DWG {filename_or_path}: {e}" + Style.RESET_ALL)
         
         return None
 
 
+def write_database_entry(entry: Dict) -> None:
+    """
+    Write a record prepared by DWGProcessor.build_database_entry() to the collection,
+    replacing an earlier revision of the same file, then store its entity fingerprints
+    and near-duplicate signature.
+    """
+    collection.upsert(
+        ids=[entry['id']],
+        documents=[entry['document']],
+        metadatas=[entry['metadata']]
+    )
+    if entry.get('fingerprints') is not None:
+        save_fingerprints(entry['id'], entry['fingerprints'])
+    if entry.get('signature') is not None:
+        save_signature(entry['id'], entry['signature'])
+
+
+def _is_dwg(path: str) -> bool:
+    """True if the file starts with a DWG version signature."""
+    try:
+        return detect_format(path) == FORMAT_DWG
+    except OSError:
+        return False
+
+
+def iter_converted_batches(dwg_files: List[str], processor: DWGProcessor,
+                           batch_size: int = ODA_BATCH_SIZE,
+                           silent: bool = False) -> Iterator[Tuple[List[str], Dict[str, Optional[str]]]]:
+    """
+    Yield (files, converted) per batch of `batch_size` files, where `converted` is the
+    DWGProcessor.convert_dwg_batch() result for that batch.
+    
+    The next batch is converted in a background thread while the caller works on
+    the current one, so ODA conversion overlaps with extraction.
+    """
+    batches = [dwg_files[i:i + batch_size] for i in range(0, len(dwg_files), max(1, batch_size))]
+    if not batches:
+        return
+    
+    with ThreadPoolExecutor(max_workers=1) as converter:
+        future = converter.submit(processor.convert_dwg_batch, batches[0], silent)
+        for index, batch in enumerate(batches):
+            converted = future.result()
+            if index + 1 < len(batches):
+                future = converter.submit(processor.convert_dwg_batch, batches[index + 1], silent)
+            yield batch, converted
+
+
 # Convenience functions for easy integration
 def find_dwg_files(directory: str, silent: bool = False) -> List[str]:
     """
@@ -765,14 +1446,235 @@ def process_dwg_file(dwg_path: str, silent: bool = False) -> bool:
     return processor.add_to_database(dwg_path, silent=silent)
 
 
-def batch_process_dwg_folder(folder_path: str, silent: bool = False) -> Tuple[int, int]:
+# One processor per worker process, created on first use
+_worker_processor = None
+
+
+def _init_worker(data_dir: Optional[str] = None) -> None:
+    """
+    Process-pool initializer. With `data_dir`, the worker keeps its sidecars, extraction
+    cache and AI response cache there instead of the configured locations, so a batch
+    (e.g. a test run) leaves the shared stores untouched.
+    """
+    global _worker_processor
+    if not data_dir:
+        return
+    drawingStore.DRAWING_DATA_DIR = Path(data_dir) / 'drawing_data'
+    llm_cache.path = Path(data_dir) / 'llm_cache.sqlite'
+    _worker_processor = DWGProcessor(cache=ExtractionCache(Path(data_dir) / 'extraction_cache'))
+
+
+def _build_entry_worker(dwg_path: str, converted_path: Optional[str] = None,
+                        previous: Optional[Dict] = None,
+                        mode: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+    """Process-pool task: extract one DWG and return its database record (no DB writes)."""
+    global _worker_processor
+    try:
+        if _worker_processor is None:
+            _worker_processor = DWGProcessor()
+        if converted_path and not os.path.exists(converted_path):
+            converted_path = None  # used up by an earlier attempt that was interrupted
+        entry = _worker_processor.build_database_entry(dwg_path, silent=True, converted_path=converted_path,
+                                                       previous=previous, mode=mode)
+        return entry, None if entry else "extraction failed"
+    except Exception as e:
+        return None, str(e)
+
+
+def _terminate_executor(executor: ProcessPoolExecutor) -> None:
+    """Shut down a process pool and kill workers that are stuck on a file."""
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        try:
+            process.terminate()
+        except Exception:
+            pass
+
+
+def process_dwg_files_parallel(dwg_files: List[str], workers: int = DWG_WORKERS,
+                               file_timeout: Optional[float] = DWG_FILE_TIMEOUT,
+                               silent: bool = False,
+                               batch_convert: bool = True,
+                               previous: Optional[Dict[str, Dict]] = None,
+                               mode: Optional[str] = None,
+                               data_dir: Optional[str] = None) -> Tuple[int, int, List[Dict]]:
+    """
+    Process DWG files in a pool of worker processes.
+    
+    Workers do extraction and AI analysis; every database write happens here in
+    the calling process so the collection only ever has a single writer.
+    At most `workers` files are in flight, so a file's timeout clock starts when a
+    worker picks it up. Timed-out workers are killed and the pool is restarted.
+    
+    Args:
+        dwg_files: Paths to process
+        workers: Number of worker processes
+        file_timeout: Seconds allowed per file (None or 0 for no limit)
+        silent: Suppress per-file progress output
+        batch_convert: Convert DWG files to DXF in batches of ODA_BATCH_SIZE
+            (see iter_converted_batches) instead of one ODA run per file in the workers
+        previous: Stored metadata by path for files that are new revisions of
+            database records (see select_files_to_ingest)
+        mode: Extraction mode (see extract_dwg_data); defaults to DWG_INDEX_MODE
+        data_dir: Directory the workers use for sidecars and caches instead of the
+            configured ones (see _init_worker); database writes are unaffected
+        
+    Returns:
+        Tuple of (success_count, failure_count, per-file results). Each result is a
+        dict with filepath, status ('added', 'failed' or 'timeout'), seconds and error.
+    """
+    total = len(dwg_files)
+    previous = previous or {}
+    running = {}  # future -> (path, start time)
+    results = []
+    success = 0
+    failed = 0
+    
+    converter = DWGProcessor()  # owns the converted DXF files until the workers use them
+    converted: Dict[str, Optional[str]] = {}
+    pending = deque()
+    if batch_convert:
+        batches = iter_converted_batches(dwg_files, converter, silent=True)
+    else:
+        batches = iter([(list(dwg_files), {})])
+    
+    def record(path, status, started, error=None):
+        nonlocal success, failed
+        elapsed = time.monotonic() - started
+        results.append({'filepath': path, 'status': status, 'seconds': round(elapsed, 2), 'error': error})
+        if status == 'added':
+            success += 1
+        else:
+            failed += 1
+        if not silent:
+            color = Fore.GREEN if status == 'added' else Fore.RED
+            mark = '✓' if status == 'added' else '✗'
+            detail = f" - {error[:40]}" if error else ''
+            print(color + f"[{len(results)}/{total}] {mark} {os.path.basename(path)} "
+                  f"({elapsed:.1f}s){detail}" + Style.RESET_ALL)
+    
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_dir,))
+    try:
+        while True:
+            while len(running) < workers:
+                if not pending:
+                    batch, batch_converted = next(batches, (None, None))
+                    if batch is None:
+                        break
+                    pending.extend(batch)
+                    converted.update(batch_converted)
+                path = pending.popleft()
+                if path in converted and not converted[path]:
+                    record(path, 'failed', time.monotonic(), "DWG conversion failed")
+                    continue
+                future = executor.submit(_build_entry_worker, path, converted.get(path), previous.get(path), mode)
+                running[future] = (path, time.monotonic())
+            
+            if not running:
+                break
+            
+            wait_time = None
+            if file_timeout:
+                oldest = min(started for _, started in running.values())
+                wait_time = max(0.0, oldest + file_timeout - time.monotonic())
+            
+            done, _ = wait(running, timeout=wait_time, return_when=FIRST_COMPLETED)
+            
+            pool_broken = False
+            for future in done:
+                path, started = running.pop(future)
+                try:
+                    entry, error = future.result()
+                except Exception as e:  # BrokenProcessPool when a worker dies
+                    entry, error = None, str(e) or type(e).__name__
+                    pool_broken = True
+                if entry:
+                    try:
+                        write_database_entry(entry)
+                        record(path, 'added', started)
+                    except Exception as e:
+                        record(path, 'failed', started, str(e))
+                else:
+                    record(path, 'failed', started, error)
+            
+            if file_timeout:
+                now = time.monotonic()
+                expired = [f for f, (_, started) in running.items() if now - started >= file_timeout]
+                for future in expired:
+                    path, started = running.pop(future)
+                    record(path, 'timeout', started, f"timed out after {file_timeout:.0f}s")
+                if expired:
+                    pool_broken = True
+            
+            if pool_broken:
+                # Files still in flight lose their progress and go back in the queue
+                for path, _ in running.values():
+                    pending.appendleft(path)
+                running.clear()
+                _terminate_executor(executor)
+                executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                               initargs=(data_dir,))
+    finally:
+        _terminate_executor(executor)
+    
+    return success, failed, results
+
+
+def select_files_to_ingest(dwg_files: List[str], processor: DWGProcessor,
+                           mode: Optional[str] = None) -> Tuple[List[str], Dict[str, Dict], int]:
+    """
+    Split files into those that need processing and those already up to date.
+    
+    Files whose timestamp changed but whose content did not only get their stored
+    stamp refreshed.
+    
+    Returns:
+        Tuple of (files to process, stored metadata by path for files that are new
+        revisions of database records, number of files skipped)
+    """
+    to_process = []
+    previous = {}
+    for path in dwg_files:
+        stored = get_stored_metadata(path)
+        status = processor.check_revision(path, stored, mode)
+        if status == 'touched':
+            try:
+                processor.refresh_file_stamp(path, stored)
+            except Exception:
+                pass
+        elif status in ('new', 'changed'):
+            to_process.append(path)
+            if stored is not None:
+                previous[path] = stored
+    return to_process, previous, len(dwg_files) - len(to_process)
+
+
+def dwg_needs_processing(dwg_path: str) -> bool:
+    """True if a DWG file is not in the database or has changed since it was added."""
+    to_process, _, _ = select_files_to_ingest([dwg_path], DWGProcessor())
+    return bool(to_process)
+
+
+def batch_process_dwg_folder(folder_path: str, silent: bool = False,
+                             workers: Optional[int] = None,
+                             file_timeout: Optional[float] = None,
+                             mode: Optional[str] = None) -> Tuple[int, int]:
     """
     Process all DWG files in a folder.
     
+    Args:
+        folder_path: Root folder to scan
+        silent: Suppress output
+        workers: Worker processes (defaults to DWG_WORKERS); 1 processes files in order
+        file_timeout: Per-file timeout in seconds for parallel mode (defaults to DWG_FILE_TIMEOUT)
+        mode: Extraction mode (see extract_dwg_data); defaults to DWG_INDEX_MODE
+    
     Returns:
         Tuple of (success_count, failure_count)
     """
-    processor = DWGProcessor()
+    workers = workers or DWG_WORKERS
+    file_timeout = DWG_FILE_TIMEOUT if file_timeout is None else file_timeout
     dwg_files = []
     
     # Find all DWG files
@@ -787,7 +1689,7 @@ def batch_process_dwg_folder(folder_path: str, silent: bool = False) -> Tuple[in
     
     print(Fore.CYAN + f"Found {len(dwg_files)} DWG files\n" + Style.RESET_ALL)
     
-    if not DWG_CONVERSION_AVAILABLE:
+    if not is_dwg_conversion_available():
         print(Fore.YELLOW + "⚠ ODA File Converter not found - only DXF files will process" + Style.RESET_ALL)
         print(Fore.YELLOW + "  Download from: https://www.opendesign.com/guestfiles/oda_file_converter\n" + Style.RESET_ALL)
     
@@ -795,19 +1697,37 @@ def batch_process_dwg_folder(folder_path: str, silent: bool = False) -> Tuple[in
     failed = 0
     skipped = 0
     
-    for idx, dwg_path in enumerate(dwg_files, 1):
-        # Check if already in DB
-        if file_exists_in_database(dwg_path):
-            skipped += 1
-            continue
-        
-        # Show minimal progress
-        print(f"[{idx}/{len(dwg_files)}] ", end='')
-        
-        if processor.add_to_database(dwg_path, silent=False):
-            success += 1
-        else:
-            failed += 1
+    processor = DWGProcessor()
+    to_process, previous, skipped = select_files_to_ingest(dwg_files, processor, mode)
+    if previous:
+        print(Fore.CYAN + f"{len(previous)} files changed since they were added\n" + Style.RESET_ALL)
+    
+    if workers > 1:
+        print(Fore.CYAN + f"Processing {len(to_process)} files with {workers} workers\n" + Style.RESET_ALL)
+        success, failed, _ = process_dwg_files_parallel(to_process, workers=workers,
+                                                        file_timeout=file_timeout, previous=previous,
+                                                        mode=mode)
+    else:
+        idx = 0
+        for batch, converted in iter_converted_batches(to_process, processor):
+            for dwg_path in batch:
+                idx += 1
+                
+                # Show minimal progress
+                print(f"[{idx}/{len(to_process)}] ", end='')
+                
+                if dwg_path in converted and not converted[dwg_path]:
+                    # Already retried on its own by the batch conversion
+                    print(Fore.BLUE + f"[{os.path.basename(dwg_path)}] " + Style.RESET_ALL
+                          + Fore.RED + "✗ Conversion failed" + Style.RESET_ALL)
+                    failed += 1
+                    continue
+                
+                if processor.add_to_database(dwg_path, silent=False, converted_path=converted.get(dwg_path),
+                                             mode=mode):
+                    success += 1
+                else:
+                    failed += 1
     
     # Summary
     print(Fore.CYAN + f"\n{'='*60}" + Style.RESET_ALL)
@@ -840,7 +1760,12 @@ def export_dwg_to_csv(dwg_path: str, output_csv_path: Optional[str] = None) -> b
     
     print(Fore.CYAN + f"Processing: {os.path.basename(dwg_path)}" + Style.RESET_ALL)
     
-    data = processor.extract_dwg_data(dwg_path, silent=False)
+    # Drawings ingested since they last changed are exported from their saved entity table
+    table = load_entity_table(generate_embedding_id(dwg_path))
+    if table is not None and table.matches_source(dwg_path):
+        data = table.as_dwg_data()
+    else:
+        data = processor.extract_dwg_data(dwg_path, silent=False)
     
     if not data:
         print(Fore.RED + "✗ Failed to extract data from DWG" + Style.RESET_ALL)
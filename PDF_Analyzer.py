@@ -19,8 +19,9 @@ from config import (
     OCR_PSM, OCR_OEM, GROK_MODEL, OPENAI_MODEL,
     DEFAULT_TEMPERATURE, DEFAULT_MAX_TOKENS, ENABLE_OCR
 )
-from utils import grok_client, openai_client, chat_with_ai, clean_specs
+from utils import grok_client, openai_client, chat_with_ai, clean_specs, grok_complete, openai_complete
 from semanticMemory import add_to_database, file_exists_in_database, list_database_files
+from drawingClassifier import LABEL_AMBIGUOUS, LABEL_DRAWING, LABEL_NOT_DRAWING, classify_pdf_text
 
 # Set Tesseract path from config
 pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
@@ -105,11 +106,38 @@ def ocr_full_document(pdf_path, silent=False):
             print(Fore.RED + f"✗ OCR failed: {e}" + Style.RESET_ALL)
         return ""
 
+def pdf_page_size(pdf_path):
+    """(width, height) in points of the first page, or None if it cannot be read."""
+    try:
+        import fitz
+        with fitz.open(pdf_path) as doc:
+            if doc.page_count:
+                rect = doc[0].rect
+                return (rect.width, rect.height)
+    except Exception:
+        pass
+    return None
+
+def classify_pdf(pdf_path, text):
+    """Local drawing verdict for a PDF (see drawingClassifier.classify_pdf_text)."""
+    return classify_pdf_text(text, pdf_page_size(pdf_path))
+
 def is_autocad_drawing_with_ai_fallback(pdf_path, text, silent=False):
-    """Use AI to determine if PDF contains an AutoCAD drawing."""
+    """Determine if PDF contains an AutoCAD drawing: local classifier first, AI for unclear cases."""
     if not text.strip(): 
         return False
     
+    verdict = classify_pdf(pdf_path, text)
+    if verdict["label"] != LABEL_AMBIGUOUS:
+        is_drawing = verdict["label"] == LABEL_DRAWING
+        if not silent: 
+            print(Fore.GREEN + ("✓ Drawing" if is_drawing else "✗ Not a drawing") +
+                  f" (local score {verdict['score']:.2f})" + Style.RESET_ALL)
+        return is_drawing
+    return ai_is_autocad_drawing(text, silent=silent)
+
+def ai_is_autocad_drawing(text, silent=False):
+    """Use AI to determine if text comes from an AutoCAD drawing."""
     prompt = f"""Is this text from a technical AutoCAD/CAD drawing?
 
 Text: {text[:3000]}
@@ -120,12 +148,9 @@ Answer ONLY 'Yes' or 'No'."""
         try:
             if not silent: 
                 print(Fore.BLUE + "→ Validating with Grok..." + Style.RESET_ALL, end=' ')
-            resp = grok_client.chat(
-                [{"role": "user", "content": prompt}], 
-                model=GROK_MODEL
-            )
-            if resp and "choices" in resp:
-                result = resp["choices"][0]["message"]["content"].strip().lower()
+            result = grok_complete(prompt, model=GROK_MODEL)
+            if result is not None:
+                result = result.lower()
                 if not silent: 
                     print(Fore.GREEN + ("✓ Yes" if "yes" in result else "✗ No") + Style.RESET_ALL)
                 return "yes" in result
@@ -137,13 +162,7 @@ Answer ONLY 'Yes' or 'No'."""
         try:
             if not silent: 
                 print(Fore.BLUE + "→ Validating with OpenAI..." + Style.RESET_ALL, end=' ')
-            resp = openai_client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0, 
-                max_tokens=10
-            )
-            result = resp.choices[0].message.content.strip().lower()
+            result = openai_complete(prompt, model=OPENAI_MODEL, temperature=0, max_tokens=10).lower()
             if not silent: 
                 print(Fore.GREEN + ("✓ Yes" if "yes" in result else "✗ No") + Style.RESET_ALL)
             return "yes" in result
@@ -153,6 +172,13 @@ Answer ONLY 'Yes' or 'No'."""
     
     return False
 
+def _strip_code_fences(result):
+    """Drop markdown code fence lines around a JSON reply."""
+    if result.startswith("```"):
+        result = '\n'.join([line for line in result.split('\n') 
+                            if not line.strip().startswith("```")])
+    return result
+
 def extract_specs_with_ai(text, silent=False):
     """Extract technical specifications from text using AI."""
     if not text.strip(): 
@@ -169,16 +195,10 @@ Return ONLY valid JSON, no markdown formatting."""
         try:
             if not silent: 
                 print(Fore.BLUE + "→ Extracting specs with Grok..." + Style.RESET_ALL, end=' ')
-            resp = grok_client.chat(
-                [{"role": "user", "content": prompt}], 
-                model=GROK_MODEL
-            )
-            if resp and "choices" in resp:
-                result = resp["choices"][0]["message"]["content"].strip()
+            result = grok_complete(prompt, model=GROK_MODEL)
+            if result is not None:
                 # Remove markdown code blocks
-                if result.startswith("```"):
-                    result = '\n'.join([line for line in result.split('\n') 
-                                      if not line.strip().startswith("```")])
+                result = _strip_code_fences(result)
                 specs = clean_specs(json.loads(result))
                 if not silent: 
                     print(Fore.GREEN + f"✓ {len(specs)} fields" + Style.RESET_ALL)
@@ -191,17 +211,10 @@ Return ONLY valid JSON, no markdown formatting."""
         try:
             if not silent: 
                 print(Fore.BLUE + "→ Extracting specs with OpenAI..." + Style.RESET_ALL, end=' ')
-            resp = openai_client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=DEFAULT_TEMPERATURE, 
-                max_tokens=DEFAULT_MAX_TOKENS
-            )
-            result = resp.choices[0].message.content.strip()
+            result = openai_complete(prompt, model=OPENAI_MODEL, temperature=DEFAULT_TEMPERATURE,
+                                     max_tokens=DEFAULT_MAX_TOKENS)
             # Remove markdown code blocks
-            if result.startswith("```"):
-                result = '\n'.join([line for line in result.split('\n') 
-                                  if not line.strip().startswith("```")])
+            result = _strip_code_fences(result)
             specs = clean_specs(json.loads(result))
             if not silent: 
                 print(Fore.GREEN + f"✓ {len(specs)} fields" + Style.RESET_ALL)
@@ -225,12 +238,9 @@ Be concise and technical."""
         try:
             if not silent: 
                 print(Fore.BLUE + "→ Generating description with Grok..." + Style.RESET_ALL)
-            resp = grok_client.chat(
-                [{"role": "user", "content": prompt}], 
-                model=GROK_MODEL
-            )
-            if resp and "choices" in resp:
-                return resp["choices"][0]["message"]["content"].strip()
+            result = grok_complete(prompt, model=GROK_MODEL)
+            if result is not None:
+                return result
         except Exception as e:
             if not silent:
                 print(Fore.YELLOW + f"Grok error: {e}" + Style.RESET_ALL)
@@ -239,13 +249,7 @@ Be concise and technical."""
         try:
             if not silent: 
                 print(Fore.BLUE + "→ Generating description with OpenAI..." + Style.RESET_ALL)
-            resp = openai_client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=DEFAULT_TEMPERATURE, 
-                max_tokens=200
-            )
-            return resp.choices[0].message.content.strip()
+            return openai_complete(prompt, model=OPENAI_MODEL, temperature=DEFAULT_TEMPERATURE, max_tokens=200)
         except Exception as e:
             if not silent:
                 print(Fore.YELLOW + f"OpenAI error: {e}" + Style.RESET_ALL)
@@ -253,6 +257,87 @@ Be concise and technical."""
     # Fallback description
     return f"AutoCAD drawing: {os.path.basename(pdf_path) if pdf_path else 'Unknown'}"
 
+def parse_drawing_analysis(result):
+    """
+    Validate the JSON reply of analyze_drawing_with_ai().
+    
+    Returns:
+        Dict with is_drawing (bool), specs (cleaned dict) and description (str,
+        non-empty for drawings), or None if the reply does not have that shape
+    """
+    try:
+        data = json.loads(_strip_code_fences(result.strip()))
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    
+    is_drawing = data.get("is_drawing")
+    if isinstance(is_drawing, str) and is_drawing.strip().lower() in ("yes", "no", "true", "false"):
+        is_drawing = is_drawing.strip().lower() in ("yes", "true")
+    if not isinstance(is_drawing, bool):
+        return None
+    if not is_drawing:
+        return {"is_drawing": False, "specs": {}, "description": ""}
+    
+    specs = data.get("specs")
+    description = data.get("description")
+    if not isinstance(specs, dict) or not isinstance(description, str) or not description.strip():
+        return None
+    return {"is_drawing": True, "specs": clean_specs(specs), "description": description.strip()}
+
+def analyze_drawing_with_ai(text, silent=False):
+    """
+    Classify, extract specifications and describe in one AI request.
+    
+    Returns:
+        parse_drawing_analysis() result, or None if no provider returned a valid
+        reply (callers then fall back to the three separate calls)
+    """
+    prompt = f"""Analyze this text extracted from a PDF.
+
+Text: {text[:4000]}
+
+Return ONLY a JSON object, no markdown formatting, with these keys:
+"is_drawing": true if the text is from a technical AutoCAD/CAD drawing, otherwise false
+"specs": object of technical specifications (title, drawing_number, scale, dimensions, materials, notes, revisions, etc.), {{}} if not a drawing
+"description": brief technical description of the drawing (2-3 sentences), "" if not a drawing"""
+
+    if grok_client:
+        try:
+            if not silent: 
+                print(Fore.BLUE + "→ Analyzing with Grok..." + Style.RESET_ALL, end=' ')
+            result = grok_complete(prompt, model=GROK_MODEL)
+            analysis = parse_drawing_analysis(result) if result is not None else None
+            if analysis is not None:
+                if not silent: 
+                    print(Fore.GREEN + ("✓ Drawing" if analysis["is_drawing"] else "✗ Not a drawing") + Style.RESET_ALL)
+                return analysis
+            if not silent:
+                print(Fore.YELLOW + "no valid reply" + Style.RESET_ALL)
+        except Exception as e:
+            if not silent:
+                print(Fore.YELLOW + f"Grok error: {e}" + Style.RESET_ALL)
+    
+    if openai_client:
+        try:
+            if not silent: 
+                print(Fore.BLUE + "→ Analyzing with OpenAI..." + Style.RESET_ALL, end=' ')
+            result = openai_complete(prompt, model=OPENAI_MODEL, temperature=DEFAULT_TEMPERATURE,
+                                     max_tokens=DEFAULT_MAX_TOKENS)
+            analysis = parse_drawing_analysis(result) if result is not None else None
+            if analysis is not None:
+                if not silent: 
+                    print(Fore.GREEN + ("✓ Drawing" if analysis["is_drawing"] else "✗ Not a drawing") + Style.RESET_ALL)
+                return analysis
+            if not silent:
+                print(Fore.YELLOW + "no valid reply" + Style.RESET_ALL)
+        except Exception as e:
+            if not silent:
+                print(Fore.YELLOW + f"OpenAI error: {e}" + Style.RESET_ALL)
+    
+    return None
+
 def process_pdf(pdf_path, silent=False):
     """Main PDF processing pipeline."""
     if not os.path.exists(pdf_path):
@@ -277,17 +362,34 @@ def process_pdf(pdf_path, silent=False):
             print(Fore.RED + "✗ No text extracted" + Style.RESET_ALL)
         return False
     
-    # Validate it's an AutoCAD drawing
-    if not is_autocad_drawing_with_ai_fallback(pdf_path, text, silent=silent):
+    # Clear non-drawings need no AI call at all
+    verdict = classify_pdf(pdf_path, text)
+    if verdict["label"] == LABEL_NOT_DRAWING:
         if not silent: 
-            print(Fore.YELLOW + "⚠ Not an AutoCAD drawing" + Style.RESET_ALL)
+            print(Fore.YELLOW + f"⚠ Not an AutoCAD drawing (local score {verdict['score']:.2f})" + Style.RESET_ALL)
         return False
     
-    # Extract specifications
-    specs = extract_specs_with_ai(text, silent=silent)
-    
-    # Generate description
-    description = generate_description(specs, text, pdf_path, silent=silent)
+    # Classify, extract specifications and describe in one request
+    analysis = analyze_drawing_with_ai(text, silent=silent)
+    if analysis is not None:
+        if not analysis["is_drawing"]:
+            if not silent: 
+                print(Fore.YELLOW + "⚠ Not an AutoCAD drawing" + Style.RESET_ALL)
+            return False
+        specs = analysis["specs"]
+        description = analysis["description"]
+    else:
+        # No valid combined reply: validate, extract and describe step by step
+        if not is_autocad_drawing_with_ai_fallback(pdf_path, text, silent=silent):
+            if not silent: 
+                print(Fore.YELLOW + "⚠ Not an AutoCAD drawing" + Style.RESET_ALL)
+            return False
+        
+        # Extract specifications
+        specs = extract_specs_with_ai(text, silent=silent)
+        
+        # Generate description
+        description = generate_description(specs, text, pdf_path, silent=silent)
     
     # Add to database
     success = add_to_database(pdf_path, description, specs, silent=silent)
@@ -310,14 +412,23 @@ def find_pdf(list_all=False, root="."):
     print(Fore.CYAN + f"\n→ Scanning {total} PDF files..." + Style.RESET_ALL)
     
     autocad_pdfs = []
+    verdicts = {LABEL_DRAWING: 0, LABEL_NOT_DRAWING: 0, LABEL_AMBIGUOUS: 0}
     for idx, pdf_path in enumerate(all_pdfs, 1):
         text = extract_text(pdf_path, silent=True)
         if not text.strip() and OCR_AVAILABLE:
             text = ocr_full_document(pdf_path, silent=True)
-        if text.strip() and is_autocad_drawing_with_ai_fallback(pdf_path, text, silent=True):
+        if not text.strip():
+            continue
+        # Only PDFs the local classifier cannot decide are sent to the AI
+        verdict = classify_pdf(pdf_path, text)
+        verdicts[verdict["label"]] += 1
+        if verdict["label"] == LABEL_DRAWING or (
+                verdict["label"] == LABEL_AMBIGUOUS and ai_is_autocad_drawing(text, silent=True)):
             autocad_pdfs.append(pdf_path)
     
     print(Fore.GREEN + f"✓ Found {len(autocad_pdfs)} AutoCAD PDFs" + Style.RESET_ALL)
+    print(Fore.CYAN + f"  Decided locally: {verdicts[LABEL_DRAWING]} drawings, {verdicts[LABEL_NOT_DRAWING]} other | "
+          f"Checked with AI: {verdicts[LABEL_AMBIGUOUS]}" + Style.RESET_ALL)
     
     if list_all:
         for i, pdf in enumerate(autocad_pdfs, 1):
@@ -379,24 +490,16 @@ Be specific and reference the document details."""
 
     try:
         if grok_client:
-            resp = grok_client.chat(
-                [{"role": "user", "content": prompt}], 
-                model=GROK_MODEL
-            )
-            return resp["choices"][0]["message"]["content"].strip()
+            result = grok_complete(prompt, model=GROK_MODEL)
+            if result is not None:
+                return result
     except Exception as e:
         if not silent:
             print(Fore.RED + f"Grok failed: {e}" + Style.RESET_ALL)
 
     try:
         if openai_client:
-            resp = openai_client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-                max_tokens=400
-            )
-            return resp.choices[0].message.content.strip()
+            return openai_complete(prompt, model=OPENAI_MODEL, temperature=0, max_tokens=400)
     except Exception as e:
         if not silent:
             print(Fore.RED + f"OpenAI failed: {e}" + Style.RESET_ALL)
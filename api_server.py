@@ -5,7 +5,8 @@
 #**************************************************************************************************
 from fastapi import FastAPI, File, UploadFile, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List
 import os
@@ -18,13 +19,18 @@ init(autoreset=True)
 
 # Import our modules
 from config import API_HOST, API_PORT, API_CORS_ORIGINS, MAX_FILE_SIZE_MB
-from DWG_Processor import DWGProcessor, find_dwg_files, batch_process_dwg_folder
+from DWG_Processor import DWGProcessor, find_dwg_files, batch_process_dwg_folder, get_conversion_service
 from PDF_Analyzer import process_pdf, find_pdf
 from semanticMemory import (
     search_similar_files, list_database_files, get_from_database,
-    remove_from_database, get_database_stats, file_exists_in_database
+    remove_from_database, get_database_stats, file_exists_in_database,
+    generate_embedding_id
 )
+from spatialIndex import QUERY_MODES, query_drawing_region
+from entityTable import load_entity_table
 from utils import chat_with_ai
+from rateLimiter import PROVIDER_LIMITS, get_rate_limiter
+from llmCache import llm_cache
 
 #==================================================================================================
 # FASTAPI APP INITIALIZATION
@@ -108,6 +114,19 @@ async def get_stats():
     stats = get_database_stats()
     return stats
 
+@app.get("/api/conversion/metrics")
+async def get_conversion_metrics():
+    """Queue depth, active conversions and latency of the DWG conversion service."""
+    return get_conversion_service().metrics()
+
+@app.get("/api/ai/metrics")
+async def get_ai_metrics():
+    """Rate limiter counters of each AI provider and the AI response cache hit rate."""
+    return {
+        "providers": {provider: get_rate_limiter(provider).metrics() for provider in PROVIDER_LIMITS},
+        "cache": llm_cache.stats()
+    }
+
 @app.post("/api/upload/dwg", response_model=ProcessResponse)
 async def upload_dwg(file: UploadFile = File(...)):
     """Upload and process a DWG file."""
@@ -129,9 +148,9 @@ async def upload_dwg(file: UploadFile = File(...)):
                 file_type="dwg"
             )
         
-        # Process DWG
+        # Process DWG in a worker thread; concurrent uploads queue in the conversion service
         processor = DWGProcessor()
-        success = processor.add_to_database(temp_path, silent=True)
+        success = await run_in_threadpool(processor.add_to_database, temp_path, silent=True)
         
         if success:
             # Get the processed data
@@ -255,6 +274,88 @@ async def delete_file(filename: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/region/{filename:path}")
+async def query_region(filename: str,
+                       xmin: float = Query(...), ymin: float = Query(...),
+                       xmax: float = Query(...), ymax: float = Query(...),
+                       mode: str = Query("intersects"),
+                       types: Optional[str] = Query(None, description="Comma-separated DXF types, e.g. TEXT,MTEXT"),
+                       layout: Optional[str] = Query(None),
+                       limit: int = Query(1000, ge=1)):
+    """Find the entities and text of a processed DWG inside a rectangular region."""
+    if mode not in QUERY_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(QUERY_MODES)}")
+    
+    try:
+        entity_types = [t.strip().upper() for t in types.split(',') if t.strip()] if types else None
+        results = query_drawing_region(
+            generate_embedding_id(filename),
+            (xmin, ymin, xmax, ymax),
+            mode=mode,
+            entity_types=entity_types,
+            layouts=[layout] if layout else None
+        )
+        if results is None:
+            raise HTTPException(status_code=404, detail="No spatial index for this file - process it first")
+        
+        return {
+            "filename": filename,
+            "bbox": [xmin, ymin, xmax, ymax],
+            "count": len(results),
+            "entities": results[:limit]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _split_param(value: Optional[str], upper: bool = False) -> Optional[List[str]]:
+    """Comma-separated query parameter as a list (None when not given)."""
+    if not value:
+        return None
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    return [item.upper() for item in items] if upper else items
+
+@app.get("/api/entities/{filename:path}")
+async def get_entities(filename: str,
+                       types: Optional[str] = Query(None, description="Comma-separated DXF types, e.g. LINE,CIRCLE"),
+                       layers: Optional[str] = Query(None, description="Comma-separated layer names"),
+                       layout: Optional[str] = Query(None),
+                       offset: int = Query(0, ge=0),
+                       limit: int = Query(1000, ge=1)):
+    """Entity records of a processed DWG, filtered by type, layer and layout."""
+    try:
+        table = load_entity_table(generate_embedding_id(filename))
+        if table is None:
+            raise HTTPException(status_code=404, detail="No entity table for this file - process it first")
+        
+        entity_types = _split_param(types, upper=True)
+        layer_names = _split_param(layers)
+        layouts = [layout] if layout else None
+        return {
+            "filename": filename,
+            "total": len(table.indices(entity_types, layer_names, layouts)),
+            "offset": offset,
+            "entities": table.select(entity_types, layer_names, layouts, offset=offset, limit=limit)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/csv/{filename:path}")
+async def get_csv(filename: str):
+    """Full entity CSV of a processed DWG (same format as export_dwg_to_csv)."""
+    try:
+        table = load_entity_table(generate_embedding_id(filename))
+        if table is None:
+            raise HTTPException(status_code=404, detail="No entity table for this file - process it first")
+        return PlainTextResponse(DWGProcessor().convert_to_csv(table.as_dwg_data()), media_type="text/csv")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/question")
 async def ask_question(request: QuestionRequest):
     """Ask a question about a specific drawing."""
@@ -4,6 +4,7 @@
 #   Tests search accuracy, processing performance, and provides detailed statistics
 #**************************************************************************************************
 import os
+import sys
 import time
 import json
 import statistics
@@ -398,6 +399,227 @@ def test_database_size() -> Dict:
     
     return results
 
+#==================================================================================================
+# ENTITY HANDLER THROUGHPUT
+#==================================================================================================
+
+def build_synthetic_entities(dxftype: str, count: int):
+    """Model space of a new drawing holding `count` entities of one type (None if unsupported here)."""
+    import ezdxf
+    
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    if dxftype == 'INSERT' or dxftype == 'ATTRIB':
+        block = doc.blocks.new('PART')
+        block.add_circle((0, 0), 1)
+        block.add_attdef('NUM', (0, 0))
+    
+    for i in range(count):
+        x = float(i % 100)
+        y = float(i // 100)
+        if dxftype == 'LINE':
+            msp.add_line((x, y), (x + 1, y + 2))
+        elif dxftype == 'CIRCLE':
+            msp.add_circle((x, y), 0.5)
+        elif dxftype == 'ARC':
+            msp.add_arc((x, y), 0.5, 0, 90)
+        elif dxftype == 'LWPOLYLINE':
+            msp.add_lwpolyline([(x, y), (x + 1, y), (x + 1, y + 1, 0, 0, 0.5), (x, y + 1)], close=True)
+        elif dxftype == 'POLYLINE':
+            msp.add_polyline2d([(x, y), (x + 1, y), (x + 1, y + 1)])
+        elif dxftype == 'TEXT':
+            msp.add_text(f"NOTE {i}").set_placement((x, y))
+        elif dxftype == 'MTEXT':
+            msp.add_mtext(f"NOTE {i}\\PSECOND LINE", dxfattribs={'insert': (x, y)})
+        elif dxftype == 'INSERT':
+            msp.add_blockref('PART', (x, y))
+        elif dxftype == 'ATTRIB':
+            msp.add_blockref('PART', (x, y)).add_attrib('NUM', f"P-{i}", (x, y))
+        elif dxftype == 'DIMENSION':
+            msp.add_linear_dim(base=(x, y + 1), p1=(x, y), p2=(x + 1, y))
+        elif dxftype == 'HATCH':
+            msp.add_hatch().paths.add_polyline_path([(x, y), (x + 1, y), (x + 1, y + 1)])
+        elif dxftype == 'SPLINE':
+            msp.add_spline([(x, y), (x + 1, y + 2), (x + 2, y + 1), (x + 3, y + 3)])
+        elif dxftype == 'ELLIPSE':
+            msp.add_ellipse((x, y), major_axis=(1, 0), ratio=0.5)
+        elif dxftype == 'LEADER':
+            msp.add_leader([(x, y), (x + 1, y + 1), (x + 2, y + 1)])
+        elif dxftype in ('SOLID', 'TRACE'):
+            getattr(msp, 'add_' + dxftype.lower())([(x, y), (x + 1, y), (x, y + 1), (x + 1, y + 1)])
+        else:
+            return None
+    return msp
+
+
+def test_entity_handler_throughput(count: int = 2000, repeat: int = 3) -> Dict:
+    """
+    Entities per second of each registered entity handler on synthetic drawings.
+    
+    Times entityHandlers.extract_entities() over `count` entities of one type
+    (best of `repeat` runs), which is the inner loop of every extraction.
+    """
+    from entityHandlers import ENTITY_HANDLERS, extract_entities
+    
+    print(f"\n{Fore.CYAN}Measuring Entity Handler Throughput ({count} entities per type)...{Style.RESET_ALL}")
+    
+    results = {}
+    for dxftype in ENTITY_HANDLERS:
+        msp = build_synthetic_entities(dxftype, count)
+        if msp is None:
+            print(f"{Fore.YELLOW}  {dxftype:<12} no synthetic generator, skipped{Style.RESET_ALL}")
+            continue
+        entities = [e for e in msp if e.dxftype() == dxftype or e.dxftype() == 'INSERT']
+        
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            records = sum(1 for record in extract_entities(entities) if record['type'] == dxftype)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        
+        results[dxftype] = {
+            'records': records,
+            'seconds': best,
+            'entities_per_sec': records / best if best > 0 else 0
+        }
+        print(f"  {dxftype:<12} {results[dxftype]['entities_per_sec']:>12,.0f} entities/s")
+    
+    return results
+
+#==================================================================================================
+# NEAR-DUPLICATE DETECTION
+#==================================================================================================
+
+def build_synthetic_drawing(rng, count: int, offset=(0.0, 0.0)) -> List[Dict]:
+    """Entity records of a random drawing of lines, circles and notes, shifted by `offset`."""
+    records = []
+    for i in range(count):
+        x = float(rng.uniform(0, 1000)) + offset[0]
+        y = float(rng.uniform(0, 1000)) + offset[1]
+        layer = f"L{int(rng.integers(0, 20))}"
+        kind = rng.random()
+        if kind < 0.6:
+            dx, dy = (float(v) for v in rng.uniform(-500, 500, 2))
+            records.append({'type': 'LINE', 'layer': layer, 'color': 7, 'start': (x, y), 'end': (x + dx, y + dy),
+                            'length': (dx * dx + dy * dy) ** 0.5})
+        elif kind < 0.9:
+            records.append({'type': 'CIRCLE', 'layer': layer, 'color': 7, 'center': (x, y),
+                            'radius': float(rng.uniform(1, 400))})
+        else:
+            records.append({'type': 'TEXT', 'layer': 'NOTES', 'color': 7, 'position': (x, y), 'height': 2.5,
+                            'text': f"NOTE {int(rng.integers(0, 10000))} BOLT M{int(rng.integers(4, 24))}"})
+    return records
+
+
+def test_near_duplicate_detection(drawings: int = 300, entities: int = 400,
+                                  edit_fraction: float = 0.03, threshold: float = 0.9) -> Dict:
+    """
+    Recall and lookup speed of the MinHash/LSH near-duplicate index.
+    
+    Indexes `drawings` random drawings, then looks up a copy of each that is moved
+    and has `edit_fraction` of its entities redrawn. File hashes (as used by
+    analyze_database_files) match none of these copies. Times the LSH lookup
+    against comparing the signature with every stored one.
+    """
+    import numpy as np
+    from entityStore import EntityStore
+    from nearDuplicate import NearDuplicateIndex, drawing_signature, estimate_similarity
+    
+    print(f"\n{Fore.CYAN}Measuring Near-Duplicate Detection ({drawings} drawings, "
+          f"{edit_fraction:.0%} of entities edited)...{Style.RESET_ALL}")
+    
+    def signature_of(records):
+        store = EntityStore()
+        for record in records:
+            store.append_record(record)
+        return drawing_signature({'entities': store, 'text_content': ''})
+    
+    rng = np.random.default_rng(0)
+    index = NearDuplicateIndex()
+    copies = []
+    for i in range(drawings):
+        records = build_synthetic_drawing(np.random.default_rng(i), entities)
+        index.add(f"drawing-{i}", signature_of(records))
+        moved = build_synthetic_drawing(np.random.default_rng(i), entities, offset=(250.0, -80.0))
+        for j in rng.choice(entities, int(entities * edit_fraction), replace=False):
+            moved[j] = build_synthetic_drawing(rng, 1)[0]
+        copies.append(moved)
+    start = time.perf_counter()
+    copy_signatures = [signature_of(records) for records in copies]
+    signature_seconds = time.perf_counter() - start
+    
+    found = false_matches = candidates = 0
+    start = time.perf_counter()
+    for i, signature in enumerate(copy_signatures):
+        matches = [drawing_id for drawing_id, _ in index.query(signature, threshold)]
+        found += f"drawing-{i}" in matches
+        false_matches += sum(1 for drawing_id in matches if drawing_id != f"drawing-{i}")
+        candidates += len(index.candidates(signature))
+    lsh_seconds = time.perf_counter() - start
+    
+    ids = list(index.signatures)
+    start = time.perf_counter()
+    for signature in copy_signatures:
+        [drawing_id for drawing_id in ids if estimate_similarity(signature, index.signatures[drawing_id]) >= threshold]
+    scan_seconds = time.perf_counter() - start
+    
+    results = {
+        'drawings': drawings,
+        'recall': found / drawings,
+        'false_matches': false_matches,
+        'avg_candidates': candidates / drawings,
+        'signature_ms': signature_seconds * 1000 / drawings,
+        'lsh_query_ms': lsh_seconds * 1000 / drawings,
+        'full_scan_query_ms': scan_seconds * 1000 / drawings
+    }
+    print(f"  Recall:               {results['recall']:.3f} ({false_matches} false matches)")
+    print(f"  Candidates per query: {results['avg_candidates']:.1f} of {drawings}")
+    print(f"  Signature:            {results['signature_ms']:.2f}ms per drawing")
+    print(f"  Lookup (LSH):         {results['lsh_query_ms']:.3f}ms")
+    print(f"  Lookup (full scan):   {results['full_scan_query_ms']:.3f}ms")
+    return results
+
+def test_pdf_classifier(labels_file: str) -> Dict:
+    """
+    Confusion matrix of the local drawing pre-classifier on a labelled sample.
+    
+    `labels_file` is a JSON object mapping PDF paths (relative to the file) to
+    true for drawings and false for other documents. Ambiguous PDFs are the ones
+    find_pdf would still send to the AI.
+    """
+    from drawingClassifier import confusion_matrix
+    from PDF_Analyzer import extract_text, pdf_page_size
+    
+    with open(labels_file) as f:
+        labels = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(labels_file))
+    print(f"\n{Fore.CYAN}Measuring PDF Pre-Classifier ({len(labels)} labelled PDFs)...{Style.RESET_ALL}")
+    
+    samples = []
+    start = time.perf_counter()
+    for path, is_drawing in labels.items():
+        path = os.path.join(base_dir, path)
+        if os.path.exists(path):
+            samples.append((extract_text(path, silent=True), pdf_page_size(path), bool(is_drawing)))
+    extract_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    results = confusion_matrix(samples)
+    results['classify_ms'] = (time.perf_counter() - start) * 1000 / max(1, len(samples))
+    results['extract_ms'] = extract_seconds * 1000 / max(1, len(samples))
+    
+    print("                     predicted drawing  predicted other  sent to AI")
+    print(f"  actual drawing     {results['true_positive']:>17}  {results['false_negative']:>15}  "
+          f"{results['escalated_positive']:>10}")
+    print(f"  actual other       {results['false_positive']:>17}  {results['true_negative']:>15}  "
+          f"{results['escalated_negative']:>10}")
+    for name in ('precision', 'recall', 'accuracy', 'escalation_rate'):
+        value = results[name]
+        print(f"  {name.replace('_', ' ').capitalize() + ':':<21}{'N/A' if value is None else f'{value:.3f}'}")
+    print(f"  Classification:      {results['classify_ms']:.2f}ms per PDF "
+          f"(text extraction {results['extract_ms']:.1f}ms)")
+    return results
+
 #==================================================================================================
 # MAIN TEST RUNNER
 #==================================================================================================
@@ -414,6 +636,8 @@ def run_comprehensive_test():
     print("  • Test search accuracy")
     print("  • Measure search speed")
     print("  • Check system resource usage")
+    print("  • Measure entity handler throughput")
+    print("  • Measure near-duplicate detection")
     print()
     
     start_time = datetime.now()
@@ -434,6 +658,12 @@ def run_comprehensive_test():
     memory_results = test_memory_usage(files_info['unique_files'])
     database_results = test_database_size()
     
+    # Stage 6: Extraction hot loop
+    handler_results = test_entity_handler_throughput()
+    
+    # Stage 7: Near-duplicate detection
+    near_duplicate_results = test_near_duplicate_detection()
+    
     # Compile results
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
@@ -453,7 +683,9 @@ def run_comprehensive_test():
         'search_accuracy': accuracy_results,
         'search_speed': speed_results,
         'memory_usage': memory_results,
-        'database_size': database_results
+        'database_size': database_results,
+        'entity_handlers': handler_results,
+        'near_duplicates': near_duplicate_results
     }
     
     # Save results
@@ -513,7 +745,14 @@ def run_comprehensive_test():
 
 if __name__ == "__main__":
     try:
-        results = run_comprehensive_test()
+        if '--handlers' in sys.argv:
+            results = test_entity_handler_throughput()
+        elif '--near-duplicates' in sys.argv:
+            results = test_near_duplicate_detection()
+        elif '--pdf-classifier' in sys.argv:
+            results = test_pdf_classifier(sys.argv[sys.argv.index('--pdf-classifier') + 1])
+        else:
+            results = run_comprehensive_test()
     except KeyboardInterrupt:
         print(f"\n\n{Fore.YELLOW}Test interrupted by user{Style.RESET_ALL}")
     except Exception as e:
@@ -0,0 +1,175 @@
+# blockLibrary.py
+#**************************************************************************************************
+#   Block definitions of a drawing, each extracted once, with INSERT expansion on demand.
+#   Flattened definitions (nested inserts resolved) are memoized by block name, so expanding a
+#   drawing that references the same block thousands of times only walks each definition once
+#   and then applies one vectorized transform per insert.
+#**************************************************************************************************
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from entityStore import EntityStore, as_entity_store
+
+# Nested block references deeper than this are not expanded
+MAX_NESTING_DEPTH = 16
+
+
+def referenced_blocks(insert_names: Iterable[str], blocks: Sequence[Dict]) -> List[str]:
+    """
+    Names of all blocks reachable from `insert_names`, including blocks nested inside
+    them, in order of first reference. `blocks` are block summaries with 'block_refs'.
+    """
+    refs = {block['name']: block.get('block_refs', []) for block in blocks}
+    seen = []
+    stack = list(reversed(list(insert_names)))
+    while stack:
+        name = stack.pop()
+        if name in seen or name not in refs:
+            continue
+        seen.append(name)
+        stack.extend(reversed(refs[name]))
+    return seen
+
+
+def _number(value, default: float) -> float:
+    return default if value is None or math.isnan(value) else float(value)
+
+
+class BlockLibrary:
+    """
+    Block-local entities by block name, with memoized flattening of nested inserts.
+
+    Definitions are in block coordinates; an insert places the block's base point
+    (from `base_points`, (0, 0) when missing) at its insertion point.
+    """
+
+    def __init__(self, definitions: Optional[Dict[str, EntityStore]] = None,
+                 base_points: Optional[Dict[str, tuple]] = None):
+        self.definitions = definitions or {}
+        self.base_points = base_points or {}
+        self._flat: Dict[str, EntityStore] = {}
+        self._extents: Dict[str, Optional[tuple]] = {}
+
+    @classmethod
+    def from_dwg_data(cls, dwg_data: Dict) -> 'BlockLibrary':
+        """Library of an extract_dwg_data() result, with the base points of its block summaries."""
+        base_points = {block['name']: tuple(block['base_point'])
+                       for block in dwg_data.get('blocks', []) if block.get('base_point')}
+        return cls(dwg_data.get('block_definitions'), base_points)
+
+    def base_point(self, name: str) -> tuple:
+        """(x, y) base point of a block, (0, 0) if unknown."""
+        point = self.base_points.get(name)
+        return (float(point[0]), float(point[1])) if point else (0.0, 0.0)
+
+    def flatten(self, name: str, _active: tuple = ()) -> Optional[EntityStore]:
+        """
+        Entities of a block definition in block coordinates, with nested INSERTs
+        expanded (the INSERT records themselves are kept). None if the block is unknown.
+        """
+        flat = self._flat.get(name)
+        if flat is not None:
+            return flat
+        definition = self.definitions.get(name)
+        if definition is None:
+            return None
+        if 'INSERT' not in definition.type_names or len(_active) >= MAX_NESTING_DEPTH:
+            flat = definition
+        else:
+            flat = definition.copy()
+            flat.extend(self.expand(definition, _active=_active + (name,)))
+        self._flat[name] = flat
+        return flat
+
+    def extents(self, name: str) -> Optional[tuple]:
+        """(xmin, ymin, xmax, ymax) of a flattened block in block coordinates, or None."""
+        if name not in self._extents:
+            flat = self.flatten(name)
+            boxes = flat.bounding_boxes() if flat is not None and len(flat) else np.zeros((0, 4))
+            boxes = boxes[~np.isnan(boxes).any(axis=1)]
+            self._extents[name] = (tuple(float(v) for v in (*boxes[:, :2].min(axis=0), *boxes[:, 2:].max(axis=0)))
+                                   if len(boxes) else None)
+        return self._extents[name]
+
+    def insert_boxes(self, entities: EntityStore) -> np.ndarray:
+        """
+        World bounding boxes of the INSERTs in `entities` (in INSERT row order), from
+        the transformed block extents; NaN for inserts of unknown or empty blocks.
+        """
+        names = entities.column('INSERT', 'block_name')
+        boxes = np.full((len(names), 4), np.nan)
+        if not len(names):
+            return boxes
+        positions = entities.column('INSERT', 'position')
+        scales = entities.column('INSERT', 'scale')
+        rotations = entities.column('INSERT', 'rotation')
+        for row, name in enumerate(names):
+            extents = self.extents(name)
+            if extents is None:
+                continue
+            x0, y0, x1, y1 = extents
+            corners = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]]) - self.base_point(name)
+            scale = (_number(scales[row][0], 1.0), _number(scales[row][1], 1.0)) if len(scales) else (1.0, 1.0)
+            angle = math.radians(_number(rotations[row], 0.0) if len(rotations) else 0.0)
+            corners = corners * scale
+            rotation = np.array([[math.cos(angle), math.sin(angle)], [-math.sin(angle), math.cos(angle)]])
+            corners = corners @ rotation
+            if len(positions):
+                corners = corners + (_number(positions[row][0], 0.0), _number(positions[row][1], 0.0))
+            boxes[row, :2] = corners.min(axis=0)
+            boxes[row, 2:] = corners.max(axis=0)
+        return boxes
+
+    def expand(self, entities, block_names: Optional[Sequence[str]] = None,
+               _active: tuple = ()) -> EntityStore:
+        """
+        World-coordinate entities of every INSERT in `entities`.
+
+        Args:
+            entities: EntityStore (or legacy entity dicts) holding INSERT records
+            block_names: Only expand inserts of these blocks (None = all)
+
+        Returns:
+            EntityStore with the transformed block contents, in insert order
+        """
+        entities = as_entity_store(entities)
+        result = EntityStore()
+        names = entities.column('INSERT', 'block_name')
+        if not len(names):
+            return result
+
+        positions = entities.column('INSERT', 'position')
+        scales = entities.column('INSERT', 'scale')
+        rotations = entities.column('INSERT', 'rotation')
+        insert_indices = entities.indices(['INSERT'])
+        layer_codes = entities.layer_codes[insert_indices]
+        layout_codes = entities.layout_codes[insert_indices]
+
+        for row, name in enumerate(names):
+            if block_names is not None and name not in block_names:
+                continue
+            if name in _active:
+                continue  # self-referencing block
+            flat = self.flatten(name, _active)
+            if flat is None or not len(flat):
+                continue
+            insert = (_number(positions[row][0], 0.0), _number(positions[row][1], 0.0)) if len(positions) else (0.0, 0.0)
+            scale = (_number(scales[row][0], 1.0), _number(scales[row][1], 1.0)) if len(scales) else (1.0, 1.0)
+            rotation = _number(rotations[row], 0.0) if len(rotations) else 0.0
+            result.extend(flat.transformed(insert, scale, rotation,
+                                           layer=entities.layer_names[layer_codes[row]],
+                                           layout=entities.layout_names[layout_codes[row]],
+                                           base_point=self.base_point(name)))
+        return result
+
+
+def expand_inserts(dwg_data: Dict, block_names: Optional[Sequence[str]] = None) -> EntityStore:
+    """
+    Expand the INSERTs of an extract_dwg_data() result into world-coordinate entities.
+
+    Only available for full-mode extractions, which keep the block definitions.
+    """
+    library = BlockLibrary.from_dwg_data(dwg_data)
+    return library.expand(dwg_data['entities'], block_names)
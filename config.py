@@ -94,6 +94,10 @@ POPPLER_PATH = os.getenv("POPPLER_PATH")
 if not POPPLER_PATH:
     POPPLER_PATH = find_poppler()
 
+# ODA File Converter - full path or a command on PATH (e.g. the Linux "ODAFileConverter" binary
+# or a local stub script). When unset, DWG_Processor searches for it on the first DWG conversion.
+ODA_CONVERTER_PATH = os.getenv("ODA_CONVERTER_PATH", "")
+
 #==================================================================================================
 # API KEYS (from environment variables)
 #==================================================================================================
@@ -124,6 +128,21 @@ PDF_CACHE_FILE = BASE_DIR / "pdf_scan_cache.json"
 # Last directory used
 LAST_DIR_FILE = BASE_DIR / "last_dir.txt"
 
+# Extracted DWG data cache (keyed by file content hash) and its size limit
+EXTRACTION_CACHE_DIR = BASE_DIR / "extraction_cache"
+EXTRACTION_CACHE_MAX_MB = float(os.getenv("EXTRACTION_CACHE_MAX_MB", "2048"))
+
+# AI response cache (SQLite), its size limit and how long responses stay valid
+LLM_CACHE_FILE = BASE_DIR / "llm_cache.sqlite"
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "64"))
+LLM_CACHE_TTL_DAYS = float(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
+
+# Per-drawing derived data (spatial index, ...), one sub-directory per drawing
+DRAWING_DATA_DIR = BASE_DIR / "drawing_data"
+
+# Location of ODA File Converter found by the last search, with a stamp to validate it
+ODA_CACHE_FILE = BASE_DIR / "oda_converter.json"
+
 # Default directory for file scanning (defaults to user's home directory)
 DEFAULT_SCAN_DIR = os.getenv("DEFAULT_SCAN_DIR", str(Path.home()))
 
@@ -145,6 +164,26 @@ OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 DEFAULT_TEMPERATURE = float(os.getenv("DEFAULT_TEMPERATURE", "0.3"))
 DEFAULT_MAX_TOKENS = int(os.getenv("DEFAULT_MAX_TOKENS", "800"))
 
+# Grok HTTP connection pool shared by all AI calls: pool size, idle keep-alive connections and how
+# long they stay open, request timeout, and HTTP/2 (used only when the "h2" package is installed)
+GROK_ENDPOINT = os.getenv("GROK_ENDPOINT", "https://api.x.ai/v1/chat/completions")
+GROK_MAX_CONNECTIONS = int(os.getenv("GROK_MAX_CONNECTIONS", "10"))
+GROK_MAX_KEEPALIVE = int(os.getenv("GROK_MAX_KEEPALIVE", "5"))
+GROK_KEEPALIVE_EXPIRY = float(os.getenv("GROK_KEEPALIVE_EXPIRY", "30"))
+GROK_TIMEOUT = float(os.getenv("GROK_TIMEOUT", "30"))
+GROK_HTTP2 = os.getenv("GROK_HTTP2", "False").lower() in ("true", "1", "yes")
+
+# Provider rate limits (0 = unlimited), AI requests in flight per provider, and retries of rate-limited
+# or failed requests with exponential backoff from AI_BACKOFF_BASE up to AI_BACKOFF_MAX seconds
+GROK_REQUESTS_PER_MINUTE = float(os.getenv("GROK_REQUESTS_PER_MINUTE", "60"))
+GROK_TOKENS_PER_MINUTE = float(os.getenv("GROK_TOKENS_PER_MINUTE", "100000"))
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "4"))
+AI_BACKOFF_BASE = float(os.getenv("AI_BACKOFF_BASE", "1"))
+AI_BACKOFF_MAX = float(os.getenv("AI_BACKOFF_MAX", "30"))
+
 #==================================================================================================
 # FEATURE FLAGS
 #==================================================================================================
@@ -153,6 +192,57 @@ ENABLE_OCR = os.getenv("ENABLE_OCR", "True").lower() in ("true", "1", "yes")
 ENABLE_AI_VALIDATION = os.getenv("ENABLE_AI_VALIDATION", "True").lower() in ("true", "1", "yes")
 ENABLE_CACHING = os.getenv("ENABLE_CACHING", "True").lower() in ("true", "1", "yes")
 ENABLE_DWG_CONVERSION = os.getenv("ENABLE_DWG_CONVERSION", "True").lower() in ("true", "1", "yes")
+ENABLE_EXTRACTION_CACHE = ENABLE_CACHING and os.getenv("ENABLE_EXTRACTION_CACHE", "True").lower() in ("true", "1", "yes")
+ENABLE_LLM_CACHE = ENABLE_CACHING and os.getenv("ENABLE_LLM_CACHE", "True").lower() in ("true", "1", "yes")
+
+#==================================================================================================
+# PDF CLASSIFICATION SETTINGS
+#==================================================================================================
+
+# Local drawing score (0-1) below which a PDF is rejected and at or above which it is accepted
+# without asking the AI; scores in between are sent to the AI
+PDF_CLASSIFIER_REJECT = float(os.getenv("PDF_CLASSIFIER_REJECT", "0.3"))
+PDF_CLASSIFIER_ACCEPT = float(os.getenv("PDF_CLASSIFIER_ACCEPT", "0.6"))
+
+#==================================================================================================
+# DWG EXTRACTION SETTINGS
+#==================================================================================================
+
+# DXF files at or above this size are read in streaming mode instead of being loaded whole
+DWG_STREAMING_THRESHOLD_MB = int(os.getenv("DWG_STREAMING_THRESHOLD_MB", "200"))
+
+# Worker processes for batch DWG processing (1 = sequential) and per-file timeout in seconds
+DWG_WORKERS = int(os.getenv("DWG_WORKERS", "1"))
+DWG_FILE_TIMEOUT = float(os.getenv("DWG_FILE_TIMEOUT", "600"))
+
+# Threads used to extract the layouts (model space and paper space sheets) of one drawing
+DWG_LAYOUT_WORKERS = int(os.getenv("DWG_LAYOUT_WORKERS", "4"))
+
+# Worker processes splitting the model space of one large ASCII DXF (1 = off). When enabled, DXF
+# files at or above DWG_PARALLEL_THRESHOLD_MB are read in streaming mode across these workers.
+DWG_EXTRACT_WORKERS = int(os.getenv("DWG_EXTRACT_WORKERS", "1"))
+DWG_PARALLEL_THRESHOLD_MB = int(os.getenv("DWG_PARALLEL_THRESHOLD_MB", "50"))
+
+# DXF files at or above this size are summarized in sample mode (fixed-memory statistics and a text
+# sample instead of entity records), within DWG_SAMPLE_MEMORY_MB
+DWG_SAMPLE_THRESHOLD_MB = int(os.getenv("DWG_SAMPLE_THRESHOLD_MB", "1024"))
+DWG_SAMPLE_MEMORY_MB = float(os.getenv("DWG_SAMPLE_MEMORY_MB", "64"))
+
+# Drawings whose MinHash similarity to an indexed drawing reaches this value are near-duplicates:
+# they reuse its AI description and specs instead of calling the AI again (1.0 or above = off)
+DWG_NEAR_DUPLICATE_THRESHOLD = float(os.getenv("DWG_NEAR_DUPLICATE_THRESHOLD", "0.9"))
+
+# Extraction mode used when adding drawings to the database: "auto" (full, or streaming for very
+# large DXF files) or "text" to index an archive quickly from annotations only. Text-mode records
+# get their full geometry pass the next time they are processed with another mode.
+DWG_INDEX_MODE = os.getenv("DWG_INDEX_MODE", "auto").lower()
+
+# DWG files converted per ODA File Converter run, and conversion time allowed per file
+ODA_BATCH_SIZE = int(os.getenv("ODA_BATCH_SIZE", "100"))
+ODA_TIMEOUT_PER_FILE = float(os.getenv("ODA_TIMEOUT_PER_FILE", "90"))
+
+# Single-file conversions (uploads, retries) running at once in one process; more wait in a queue
+ODA_MAX_CONCURRENCY = int(os.getenv("ODA_MAX_CONCURRENCY", "2"))
 
 #==================================================================================================
 # LOGGING
@@ -0,0 +1,209 @@
+# conversionService.py
+#**************************************************************************************************
+#   Bounded pool of long-lived DWG -> DXF conversion workers fed from a job queue.
+#   ODA File Converter is memory-hungry, so at most `max_workers` conversions run at once no
+#   matter how many callers (API requests, batch retries) ask for one. Each worker keeps its own
+#   scratch folder and runs one converter process per job; a job that exceeds its timeout has its
+#   process group killed and the worker restarts with a clean scratch folder. Queue depth, wait
+#   and run times are kept for monitoring.
+#**************************************************************************************************
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Union
+
+# Latency samples kept for the metrics percentiles
+LATENCY_WINDOW = 1000
+
+# Job outcomes
+STATUS_CONVERTED = 'converted'
+STATUS_FAILED = 'failed'      # converter exited without writing the DXF
+STATUS_TIMEOUT = 'timeout'    # converter killed after the job timeout
+STATUS_ERROR = 'error'        # converter missing or could not be started
+
+_STOP = object()
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ConversionService:
+    """
+    Queue of DWG conversions served by up to `max_workers` worker threads.
+
+    `converter` is the converter executable, or a callable returning it (None when
+    conversion is unavailable), resolved for every job. Workers start on the first
+    submit, and again in a forked child process, which does not inherit threads.
+    """
+
+    def __init__(self, converter: Union[str, Callable[[], Optional[str]]],
+                 max_workers: int = 2, timeout: float = 90.0,
+                 output_version: str = "ACAD2018", output_format: str = "DXF"):
+        self.converter = converter
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.output_version = output_version
+        self.output_format = output_format
+        self._lock = threading.Lock()
+        self._pid = None
+        self._closed = False
+
+    def _start(self) -> None:
+        """(Re)create the queue, output folder, counters and worker threads for this process."""
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self.output_dir = tempfile.mkdtemp(prefix='dwg_conversion_')
+        self._threads = []
+        self._active = 0
+        self._peak_active = 0
+        self._counts = {'submitted': 0, STATUS_CONVERTED: 0, STATUS_FAILED: 0, STATUS_TIMEOUT: 0,
+                        STATUS_ERROR: 0, 'restarts': 0}
+        self._wait_times = deque(maxlen=LATENCY_WINDOW)
+        self._run_times = deque(maxlen=LATENCY_WINDOW)
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker, name=f"dwg-conversion-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, dwg_path: str, timeout: Optional[float] = None) -> Future:
+        """
+        Queue one conversion.
+
+        Returns:
+            Future of the job result: dict with dxf_path (a file the caller must
+            delete, or None), status (STATUS_*), returncode, wait_seconds and run_seconds
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("conversion service is shut down")
+            if self._pid != os.getpid():
+                self._start()
+            self._counts['submitted'] += 1
+            self._queue.put((os.path.abspath(dwg_path), timeout or self.timeout, time.perf_counter(), future))
+        return future
+
+    def convert(self, dwg_path: str, timeout: Optional[float] = None) -> Dict:
+        """Convert one file and wait for the result (see submit)."""
+        return self.submit(dwg_path, timeout).result()
+
+    def _worker(self) -> None:
+        scratch = tempfile.mkdtemp(dir=self.output_dir)
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+            dwg_path, timeout, queued_at, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            with self._lock:
+                self._active += 1
+                self._peak_active = max(self._peak_active, self._active)
+            try:
+                result = self._run(dwg_path, scratch, timeout)
+            except Exception as e:
+                result = {'dxf_path': None, 'status': STATUS_ERROR, 'returncode': None, 'error': str(e)}
+            finished = time.perf_counter()
+            result['wait_seconds'] = started - queued_at
+            result['run_seconds'] = finished - started
+
+            with self._lock:
+                self._active -= 1
+                self._counts[result['status']] += 1
+                self._wait_times.append(result['wait_seconds'])
+                self._run_times.append(result['run_seconds'])
+                if result['status'] == STATUS_TIMEOUT:
+                    self._counts['restarts'] += 1
+            if result['status'] == STATUS_TIMEOUT:
+                # Start over from a clean scratch folder; the killed converter may have left partial output
+                shutil.rmtree(scratch, ignore_errors=True)
+                scratch = tempfile.mkdtemp(dir=self.output_dir)
+            future.set_result(result)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    def _run(self, dwg_path: str, scratch: str, timeout: float) -> Dict:
+        """Run the converter on one file inside the worker's scratch folder."""
+        converter = self.converter() if callable(self.converter) else self.converter
+        if not converter:
+            return {'dxf_path': None, 'status': STATUS_ERROR, 'returncode': None, 'error': 'no converter'}
+
+        input_file = os.path.basename(dwg_path)
+        cmd = [converter, os.path.dirname(dwg_path), scratch, self.output_version, self.output_format,
+               "0", "1", input_file]
+        # Own process group, so a timeout also kills anything the converter started
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   start_new_session=(os.name == 'posix'))
+        try:
+            returncode = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self._kill(process)
+            return {'dxf_path': None, 'status': STATUS_TIMEOUT, 'returncode': None}
+
+        expected = os.path.splitext(input_file)[0].lower() + '.' + self.output_format.lower()
+        for name in os.listdir(scratch):
+            if name.lower() == expected:
+                # Move the output out of the scratch folder so the worker can take the next job
+                fd, dxf_path = tempfile.mkstemp(dir=self.output_dir, suffix='.' + self.output_format.lower(),
+                                                prefix=os.path.splitext(input_file)[0] + '_')
+                os.close(fd)
+                os.replace(os.path.join(scratch, name), dxf_path)
+                return {'dxf_path': dxf_path, 'status': STATUS_CONVERTED, 'returncode': returncode}
+        return {'dxf_path': None, 'status': STATUS_FAILED, 'returncode': returncode}
+
+    @staticmethod
+    def _kill(process: subprocess.Popen) -> None:
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+        process.wait()
+
+    def metrics(self) -> Dict:
+        """
+        Current load and latency.
+
+        Returns:
+            Dict with workers, queue_depth, active, peak_active, submitted, converted,
+            failed, timeout, error, restarts, and wait_ms / run_ms dicts (avg, p50, p95)
+            over the last LATENCY_WINDOW jobs
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                return {'workers': self.max_workers, 'queue_depth': 0, 'active': 0, 'peak_active': 0}
+            result = {'workers': self.max_workers, 'queue_depth': self._queue.qsize(),
+                      'active': self._active, 'peak_active': self._peak_active, **self._counts}
+            for name, samples in (('wait_ms', list(self._wait_times)), ('run_ms', list(self._run_times))):
+                result[name] = {
+                    'avg': sum(samples) * 1000 / len(samples) if samples else None,
+                    'p50': _percentile(samples, 0.5) * 1000 if samples else None,
+                    'p95': _percentile(samples, 0.95) * 1000 if samples else None,
+                }
+        return result
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers after the queued jobs and delete unclaimed output."""
+        with self._lock:
+            self._closed = True
+            started = self._pid == os.getpid()
+            if started:
+                for _ in self._threads:
+                    self._queue.put(_STOP)
+        if started and wait:
+            for thread in self._threads:
+                thread.join()
+            shutil.rmtree(self.output_dir, ignore_errors=True)
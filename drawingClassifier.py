@@ -0,0 +1,177 @@
+# drawingClassifier.py
+#**************************************************************************************************
+#   Local pre-classifier deciding whether the text of a PDF comes from a technical drawing, so
+#   the AI is asked only about the unclear cases. A score from 0 to 1 is built from title-block
+#   vocabulary, dimension and tolerance callouts, drawing numbers, scale notations, the sheet
+#   shape, and how much of the text reads like prose. Scores below PDF_CLASSIFIER_REJECT or above
+#   PDF_CLASSIFIER_ACCEPT are decided locally; the band in between is escalated.
+#**************************************************************************************************
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from config import PDF_CLASSIFIER_ACCEPT, PDF_CLASSIFIER_REJECT
+
+# Classification labels
+LABEL_DRAWING = 'drawing'
+LABEL_NOT_DRAWING = 'not_drawing'
+LABEL_AMBIGUOUS = 'ambiguous'
+
+# Characters of text scored (title blocks and callouts show up well within this)
+MAX_SCORED_CHARS = 20000
+
+# Title block and drawing note vocabulary; each distinct term found counts once
+TITLE_BLOCK_TERMS = (
+    'drawn by', 'drawn', 'checked by', 'checked', 'approved by', 'approved', 'designed by', 'engineer',
+    'drawing no', 'drawing number', 'dwg no', 'dwg. no', 'drg no', 'sheet', 'sht', 'rev', 'revision',
+    'revisions', 'scale', 'date', 'title', 'project', 'part no', 'part number', 'material', 'finish',
+    'qty', 'item no', 'bill of materials', 'tolerances', 'unless otherwise specified', 'do not scale',
+    'third angle projection', 'first angle projection', 'dimensions are in', 'all dimensions in',
+    'general notes', 'detail', 'section', 'elevation', 'plan view', 'isometric', 'issued for construction',
+    'for construction', 'cad file', 'autocad', 'sheet size', 'weight', 'deburr', 'break all sharp edges',
+)
+
+# Weight of each feature in the score (they add up to 1)
+FEATURE_WEIGHTS = {
+    'title_block': 0.30,
+    'dimensions': 0.20,
+    'drawing_number': 0.15,
+    'scale': 0.15,
+    'sheet_shape': 0.10,
+    'terse_text': 0.10,
+}
+
+# Distinct title block terms and dimension callouts giving a full feature value
+TITLE_BLOCK_SATURATION = 6
+DIMENSION_SATURATION = 8
+
+_TITLE_BLOCK = re.compile(r'(?<![a-z])(?:' + '|'.join(re.escape(term) for term in sorted(
+    TITLE_BLOCK_TERMS, key=len, reverse=True)) + r')(?![a-z])')
+_DIMENSION = re.compile(
+    r'[Ø⌀∅]\s?\d'                                                   # diameter
+    r'|(?<![A-Za-z])R\s?\d+(?:\.\d+)?(?![\d:])'                     # radius
+    r'|±\s?\d|\+/-\s?\d|\+\s?\d*\.\d+\s*/?\s*-\s?\d*\.\d+'        # tolerances
+    r'|\b\d+(?:\.\d+)?\s?(?:mm|cm|in)\b|\b\d+(?:\.\d+)?\s?"'       # lengths with units
+    r"|\b\d+'\s?-\s?\d+(?:\s\d+/\d+)?\"?|\b\d+\.\d+'"                # feet-inches, decimal feet
+    r'|\b\d+(?:\.\d+)?\s?[xX×]\s?\d+(?:\.\d+)?\b'                  # sizes
+    r'|\b\d+(?:\.\d+)?\s?°'                                         # angles
+    r'|\bM\d{1,2}(?:\s?[xX×]\s?\d(?:\.\d+)?)?\b'                    # metric threads
+    r'|\b(?:TYP|THRU|CSK|CBORE|C/L|CL)\b\.?'                        # callout keywords
+)
+_DRAWING_NUMBER = re.compile(
+    r'\b(?:DWG|DRG|DRAWING|SHEET|PART)\s*(?:NO|NUMBER|#)\.?\s*[:#\-]?\s*[A-Z0-9][A-Z0-9\-./]{2,}'
+    r'|\b[A-Z]{1,4}-?\d{3,}(?:-\d{1,4}){1,3}\b'
+    r'|\bSHEET\s+[A-Z]{1,2}-?\d{1,3}(?:\.\d{1,2})?\b'
+    r'|\bREV(?:ISION)?\.?\s*[:\-]?\s*[A-Z0-9]{1,2}\b',
+    re.IGNORECASE)
+_SCALE = re.compile(
+    r'\bSCALE\s*[:\-]?\s*(?:\d+(?:\.\d+)?\s*[:/]\s*\d+|NTS|NONE|FULL|AS SHOWN|\d+/\d+"\s*=)'
+    r'|\b1\s?:\s?(?:1|2|2\.5|4|5|8|10|16|20|25|48|50|96|100|200|250|500|1000|1250|2500)\b'
+    r'|\bN\.?T\.?S\.?\b'
+    r"|\b\d+(?:/\d+)?\"\s?=\s?\d+'(?:\s?-\s?0\")?",
+    re.IGNORECASE)
+_WORD = re.compile(r"[A-Za-z]+(?:'[a-z]+)?")
+
+# Common English words; prose is full of them, title blocks and callouts are not
+_STOP_WORDS = frozenset(
+    'a about after all also an and any are as at be because been but by can could do for from had has have '
+    'he her his how i if in into is it its more my no not of on or our she should so some such than that '
+    'the their them then there these they this those to up was we were what when which who will with would '
+    'you your'.split())
+
+# Share of stop words at and above which text counts as plain prose
+PROSE_STOP_WORD_SHARE = 0.35
+TERSE_STOP_WORD_SHARE = 0.10
+
+# Short side in points above which a sheet is larger than A4 / letter / legal
+_LARGE_SHEET_SHORT_SIDE = 650
+
+
+def _sheet_shape(page_size: Optional[Tuple[float, float]]) -> float:
+    """
+    1 for a landscape or larger-than-letter sheet, 0.5 when unknown, 0.25 for a
+    portrait A4/letter page (the usual document page, though detail sheets use it too).
+    """
+    if not page_size or min(page_size) <= 0:
+        return 0.5
+    width, height = page_size
+    if width > height * 1.1 or min(width, height) > _LARGE_SHEET_SHORT_SIDE:
+        return 1.0
+    return 0.25
+
+
+def pdf_features(text: str, page_size: Optional[Tuple[float, float]] = None) -> Dict[str, float]:
+    """Feature values in [0, 1] for FEATURE_WEIGHTS, from a PDF's text and first page size (points)."""
+    text = text[:MAX_SCORED_CHARS]
+    lowered = text.lower()
+    words = _WORD.findall(lowered)
+    stop_share = sum(1 for word in words if word in _STOP_WORDS) / len(words) if words else 0.0
+    terse = (PROSE_STOP_WORD_SHARE - stop_share) / (PROSE_STOP_WORD_SHARE - TERSE_STOP_WORD_SHARE)
+    return {
+        'title_block': min(1.0, len(set(_TITLE_BLOCK.findall(lowered))) / TITLE_BLOCK_SATURATION),
+        'dimensions': min(1.0, len(_DIMENSION.findall(text)) / DIMENSION_SATURATION),
+        'drawing_number': 1.0 if _DRAWING_NUMBER.search(text) else 0.0,
+        'scale': 1.0 if _SCALE.search(text) else 0.0,
+        'sheet_shape': _sheet_shape(page_size),
+        'terse_text': min(1.0, max(0.0, terse)),
+    }
+
+
+def classify_pdf_text(text: str, page_size: Optional[Tuple[float, float]] = None,
+                      reject_below: float = PDF_CLASSIFIER_REJECT,
+                      accept_above: float = PDF_CLASSIFIER_ACCEPT) -> Dict:
+    """
+    Score how likely a PDF's text comes from a technical drawing.
+
+    Returns:
+        Dict with score (0 to 1), label (LABEL_DRAWING at or above `accept_above`,
+        LABEL_NOT_DRAWING below `reject_below`, otherwise LABEL_AMBIGUOUS) and features
+    """
+    if not text.strip():
+        return {'score': 0.0, 'label': LABEL_NOT_DRAWING, 'features': {}}
+    features = pdf_features(text, page_size)
+    score = sum(FEATURE_WEIGHTS[name] * value for name, value in features.items())
+    if score >= accept_above:
+        label = LABEL_DRAWING
+    elif score < reject_below:
+        label = LABEL_NOT_DRAWING
+    else:
+        label = LABEL_AMBIGUOUS
+    return {'score': round(score, 4), 'label': label, 'features': features}
+
+
+def confusion_matrix(samples: Iterable[Tuple[str, Optional[Tuple[float, float]], bool]], **thresholds) -> Dict:
+    """
+    Local decisions of classify_pdf_text() against labelled samples.
+
+    Args:
+        samples: (text, page size or None, True if the PDF is a drawing) tuples
+        thresholds: reject_below / accept_above overrides
+
+    Returns:
+        Dict with true_positive, false_positive, true_negative, false_negative (local
+        decisions only), escalated_positive / escalated_negative (ambiguous samples by
+        true label), total, precision, recall and accuracy of the local decisions, and
+        escalation_rate
+    """
+    counts = dict.fromkeys(('true_positive', 'false_positive', 'true_negative', 'false_negative',
+                            'escalated_positive', 'escalated_negative'), 0)
+    for text, page_size, is_drawing in samples:
+        label = classify_pdf_text(text, page_size, **thresholds)['label']
+        if label == LABEL_AMBIGUOUS:
+            counts['escalated_positive' if is_drawing else 'escalated_negative'] += 1
+        elif label == LABEL_DRAWING:
+            counts['true_positive' if is_drawing else 'false_positive'] += 1
+        else:
+            counts['false_negative' if is_drawing else 'true_negative'] += 1
+
+    tp, fp, tn, fn = (counts[k] for k in ('true_positive', 'false_positive', 'true_negative', 'false_negative'))
+    decided = tp + fp + tn + fn
+    total = decided + counts['escalated_positive'] + counts['escalated_negative']
+    return {
+        **counts,
+        'total': total,
+        'precision': tp / (tp + fp) if tp + fp else None,
+        'recall': tp / (tp + fn) if tp + fn else None,
+        'accuracy': (tp + tn) / decided if decided else None,
+        'escalation_rate': (total - decided) / total if total else None,
+    }
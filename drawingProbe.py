@@ -0,0 +1,184 @@
+# drawingProbe.py
+#**************************************************************************************************
+#   Millisecond metadata probe of DWG and DXF files for triage before conversion and extraction.
+#   Only the start of a file is read: the HEADER section of an ASCII or binary DXF (version,
+#   drawing units, extents, last-saved date, handle seed) and the fixed file header of a DWG
+#   (version and maintenance release; the rest of a DWG header needs a full decoder).
+#**************************************************************************************************
+import os
+import re
+import struct
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ezdxf.lldxf.const import DXFError, acad_release
+from ezdxf.lldxf.tagger import binary_tags_loader
+from ezdxf.tools.juliandate import calendardate
+from ezdxf.units import unit_name
+
+from dxfScanner import iter_dxf_tags
+
+# File formats reported by detect_format()
+FORMAT_DWG = 'dwg'
+FORMAT_DXF = 'dxf'
+FORMAT_BINARY_DXF = 'dxf-binary'
+
+BINARY_DXF_SENTINEL = b'AutoCAD Binary DXF\r\n\x1a\x00'
+_DWG_SIGNATURE = re.compile(rb'AC10\d\d')
+
+# HEADER variables read by the probe
+PROBE_VARIABLES = ('$ACADVER', '$INSUNITS', '$EXTMIN', '$EXTMAX', '$TDUPDATE', '$HANDSEED')
+
+# First read of a binary DXF; doubled until the whole HEADER section fits
+_BINARY_HEAD_BYTES = 64 * 1024
+
+
+def detect_format(path: str) -> Optional[str]:
+    """
+    Format of a drawing file from its first bytes: FORMAT_DWG (AC10xx version
+    signature), FORMAT_BINARY_DXF (binary DXF sentinel), FORMAT_DXF (an ASCII DXF
+    starting with a group code 0 or 999 comment) or None.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(64)
+    if _DWG_SIGNATURE.match(head):
+        return FORMAT_DWG
+    if head.startswith(BINARY_DXF_SENTINEL):
+        return FORMAT_BINARY_DXF
+    lines = [line.strip() for line in head.lstrip(b'\xef\xbb\xbf').splitlines()]
+    if len(lines) >= 2 and (lines[0] == b'999' or lines[:2] == [b'0', b'SECTION']):
+        return FORMAT_DXF
+    return None
+
+
+def _header_variables(tags: Iterable[Tuple[int, object]]) -> Tuple[Dict[str, object], bool]:
+    """
+    PROBE_VARIABLES values from the tags of a DXF file, stopping at the end of HEADER.
+
+    Returns:
+        Tuple of ({name: value, points as lists}, True if the HEADER section was
+        read to its end or the file has none)
+    """
+    values: Dict[str, object] = {}
+    name = None
+    in_header = False
+    previous = None
+    for code, value in tags:
+        if code == 0:
+            if in_header:
+                return values, True  # ENDSEC
+        elif code == 2 and previous == (0, 'SECTION'):
+            if value != 'HEADER':
+                return values, True  # no HEADER section
+            in_header = True
+        elif in_header and code == 9:
+            name = value if value in PROBE_VARIABLES else None
+        elif name is not None:
+            if code in (10, 20, 30):
+                point = values.setdefault(name, [])
+                point.append(float(value))
+            elif name == '$ACADVER' or name == '$HANDSEED':
+                values[name] = str(value).strip()
+            elif code == 40:
+                values[name] = float(value)
+            elif code == 70:
+                values[name] = int(value)
+        previous = (code, value)
+    return values, False
+
+
+def _read_ascii_header(path: str) -> Dict[str, object]:
+    with open(path, 'rb') as f:
+        values, _ = _header_variables(iter_dxf_tags(f, 'cp1252'))
+    return values
+
+
+def _binary_tags(data: bytes) -> Iterator[Tuple[int, object]]:
+    """Tags of a binary DXF prefix; a tag cut off by the end of `data` ends the iteration."""
+    tags = binary_tags_loader(data)
+    while True:
+        try:
+            tag = next(tags)
+        except (StopIteration, DXFError, IndexError, ValueError, struct.error):
+            return
+        yield tag.code, tag.value
+
+
+def _read_binary_header(path: str) -> Dict[str, object]:
+    size = _BINARY_HEAD_BYTES
+    file_size = os.path.getsize(path)
+    while True:
+        with open(path, 'rb') as f:
+            data = f.read(size)
+        values, complete = _header_variables(_binary_tags(data))
+        if complete or size >= file_size:
+            return values
+        size *= 2
+
+
+def _read_dwg_header(path: str) -> Dict[str, object]:
+    with open(path, 'rb') as f:
+        head = f.read(0x20)
+    return {'$ACADVER': head[:6].decode('ascii'), 'maintenance_release': head[0x0B] if len(head) > 0x0B else None}
+
+
+def probe_drawing(path: str) -> Dict:
+    """
+    Header metadata of a DWG or DXF file without loading the drawing.
+
+    Returns:
+        Dict with path, format (see detect_format), file_size, version (AC10xx),
+        release (R2018, ...), units ($INSUNITS code) and units_name, extents
+        ((xmin, ymin, xmax, ymax) or None when unset), last_saved (ISO date of
+        $TDUPDATE) and handle_seed (int, roughly the number of objects ever created).
+        DXF-only values are None for DWG files, which also carry maintenance_release;
+        an unreadable file has an 'error' entry instead.
+    """
+    result = {
+        'path': path, 'format': None, 'file_size': None, 'version': None, 'release': None,
+        'units': None, 'units_name': None, 'extents': None, 'last_saved': None, 'handle_seed': None,
+    }
+    try:
+        result['file_size'] = os.path.getsize(path)
+        file_format = result['format'] = detect_format(path)
+        if file_format == FORMAT_DWG:
+            values = _read_dwg_header(path)
+            result['maintenance_release'] = values['maintenance_release']
+        elif file_format == FORMAT_BINARY_DXF:
+            values = _read_binary_header(path)
+        elif file_format == FORMAT_DXF:
+            values = _read_ascii_header(path)
+        else:
+            result['error'] = 'not a DWG or DXF file'
+            return result
+    except (OSError, ValueError) as e:
+        result['error'] = str(e)
+        return result
+
+    version = values.get('$ACADVER')
+    result['version'] = version
+    result['release'] = acad_release.get(version) if version else None
+    units = values.get('$INSUNITS')
+    if units is not None:
+        result['units'] = units
+        result['units_name'] = unit_name(units)
+    extmin, extmax = values.get('$EXTMIN'), values.get('$EXTMAX')
+    if extmin and extmax and len(extmin) >= 2 and len(extmax) >= 2 and extmin[0] <= extmax[0] and extmin[1] <= extmax[1]:
+        result['extents'] = (extmin[0], extmin[1], extmax[0], extmax[1])
+    updated = values.get('$TDUPDATE')
+    if updated:
+        try:
+            result['last_saved'] = calendardate(updated).isoformat(timespec='seconds')
+        except (ValueError, OverflowError):
+            pass
+    seed = values.get('$HANDSEED')
+    if seed:
+        try:
+            result['handle_seed'] = int(seed, 16)
+        except ValueError:
+            pass
+    return result
+
+
+def probe_drawings(paths: Iterable[str]) -> List[Dict]:
+    """probe_drawing() results of many files, in order."""
+    return [probe_drawing(path) for path in paths]
@@ -0,0 +1,57 @@
+# drawingStore.py
+#**************************************************************************************************
+#   Per-drawing sidecar storage for data derived from an extraction (spatial index, ...).
+#   Indexes spanning all drawings are kept as single files in the same base directory.
+#   Each drawing gets its own directory under DRAWING_DATA_DIR named by its embedding id, so the
+#   data can be found from the same path used to look the drawing up in the vector database.
+#**************************************************************************************************
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from config import DRAWING_DATA_DIR
+
+
+def get_drawing_data_dir(drawing_id: str, create: bool = False) -> Path:
+    """Sidecar directory of a drawing, optionally creating it."""
+    path = Path(DRAWING_DATA_DIR) / drawing_id
+    if create:
+        path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def sidecar_path(drawing_id: str, name: str, create: bool = False) -> Path:
+    """Path of one sidecar file of a drawing."""
+    return get_drawing_data_dir(drawing_id, create=create) / name
+
+
+def shared_data_path(name: str) -> Path:
+    """Path of a file shared by all drawings (e.g. an index over them), next to their directories."""
+    path = Path(DRAWING_DATA_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path / name
+
+
+def atomic_write(path: Path, write) -> None:
+    """Call write(file) on a temporary file next to `path`, then move it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def remove_drawing_data(drawing_id: str) -> bool:
+    """Delete all sidecar data of a drawing. Returns True if anything was removed."""
+    path = get_drawing_data_dir(drawing_id)
+    if not path.exists():
+        return False
+    shutil.rmtree(path, ignore_errors=True)
+    return True
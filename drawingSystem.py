@@ -6,11 +6,12 @@
 import os
 import json
 import io
+from collections import Counter
 from contextlib import redirect_stdout, redirect_stderr
 from colorama import init, Fore, Style
 
 # Import config first
-from config import DEFAULT_SCAN_DIR, validate_config, get_config_summary
+from config import DEFAULT_SCAN_DIR, DWG_NEAR_DUPLICATE_THRESHOLD, validate_config, get_config_summary
 
 # Existing imports
 from PDF_Analyzer import (
@@ -19,7 +20,7 @@ from PDF_Analyzer import (
 )
 from semanticMemory import (
     add_to_database, list_database_files, remove_from_database,
-    search_similar_files, file_exists_in_database
+    search_similar_files, file_exists_in_database, generate_embedding_id
 )
 from utils import load_cache, save_cache, get_file_hash, CACHE_FILE, is_valid_specs
 
@@ -29,8 +30,13 @@ from DWG_Processor import (
     batch_process_dwg_folder,
     export_dwg_to_csv,
     DWGProcessor,
-    find_dwg_files
+    find_dwg_files,
+    dwg_needs_processing
 )
+from extractionCache import extraction_cache
+from llmCache import llm_cache
+from nearDuplicate import load_near_duplicate_index
+from drawingProbe import probe_drawings
 
 init(autoreset=True)
 
@@ -110,6 +116,7 @@ def reprocess_database_files():
 
     success_count = 0
     failed_count = 0
+    ai_hits, ai_misses = llm_cache.hits, llm_cache.misses
 
     for idx, (filepath, old_desc, old_specs) in enumerate(files, 1):
         filename = os.path.basename(filepath)
@@ -140,6 +147,8 @@ def reprocess_database_files():
     print(Fore.GREEN + "REPROCESSING COMPLETE" + Style.RESET_ALL)
     print(Fore.CYAN + f"{'='*60}" + Style.RESET_ALL)
     print(Fore.WHITE + f"Success: {success_count} | Failed: {failed_count}" + Style.RESET_ALL)
+    print(Fore.WHITE + f"AI response cache: {llm_cache.hits - ai_hits} hits | "
+          f"{llm_cache.misses - ai_misses} misses" + Style.RESET_ALL)
 
 def process_file(file_path, silent=False, show_progress=False, current=0, total=0):
     """Unified file processing for both PDF and DWG"""
@@ -158,19 +167,32 @@ def process_file(file_path, silent=False, show_progress=False, current=0, total=
     else:
         return process_pdf(file_path, silent=silent)
 
-def remove_duplicate_files():
+def remove_duplicate_files(near_duplicates=False, threshold=DWG_NEAR_DUPLICATE_THRESHOLD):
+    """
+    Remove database entries whose file name was already seen. With near_duplicates,
+    also remove drawings nearly identical to a drawing kept earlier (MinHash
+    similarity of at least `threshold`, see nearDuplicate), whatever their name.
+    """
     files = list_database_files()
     seen = set()
+    kept_ids = set()
+    index = load_near_duplicate_index() if near_duplicates else None
     removed = 0
 
     for filepath, *_ in files:
         fname = os.path.basename(filepath)
-        if fname in seen:
+        duplicate = fname in seen
+        drawing_id = generate_embedding_id(filepath)
+        signature = index.signatures.get(drawing_id) if index is not None else None
+        if not duplicate and signature is not None:
+            duplicate = any(match in kept_ids for match, _ in index.query(signature, threshold, exclude=drawing_id))
+        if duplicate:
             with io.StringIO() as buf, redirect_stdout(buf), redirect_stderr(buf):
                 remove_from_database(filepath)
             removed += 1
         else:
             seen.add(fname)
+            kept_ids.add(drawing_id)
 
     updated_files = list_database_files()
     db_count = len(updated_files)
@@ -330,12 +352,14 @@ def scan_mixed_directory():
         all_files = pdf_list + dwg_list
         
         for idx, file_path in enumerate(all_files, 1):
-            if file_exists_in_database(file_path):
+            is_dwg = file_path.lower().endswith('.dwg')
+            in_db = not dwg_needs_processing(file_path) if is_dwg else file_exists_in_database(file_path)
+            if in_db:
                 already_in_db += 1
                 print(Fore.YELLOW + f"[{idx}/{total}] Already in DB: {os.path.basename(file_path)}" + Style.RESET_ALL)
                 continue
             
-            file_type = "DWG" if file_path.lower().endswith('.dwg') else "PDF"
+            file_type = "DWG" if is_dwg else "PDF"
             print(Fore.BLUE + f"[{idx}/{total}] Processing {file_type}: {os.path.basename(file_path)}" + Style.RESET_ALL)
             
             success = process_file(file_path, silent=True)
@@ -539,8 +563,14 @@ def main():
             
             print(Fore.GREEN + f"Found {len(dwg_list)} DWG files" + Style.RESET_ALL)
             if dwg_list:
-                for i, dwg in enumerate(dwg_list[:20], 1):
-                    print(f"{i}) {os.path.basename(dwg)}")
+                # Header-only probe: version and last save date without converting anything
+                probes = probe_drawings(dwg_list)
+                releases = Counter(probe['release'] or 'unknown' for probe in probes)
+                print(Fore.CYAN + "Versions: " + ", ".join(f"{name} ({count})" for name, count in releases.most_common())
+                      + Style.RESET_ALL)
+                for i, (dwg, probe) in enumerate(zip(dwg_list[:20], probes), 1):
+                    print(f"{i}) {os.path.basename(dwg)} [{probe['release'] or 'unknown'}"
+                          f"{', saved ' + probe['last_saved'][:10] if probe['last_saved'] else ''}]")
                 if len(dwg_list) > 20:
                     print(f"... and {len(dwg_list) - 20} more")
 
@@ -631,16 +661,20 @@ def main():
                 print(Fore.RED + "Invalid input." + Style.RESET_ALL)
 
         elif choice == "12":  # Remove duplicates
+            near = input("Also remove near-duplicate drawings (same geometry and text)? (y/N): ").strip().lower() == 'y'
             print(Fore.CYAN + "\nChecking for duplicate database entries..." + Style.RESET_ALL)
-            remove_duplicate_files()
+            remove_duplicate_files(near_duplicates=near)
 
         elif choice == "13":  # Clear caches
             from config import CACHE_FILE, PDF_CACHE_FILE
             for cache_file in [str(CACHE_FILE), PDF_CACHE_FILE]:
                 if os.path.exists(cache_file):
                     os.remove(cache_file)
+            extracted = extraction_cache.clear()
+            responses = llm_cache.clear()
             pdf_cache = {}
-            print(Fore.GREEN + "All caches cleared." + Style.RESET_ALL)
+            print(Fore.GREEN + f"All caches cleared ({extracted} extractions, {responses} AI responses)."
+                  + Style.RESET_ALL)
 
         elif choice == "14":  # Ask questions
             interactive_qa()
@@ -0,0 +1,116 @@
+# dxfPartition.py
+#**************************************************************************************************
+#   Splits the ENTITIES section of an ASCII DXF file into byte ranges that each start on a
+#   top-level entity, and reads the modelspace entities of one range on its own. Worker processes
+#   can then run the entity handlers over separate ranges of one large drawing; the partial
+#   results are merged in range order, so the outcome matches a single sequential pass.
+#**************************************************************************************************
+import mmap
+import re
+from io import StringIO
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from ezdxf.entities import factory
+from ezdxf.entities.subentity import entity_linker
+from ezdxf.lldxf.extendedtags import ExtendedTags
+from ezdxf.lldxf.tagger import ascii_tags_loader, tag_compiler
+
+from dxfScanner import LINKED_ENTITY_TYPES
+from entityHandlers import ENTITY_HANDLERS, collect_entities
+from entityStore import EntityStore
+
+# Smallest byte range worth handing to a separate process
+MIN_PARTITION_BYTES = 1 << 20
+
+# A code 0 tag: a group code line "0" followed by an entity name. A value line "0" is always
+# followed by a numeric group code line, so this only matches real entity starts.
+_SECTION_ENTITIES = re.compile(rb'\n[ \t]*0\r?\nSECTION\r?\n[ \t]*2\r?\nENTITIES\r?\n')
+_SECTION_END = re.compile(rb'\n[ \t]*0\r?\nENDSEC\r?\n')
+_ENTITY_START = re.compile(rb'\n[ \t]*0\r?\n([A-Z_][A-Z0-9_]*)\r?\n')
+
+
+def partition_entities_section(path: str, parts: int,
+                               min_bytes: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Split the ENTITIES section of an ASCII DXF file into about `parts` byte ranges.
+
+    Ranges start on top-level entities only, so a POLYLINE or INSERT stays together
+    with its VERTEX, ATTRIB and SEQEND entities. Ranges are at least `min_bytes`
+    long (default MIN_PARTITION_BYTES; a smaller section is one range).
+
+    Returns:
+        List of (start, end) byte offsets in file order; empty if the file has no
+        ENTITIES section
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        section = _SECTION_ENTITIES.search(data)
+        if section is None:
+            return []
+        start = section.end()
+        section_end = _SECTION_END.search(data, start - 1)
+        end = section_end.start() + 1 if section_end else len(data)
+
+        min_bytes = MIN_PARTITION_BYTES if min_bytes is None else max(min_bytes, 1)
+        parts = max(1, min(parts, (end - start) // min_bytes))
+        bounds = [start]
+        for i in range(1, parts):
+            pos = max(start + (end - start) * i // parts, bounds[-1]) - 1
+            while True:
+                match = _ENTITY_START.search(data, pos, end)
+                if match is None or match.group(1).decode('ascii') not in LINKED_ENTITY_TYPES:
+                    break
+                pos = match.end() - 1
+            if match is None:
+                break
+            if match.start() + 1 > bounds[-1]:
+                bounds.append(match.start() + 1)
+        bounds.append(end)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def iter_partition_entities(path: str, start: int, end: int, encoding: str = 'utf-8',
+                            types: Optional[Iterable[str]] = None) -> Iterator:
+    """
+    Modelspace entities of one range of partition_entities_section(), as loaded by
+    ezdxf.addons.iterdxf.modelspace(): linked VERTEX and ATTRIB entities are attached
+    to their owner and paper space entities are left out.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding, errors='surrogateescape')
+    requested = set(types) | LINKED_ENTITY_TYPES if types is not None else None
+    linked = entity_linker()
+    queued = None
+    tags = []
+
+    def load(entity_tags):
+        nonlocal queued
+        if requested is not None and entity_tags[0].value not in requested:
+            return None
+        entity = factory.load(ExtendedTags(entity_tags))
+        if linked(entity) or entity.dxf.paperspace != 0:
+            return None
+        # Hold each entity back until its linked entities have been attached
+        ready, queued = queued, entity
+        return ready
+
+    for tag in tag_compiler(ascii_tags_loader(StringIO(text))):
+        if tag.code == 0 and tags:
+            ready = load(tags)
+            if ready is not None:
+                yield ready
+            tags = []
+        tags.append(tag)
+    if tags:
+        ready = load(tags)
+        if ready is not None:
+            yield ready
+    if queued is not None:
+        yield queued
+
+
+def extract_partition(path: str, start: int, end: int, encoding: str,
+                      layout: str) -> Tuple[EntityStore, List[str]]:
+    """Run the entity handlers over one range (process pool task; see collect_entities)."""
+    return collect_entities(iter_partition_entities(path, start, end, encoding, types=ENTITY_HANDLERS),
+                            layout=layout)
@@ -0,0 +1,224 @@
+# dxfScanner.py
+#**************************************************************************************************
+#   Lightweight, document-free scanning of ASCII DXF files.
+#   Reads raw (group code, value) tags straight from disk so table and block summaries can be
+#   collected without loading the whole drawing into memory.
+#**************************************************************************************************
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+from ezdxf.filemanagement import dxf_file_info
+
+# Entities that are owned by a preceding entity and never counted on their own
+LINKED_ENTITY_TYPES = {'VERTEX', 'SEQEND', 'ATTRIB'}
+
+# Entities whose text is collected from block definitions
+TEXT_ENTITY_TYPES = {'TEXT', 'MTEXT'}
+
+# Entities read by the annotation scan (scan_dxf_structure(annotations=True)), plus INSERT
+ANNOTATION_ENTITY_TYPES = {'TEXT', 'MTEXT', 'DIMENSION', 'ATTRIB'}
+
+# Group codes read for annotation records: record key and value type
+_ANNOTATION_CODES = {
+    'TEXT': {40: ('height', float)},
+    'MTEXT': {40: ('height', float)},
+    'DIMENSION': {42: ('measurement', float)},
+    'ATTRIB': {2: ('tag', str), 40: ('height', float)},
+    'INSERT': {2: ('block_name', str), 41: ('xscale', float), 42: ('yscale', float), 50: ('rotation', float)},
+}
+
+
+def iter_dxf_tags(stream: BinaryIO, encoding: str = 'utf-8') -> Iterator[Tuple[int, str]]:
+    """
+    Yield (group_code, value) pairs from a binary ASCII DXF stream.
+
+    Values are decoded with the drawing encoding; undecodable bytes are dropped
+    instead of aborting the scan.
+    """
+    while True:
+        code_line = stream.readline()
+        if not code_line:
+            return
+        value_line = stream.readline()
+        try:
+            code = int(code_line)
+        except ValueError:
+            return
+        yield code, value_line.rstrip(b'\r\n').decode(encoding, errors='ignore')
+
+
+def is_ascii_dxf(path: str) -> bool:
+    """Return True if the file starts like an ASCII DXF file (0/SECTION)."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(64)
+    except OSError:
+        return False
+    lines = head.splitlines()
+    return len(lines) >= 2 and lines[0].strip() == b'0' and lines[1].strip() == b'SECTION'
+
+
+def _finish_annotation(record: Dict, text_parts: List[str]) -> Dict:
+    """Turn the raw values gathered for one annotation or INSERT into an entity record."""
+    values = record.pop('_values')
+    if record['type'] == 'INSERT':
+        record['block_name'] = values.get('block_name', '')
+        record['scale'] = (values.get('xscale', 1.0), values.get('yscale', 1.0))
+        record['rotation'] = values.get('rotation', 0.0)
+    else:
+        record['text'] = ''.join(text_parts)
+        record.update(values)
+    if 'x' in record:
+        record['position'] = (record.pop('x'), record.pop('y', 0.0))
+    return record
+
+
+def scan_dxf_structure(path: str, annotations: bool = False) -> Dict:
+    """
+    Collect DXF version, layer table and block summaries in one light pass.
+
+    Stops reading as soon as both the TABLES and BLOCKS sections have been seen,
+    so the ENTITIES section of a standard DXF file is never touched, unless
+    `annotations` is set: then the ENTITIES section is scanned too, and only
+    annotation entities (ANNOTATION_ENTITY_TYPES) and INSERTs are decoded.
+
+    Block summaries hold name, base_point ((x, y) insertion base), entity_count,
+    entity_types (count per DXF type), texts (TEXT/MTEXT strings) and block_refs
+    (names of nested INSERTs).
+
+    Returns:
+        Dict with keys: dxf_version, encoding, layers (keyed by lower-case name), blocks.
+        With `annotations`, also: annotations (entity records with type, layer,
+        color, paperspace and text/tag/height/position/measurement or INSERT
+        block_name/scale/rotation), entity_types (count per DXF type in ENTITIES)
+        and layers_used (layer names of all ENTITIES)
+    """
+    info = dxf_file_info(path)
+    layers: Dict[str, Dict] = {}
+    blocks = []
+    seen_tables = seen_blocks = False
+
+    section = None
+    prev_code, prev_value = None, None
+    entity_type = None      # type of the entity currently being read
+    in_layer_table = False
+    layer = None
+    block = None
+    text_parts = None       # pieces of the TEXT/MTEXT value being read inside a block
+    records: List[Dict] = []
+    entity_types: Dict[str, int] = {}
+    layers_used = set()
+    record = None           # annotation or INSERT being read from ENTITIES
+    record_codes = {}
+    record_text: List[str] = []
+
+    with open(path, 'rb') as f:
+        for code, value in iter_dxf_tags(f, info.encoding):
+            if code == 0:
+                # Finish the record that was being read
+                if layer is not None:
+                    layers[layer['name'].lower()] = layer
+                    layer = None
+                if record is not None:
+                    records.append(_finish_annotation(record, record_text))
+                    record = None
+
+                if value == 'SECTION':
+                    section = None
+                elif value == 'ENDSEC':
+                    if section == 'TABLES':
+                        seen_tables = True
+                    elif section == 'BLOCKS':
+                        seen_blocks = True
+                    section = None
+                    if seen_tables and seen_blocks and not annotations:
+                        break
+                elif section == 'TABLES':
+                    if value == 'TABLE':
+                        in_layer_table = False
+                    elif value == 'LAYER' and in_layer_table:
+                        layer = {'name': '', 'color': 7, 'linetype': 'Continuous', 'on': True}
+                elif section == 'BLOCKS':
+                    if text_parts is not None:
+                        if block is not None:
+                            block['texts'].append(''.join(text_parts))
+                        text_parts = None
+                    if value == 'BLOCK':
+                        block = {'name': '', 'base_point': (0.0, 0.0), 'entity_count': 0, 'entity_types': {},
+                                 'texts': [], 'block_refs': []}
+                    elif value == 'ENDBLK':
+                        if block and block['name'] and not block['name'].startswith('*'):
+                            blocks.append(block)
+                        block = None
+                    elif block is not None and value not in LINKED_ENTITY_TYPES:
+                        block['entity_count'] += 1
+                        block['entity_types'][value] = block['entity_types'].get(value, 0) + 1
+                        if value in TEXT_ENTITY_TYPES:
+                            text_parts = []
+                elif section == 'ENTITIES':
+                    if value not in LINKED_ENTITY_TYPES or value == 'ATTRIB':  # attributes count as entities
+                        entity_types[value] = entity_types.get(value, 0) + 1
+                    if value in _ANNOTATION_CODES:
+                        record = {'type': value, 'layer': '0', 'color': 256, 'paperspace': False, '_values': {}}
+                        record_codes = _ANNOTATION_CODES[value]
+                        record_text = []
+                entity_type = value
+            elif code == 2 and prev_code == 0 and prev_value == 'SECTION':
+                section = value
+            elif section == 'TABLES':
+                if code == 2 and entity_type == 'TABLE':
+                    in_layer_table = value == 'LAYER'
+                elif layer is not None:
+                    if code == 2:
+                        layer['name'] = value
+                    elif code == 62:
+                        color = int(value)
+                        layer['color'] = color
+                        layer['on'] = color >= 0
+                    elif code == 6:
+                        layer['linetype'] = value
+            elif section == 'BLOCKS' and block is not None:
+                if code == 2 and entity_type == 'BLOCK':
+                    if not block['name']:
+                        block['name'] = value
+                elif code == 10 and entity_type == 'BLOCK':
+                    block['base_point'] = (float(value), block['base_point'][1])
+                elif code == 20 and entity_type == 'BLOCK':
+                    block['base_point'] = (block['base_point'][0], float(value))
+                elif code == 2 and entity_type == 'INSERT':
+                    if value not in block['block_refs']:
+                        block['block_refs'].append(value)
+                elif code in (1, 3) and text_parts is not None:
+                    text_parts.append(value)
+            elif section == 'ENTITIES':
+                if code == 8:
+                    layers_used.add(value)
+                    if record is not None:
+                        record['layer'] = value
+                elif record is not None:
+                    if code == 1 or (code == 3 and record['type'] == 'MTEXT'):
+                        record_text.append(value)  # code 3 of a DIMENSION is its style
+                    elif code == 62:
+                        record['color'] = int(value)
+                    elif code == 67:
+                        record['paperspace'] = value.strip() == '1'
+                    elif code == 10 and 'x' not in record:
+                        record['x'] = float(value)
+                    elif code == 20 and 'y' not in record:
+                        record['y'] = float(value)
+                    elif code in record_codes:
+                        key, convert = record_codes[code]
+                        record['_values'][key] = convert(value)
+
+            prev_code, prev_value = code, value
+
+    result = {
+        'dxf_version': info.version,
+        'encoding': info.encoding,
+        'layers': layers,
+        'blocks': blocks,
+    }
+    if annotations:
+        if record is not None:
+            records.append(_finish_annotation(record, record_text))
+        result.update({'annotations': records, 'entity_types': entity_types, 'layers_used': layers_used})
+    return result
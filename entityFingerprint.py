@@ -0,0 +1,105 @@
+# entityFingerprint.py
+#**************************************************************************************************
+#   Stable 64-bit fingerprints of extracted entities, used to compare revisions of a drawing.
+#   Each entity is hashed from its normalized record (type, layer, layout, color and values as
+#   formatted by EntityStore), so the delta between two revisions is a set difference of integers.
+#   Fingerprints are stored per drawing next to the other sidecar data.
+#**************************************************************************************************
+import hashlib
+from typing import Dict, Optional
+
+import numpy as np
+
+from drawingStore import atomic_write, sidecar_path
+from entityStore import as_entity_store
+
+FINGERPRINT_FILE = 'fingerprints.npz'
+
+# Changes to these entities alter what a drawing says, so they need a new AI description
+MATERIAL_ENTITY_TYPES = {'TEXT', 'MTEXT', 'DIMENSION', 'ATTRIB'}
+
+# Separates duplicate entities (same record drawn twice) so deltas count them individually
+_DUPLICATE_STEP = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _record_key(record: Dict) -> str:
+    return '\x1f'.join(f"{key}={record[key]}" for key in sorted(record))
+
+
+def fingerprint_entities(dwg_data: Dict) -> Dict[str, np.ndarray]:
+    """
+    Fingerprints of the entities of an extract_dwg_data() result.
+
+    Returns:
+        Dict with 'fingerprints' (sorted uint64, one per entity, duplicates made
+        distinct), 'material' (bool mask: entity type in MATERIAL_ENTITY_TYPES) and
+        'text_hash' (hash of text_content, which includes text inside blocks)
+    """
+    entities = as_entity_store(dwg_data['entities'])
+    material_codes = [code for code, name in enumerate(entities.type_names) if name in MATERIAL_ENTITY_TYPES]
+    hashes = np.fromiter((_hash(_record_key(record)) for record in entities),
+                         dtype=np.uint64, count=len(entities))
+    material = np.isin(entities.type_codes, material_codes)
+
+    # k-th copy of an identical record gets hash + k * step
+    order = np.argsort(hashes, kind='stable')
+    hashes, material = hashes[order], material[order]
+    if len(hashes):
+        run_start = np.r_[0, np.nonzero(np.diff(hashes))[0] + 1]
+        run_index = np.arange(len(hashes)) - np.repeat(run_start, np.diff(np.r_[run_start, len(hashes)]))
+        with np.errstate(over='ignore'):
+            hashes = hashes + run_index.astype(np.uint64) * _DUPLICATE_STEP
+        order = np.argsort(hashes)
+        hashes, material = hashes[order], material[order]
+
+    return {
+        'fingerprints': hashes,
+        'material': material,
+        'text_hash': np.array([_hash(dwg_data.get('text_content') or '')], dtype=np.uint64),
+    }
+
+
+def compute_delta(old: Optional[Dict[str, np.ndarray]], new: Dict[str, np.ndarray]) -> Dict:
+    """
+    Difference between two fingerprint sets.
+
+    Returns:
+        Dict with added, removed and unchanged entity counts, and material: True when
+        text, dimensions or block text changed (or there is no previous revision)
+    """
+    if old is None:
+        return {'added': len(new['fingerprints']), 'removed': 0, 'unchanged': 0, 'material': True}
+
+    added = ~np.isin(new['fingerprints'], old['fingerprints'], assume_unique=True)
+    removed = ~np.isin(old['fingerprints'], new['fingerprints'], assume_unique=True)
+    material = (bool(new['material'][added].any()) or bool(old['material'][removed].any())
+                or int(old['text_hash'][0]) != int(new['text_hash'][0]))
+    return {
+        'added': int(added.sum()),
+        'removed': int(removed.sum()),
+        'unchanged': int(len(added) - added.sum()),
+        'material': material,
+    }
+
+
+def save_fingerprints(drawing_id: str, fingerprints: Dict[str, np.ndarray]) -> bool:
+    """Store a drawing's fingerprints in its sidecar directory."""
+    try:
+        path = sidecar_path(drawing_id, FINGERPRINT_FILE, create=True)
+        atomic_write(path, lambda f: np.savez_compressed(f, **fingerprints))
+        return True
+    except Exception:
+        return False
+
+
+def load_fingerprints(drawing_id: str) -> Optional[Dict[str, np.ndarray]]:
+    """Fingerprints saved for a drawing, or None if there are none."""
+    try:
+        with np.load(sidecar_path(drawing_id, FINGERPRINT_FILE)) as arrays:
+            return {name: arrays[name] for name in arrays.files}
+    except (OSError, ValueError, KeyError):
+        return None
@@ -0,0 +1,204 @@
+# entityHandlers.py
+#**************************************************************************************************
+#   Registry of per-DXF-type entity extractors.
+#   Each handler turns one ezdxf entity into the type-specific values of its record; the common
+#   values (type, layer, color) are added by extract_entity(), which looks the handler up once
+#   per entity. New entity types are supported by registering a handler, without touching the
+#   extraction loop.
+#**************************************************************************************************
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ezdxf.lldxf.const import DXFError
+
+from entityStore import EntityStore
+from geometryStore import (
+    ellipse_path, hatch_paths, leader_path, lwpolyline_path, polyline_path, solid_path, spline_path,
+)
+
+# Handler: (entity, entity.dxf) -> values of the entity's record, or None to skip the entity
+EntityHandler = Callable[[object, object], Optional[Dict]]
+
+# DXF type -> handler, in registration order
+ENTITY_HANDLERS: Dict[str, EntityHandler] = {}
+
+# Entity types whose 'text' value goes into the drawing's text content
+TEXT_CONTENT_TYPES = {'TEXT', 'MTEXT', 'ATTRIB'}
+
+# Errors raised by ezdxf on malformed or unsupported entity data; the entity is skipped
+HANDLER_ERRORS = (AttributeError, TypeError, ValueError, ArithmeticError, DXFError)
+
+
+def register_entity_handler(*dxftypes: str) -> Callable[[EntityHandler], EntityHandler]:
+    """
+    Decorator registering a handler for one or more DXF entity types.
+
+    A later registration for the same type replaces the earlier one, so an
+    application can override any of the built-in handlers.
+    """
+    def decorator(handler: EntityHandler) -> EntityHandler:
+        for dxftype in dxftypes:
+            ENTITY_HANDLERS[dxftype] = handler
+        return handler
+    return decorator
+
+
+def extract_entity(entity, dxftype: Optional[str] = None) -> Optional[Dict]:
+    """
+    Record of a single entity: type, layer and color plus the values of its handler.
+
+    Coordinates are (x, y) tuples and measurements floats; polylines, hatches and
+    curves also carry their vertex paths under 'paths' (see geometryStore).
+
+    Returns:
+        The record, or None if the type has no handler or its data could not be read
+    """
+    dxftype = dxftype or entity.dxftype()
+    handler = ENTITY_HANDLERS.get(dxftype)
+    if handler is None:
+        return None
+    dxf = entity.dxf
+    try:
+        values = handler(entity, dxf)
+        if values is None:
+            return None
+        record = {'type': dxftype, 'layer': dxf.layer, 'color': dxf.color}
+        record.update(values)
+        return record
+    except HANDLER_ERRORS:
+        return None
+
+
+def extract_entities(entities: Iterable) -> Iterator[Dict]:
+    """
+    Records of every entity with a registered handler, in order.
+
+    Attributes attached to a block reference follow the INSERT's own record when
+    ATTRIB has a handler.
+    """
+    handlers = ENTITY_HANDLERS
+    for entity in entities:
+        dxftype = entity.dxftype()
+        if dxftype not in handlers:
+            continue
+        record = extract_entity(entity, dxftype)
+        if record is not None:
+            yield record
+        if dxftype == 'INSERT' and 'ATTRIB' in handlers:
+            for attrib in entity.attribs:
+                record = extract_entity(attrib, 'ATTRIB')
+                if record is not None:
+                    yield record
+
+
+def collect_entities(entities: Iterable, layout: str = '') -> Tuple[EntityStore, List[str]]:
+    """
+    Run the handlers over an iterable of DXF entities, tagging them with `layout`.
+
+    Returns:
+        Tuple of (EntityStore with measured paths, text of TEXT_CONTENT_TYPES entities)
+    """
+    store = EntityStore()
+    text_elements = []
+    for record in extract_entities(entities):
+        record['layout'] = layout
+        store.append_record(record)
+
+        # Collect text content for semantic search
+        if record['type'] in TEXT_CONTENT_TYPES:
+            text_elements.append(record['text'])
+
+    # vertex_count, perimeter and area of polylines, hatches and curves
+    store.measure_paths()
+    return store, text_elements
+
+
+#==================================================================================================
+# BUILT-IN HANDLERS
+#==================================================================================================
+
+def _xy(point) -> tuple:
+    return point.x, point.y
+
+
+@register_entity_handler('LINE')
+def _line(entity, dxf) -> Dict:
+    start, end = dxf.start, dxf.end
+    return {'start': _xy(start), 'end': _xy(end), 'length': start.distance(end)}
+
+
+@register_entity_handler('CIRCLE')
+def _circle(entity, dxf) -> Dict:
+    return {'center': _xy(dxf.center), 'radius': dxf.radius, 'diameter': dxf.radius * 2}
+
+
+@register_entity_handler('ARC')
+def _arc(entity, dxf) -> Dict:
+    return {'center': _xy(dxf.center), 'radius': dxf.radius,
+            'start_angle': dxf.start_angle, 'end_angle': dxf.end_angle}
+
+
+@register_entity_handler('LWPOLYLINE')
+def _lwpolyline(entity, dxf) -> Dict:
+    # Vertices go to EntityStore.paths; EntityStore.measure_paths() adds the measurements
+    return {'paths': [lwpolyline_path(entity)]}
+
+
+@register_entity_handler('POLYLINE')
+def _polyline(entity, dxf) -> Dict:
+    path = polyline_path(entity)
+    return {'paths': [path] if path else []}
+
+
+@register_entity_handler('TEXT')
+def _text(entity, dxf) -> Dict:
+    return {'text': dxf.text, 'height': dxf.height, 'position': _xy(dxf.insert)}
+
+
+@register_entity_handler('MTEXT')
+def _mtext(entity, dxf) -> Dict:
+    return {'text': entity.text, 'height': dxf.char_height, 'position': _xy(dxf.insert)}
+
+
+@register_entity_handler('INSERT')
+def _insert(entity, dxf) -> Dict:
+    return {'block_name': dxf.name, 'position': _xy(dxf.insert),
+            'scale': (dxf.xscale, dxf.yscale), 'rotation': dxf.rotation}
+
+
+@register_entity_handler('DIMENSION')
+def _dimension(entity, dxf) -> Dict:
+    return {'measurement': entity.get_measurement(), 'text': dxf.text}
+
+
+@register_entity_handler('HATCH')
+def _hatch(entity, dxf) -> Dict:
+    paths = hatch_paths(entity)
+    return {'pattern': dxf.pattern_name, 'path_count': float(len(paths)), 'paths': paths}
+
+
+@register_entity_handler('SPLINE')
+def _spline(entity, dxf) -> Dict:
+    return {'degree': float(dxf.degree), 'control_points': float(len(entity.control_points)),
+            'fit_points': float(len(entity.fit_points)), 'paths': [spline_path(entity)]}
+
+
+@register_entity_handler('ELLIPSE')
+def _ellipse(entity, dxf) -> Dict:
+    major_radius = dxf.major_axis.magnitude
+    return {'center': _xy(dxf.center), 'major_radius': major_radius,
+            'minor_radius': major_radius * dxf.ratio, 'paths': [ellipse_path(entity)]}
+
+
+@register_entity_handler('LEADER')
+def _leader(entity, dxf) -> Dict:
+    return {'dimstyle': dxf.dimstyle, 'paths': [leader_path(entity)]}
+
+
+@register_entity_handler('ATTRIB')
+def _attrib(entity, dxf) -> Dict:
+    return {'tag': dxf.tag, 'text': dxf.text, 'height': dxf.height, 'position': _xy(dxf.insert)}
+
+
+@register_entity_handler('SOLID', 'TRACE')
+def _solid(entity, dxf) -> Dict:
+    return {'paths': [solid_path(entity)]}
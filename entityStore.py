@@ -0,0 +1,564 @@
+# entityStore.py
+#**************************************************************************************************
+#   Columnar, array-backed storage for extracted DXF entities.
+#   Entity types and layers are interned to small integer codes, and each entity type keeps its
+#   own typed columns (points, floats, strings) so summary statistics can be computed with NumPy
+#   instead of re-parsing formatted strings.
+#**************************************************************************************************
+import math
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from geometryStore import PathBuffer
+
+# Color value stored when an entity has no color attribute
+NO_COLOR = -32768
+
+# Record keys that always hold free text and are never parsed as numbers
+STRING_FIELDS = {'text', 'block_name', 'name', 'tag', 'pattern', 'dimstyle'}
+
+# Record keys kept in the per-entity code arrays rather than in the type tables
+COMMON_FIELDS = ('type', 'layer', 'color', 'layout')
+
+# Record key holding an entity's vertex paths (see geometryStore), kept in EntityStore.paths
+PATHS_FIELD = 'paths'
+
+# Numeric fields scaled or rotated along with the coordinates by EntityStore.transformed()
+LENGTH_FIELDS = {'length', 'radius', 'diameter', 'height', 'perimeter', 'major_radius', 'minor_radius'}
+AREA_FIELDS = {'area'}
+ANGLE_FIELDS = {'start_angle', 'end_angle', 'rotation'}
+
+# Column kinds
+_NUM = 'num'        # one float64 per row
+_POINT = 'point'    # two float64 per row (x, y)
+_STR = 'str'        # Python string (or None) per row
+_NONE = 'none'      # no value seen yet, only a row count
+
+
+def _parse_legacy_value(key: str, value):
+    """Turn a pre-formatted legacy value ("12.34,56.78", "14.14") back into numbers."""
+    if not isinstance(value, str) or key in STRING_FIELDS:
+        return value
+    parts = value.split(',')
+    try:
+        numbers = tuple(float(part) for part in parts)
+    except ValueError:
+        return value
+    if len(numbers) == 1:
+        return numbers[0]
+    if len(numbers) == 2:
+        return numbers
+    return value
+
+
+class _TypeTable:
+    """Columns for all entities of a single DXF type."""
+
+    def __init__(self):
+        self.size = 0
+        self.columns: Dict[str, list] = {}  # name -> [kind, data]
+
+    def _new_column(self, value) -> list:
+        if value is None:
+            return [_NONE, self.size]
+        if isinstance(value, str):
+            return [_STR, [None] * self.size]
+        if isinstance(value, (tuple, list)) and len(value) == 2:
+            return [_POINT, array('d', [math.nan]) * (2 * self.size)]
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return [_NUM, array('d', [math.nan]) * self.size]
+        return [_STR, [None] * self.size]
+
+    def _to_list_column(self, column: list) -> None:
+        """Fall back to a plain list when a value does not fit the column type."""
+        kind, data = column
+        values = [_format_value(kind, data, i) for i in range(self.size)]
+        column[0], column[1] = _STR, values
+
+    def append(self, values: Dict) -> int:
+        for name, value in values.items():
+            column = self.columns.get(name)
+            if column is None or (column[0] == _NONE and value is not None):
+                # New columns (and untyped ones getting their first value) start padded
+                self.columns[name] = self._new_column(value)
+
+        for name, column in self.columns.items():
+            kind, data = column
+            value = values.get(name)
+            if kind == _NONE:
+                column[1] += 1
+            elif kind == _NUM:
+                if value is None:
+                    data.append(math.nan)
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    data.append(value)
+                else:
+                    self._to_list_column(column)
+                    column[1].append(value)
+            elif kind == _POINT:
+                if value is None:
+                    data.extend((math.nan, math.nan))
+                elif isinstance(value, (tuple, list)) and len(value) == 2:
+                    data.extend((float(value[0]), float(value[1])))
+                else:
+                    self._to_list_column(column)
+                    column[1].append(value)
+            else:
+                data.append(value)
+
+        self.size += 1
+        return self.size - 1
+
+    def row(self, index: int) -> Dict:
+        return {name: _format_value(kind, data, index) for name, (kind, data) in self.columns.items()}
+
+    def raw_row(self, index: int) -> Dict:
+        """Row values as stored (floats, (x, y) tuples, strings or None)."""
+        return {name: _raw_value(kind, data, index) for name, (kind, data) in self.columns.items()}
+
+    def copy(self) -> '_TypeTable':
+        table = _TypeTable()
+        table.size = self.size
+        table.columns = {name: [kind, data if kind == _NONE else data[:]]
+                         for name, (kind, data) in self.columns.items()}
+        return table
+
+    def extend(self, other: '_TypeTable') -> int:
+        """Append all rows of another table. Returns the row number of the first one."""
+        offset = self.size
+        if not self.size:
+            copied = other.copy()
+            self.columns, self.size = copied.columns, copied.size
+            return offset
+        if [(n, c[0]) for n, c in self.columns.items()] == [(n, c[0]) for n, c in other.columns.items()]:
+            # Same layout: concatenate column by column
+            for name, column in self.columns.items():
+                column[1] += other.columns[name][1]
+            self.size += other.size
+            return offset
+        for index in range(other.size):
+            self.append(other.raw_row(index))
+        return offset
+
+    def nbytes(self) -> int:
+        total = 0
+        for kind, data in self.columns.values():
+            if kind in (_NUM, _POINT):
+                total += data.itemsize * len(data)
+            elif kind == _STR:
+                total += 8 * len(data) + sum(len(v) for v in data if v)
+        return total
+
+
+def _format_value(kind: str, data, index: int):
+    """Render a stored value the same way the legacy dict records did."""
+    if kind == _NUM:
+        value = data[index]
+        return None if math.isnan(value) else f"{value:.2f}"
+    if kind == _POINT:
+        x, y = data[2 * index], data[2 * index + 1]
+        return None if math.isnan(x) else f"{x:.2f},{y:.2f}"
+    if kind == _STR:
+        return data[index]
+    return None
+
+
+def _raw_value(kind: str, data, index: int):
+    if kind == _NUM:
+        value = data[index]
+        return None if math.isnan(value) else value
+    if kind == _POINT:
+        x, y = data[2 * index], data[2 * index + 1]
+        return None if math.isnan(x) else (x, y)
+    if kind == _STR:
+        return data[index]
+    return None
+
+
+class EntityStore:
+    """
+    Compact container for extracted entities.
+
+    Behaves like a read-only sequence of the legacy entity dicts ({'type', 'layer',
+    'color', ...} with values formatted as strings) so existing consumers keep working,
+    while keeping full-precision values in typed per-type columns. Entities tagged
+    with a layout name also carry a 'layout' key. Polyline and hatch vertices live in
+    `paths`, a PathBuffer indexed by entity, and are not part of the dict view.
+    """
+
+    def __init__(self):
+        self.type_names: List[str] = []
+        self.layer_names: List[str] = []
+        self.layout_names: List[str] = []
+        self._type_index: Dict[str, int] = {}
+        self._layer_index: Dict[str, int] = {}
+        self._layout_index: Dict[str, int] = {}
+        self._type_codes = array('H')
+        self._layer_codes = array('I')
+        self._layout_codes = array('H')
+        self._colors = array('h')
+        self._rows = array('I')  # row number inside the entity's type table
+        self._tables: Dict[str, _TypeTable] = {}
+        self.paths = PathBuffer()
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'EntityStore':
+        """Build a store from legacy entity dicts, parsing formatted values."""
+        store = cls()
+        for record in records:
+            values = {key: _parse_legacy_value(key, value) for key, value in record.items()
+                      if key not in COMMON_FIELDS}
+            color = record.get('color')
+            try:
+                color = int(color) if color not in (None, '') else None
+            except (TypeError, ValueError):
+                color = None
+            store.append(record.get('type', ''), record.get('layer', ''), color, values,
+                         layout=record.get('layout', ''))
+        return store
+
+    def _intern(self, names: List[str], index: Dict[str, int], name: str) -> int:
+        code = index.get(name)
+        if code is None:
+            code = len(names)
+            names.append(name)
+            index[name] = code
+        return code
+
+    def append(self, entity_type: str, layer: str, color: Optional[int], values: Dict,
+               layout: str = '', paths=None) -> None:
+        """
+        Add one entity. `values` holds floats, (x, y) tuples, strings or None;
+        `layout` names the layout the entity belongs to ('' for none, e.g. block contents)
+        and `paths` are its (vertices, closed) paths, if any.
+        """
+        if paths:
+            self.paths.add(len(self), paths)
+        table = self._tables.get(entity_type)
+        if table is None:
+            table = self._tables[entity_type] = _TypeTable()
+        self._type_codes.append(self._intern(self.type_names, self._type_index, entity_type))
+        self._layer_codes.append(self._intern(self.layer_names, self._layer_index, layer or ''))
+        self._layout_codes.append(self._intern(self.layout_names, self._layout_index, layout or ''))
+        self._colors.append(NO_COLOR if color is None else int(color))
+        self._rows.append(table.append(values))
+
+    def append_record(self, record: Dict) -> None:
+        """Add one entity given as {'type', 'layer', 'color', 'layout', **values}."""
+        values = {key: value for key, value in record.items()
+                  if key not in COMMON_FIELDS and key != PATHS_FIELD}
+        self.append(record['type'], record.get('layer', ''), record.get('color'), values,
+                    layout=record.get('layout', ''), paths=record.get(PATHS_FIELD))
+
+    def measure_paths(self) -> None:
+        """
+        Set the vertex_count, perimeter and area values of every entity with paths,
+        computed in one vectorized pass over `paths` (see PathBuffer.measurements).
+        """
+        if not len(self.paths):
+            return
+        measured = np.unique(self.paths.owners)
+        values = self.paths.measurements(len(self))
+        type_codes = self.type_codes[measured]
+        rows = np.frombuffer(self._rows, dtype=np.uint32)[measured]
+        for code in np.unique(type_codes):
+            table = self._tables[self.type_names[code]]
+            table_rows = rows[type_codes == code]
+            for name, column_values in values.items():
+                column = table.columns.get(name)
+                if column is None or column[0] == _NONE:
+                    column = table.columns[name] = [_NUM, array('d', [math.nan]) * table.size]
+                elif column[0] != _NUM:
+                    continue
+                np.frombuffer(column[1], dtype=np.float64)[table_rows] = column_values[measured[type_codes == code]]
+
+    def copy(self) -> 'EntityStore':
+        """Independent copy of the store."""
+        store = EntityStore()
+        store.type_names = list(self.type_names)
+        store.layer_names = list(self.layer_names)
+        store.layout_names = list(self.layout_names)
+        store._type_index = dict(self._type_index)
+        store._layer_index = dict(self._layer_index)
+        store._layout_index = dict(self._layout_index)
+        for name in ('_type_codes', '_layer_codes', '_layout_codes', '_colors', '_rows'):
+            setattr(store, name, getattr(self, name)[:])
+        store._tables = {name: table.copy() for name, table in self._tables.items()}
+        store.paths = self.paths.copy()
+        return store
+
+    def extend(self, other: 'EntityStore') -> None:
+        """Append every entity of another store, remapping its type and layer codes."""
+        if not len(other):
+            return
+        if other is self:
+            other = other.copy()
+        self.paths.extend(other.paths, entity_offset=len(self))
+        type_map = np.array([self._intern(self.type_names, self._type_index, name)
+                             for name in other.type_names], dtype=np.int64)
+        layer_map = np.array([self._intern(self.layer_names, self._layer_index, name)
+                              for name in other.layer_names], dtype=np.int64)
+        layout_map = np.array([self._intern(self.layout_names, self._layout_index, name)
+                               for name in other.layout_names], dtype=np.int64)
+        row_offsets = np.zeros(len(other.type_names), dtype=np.int64)
+        for name, table in other._tables.items():
+            mine = self._tables.get(name)
+            if mine is None:
+                mine = self._tables[name] = _TypeTable()
+            row_offsets[other._type_index[name]] = mine.extend(table)
+
+        codes = other.type_codes
+        self._type_codes.frombytes(type_map[codes].astype(np.uint16).tobytes())
+        self._layer_codes.frombytes(layer_map[other.layer_codes].astype(np.uint32).tobytes())
+        self._layout_codes.frombytes(layout_map[other.layout_codes].astype(np.uint16).tobytes())
+        self._colors.extend(other._colors)
+        rows = np.frombuffer(other._rows, dtype=np.uint32) + row_offsets[codes]
+        self._rows.frombytes(rows.astype(np.uint32).tobytes())
+
+    def transformed(self, insert=(0.0, 0.0), scale=(1.0, 1.0), rotation: float = 0.0,
+                    layer: Optional[str] = None, layout: Optional[str] = None,
+                    base_point=(0.0, 0.0)) -> 'EntityStore':
+        """
+        Copy of the store mapped through a block insert transform: move the block's
+        `base_point` to the origin, scale, rotate by `rotation` degrees, then move to `insert`.
+
+        Points are transformed exactly; LENGTH_FIELDS are scaled by the geometric mean
+        of the scale factors and ANGLE_FIELDS are rotated, so non-uniform scales are
+        approximated for circles and arcs. Entities on layer "0" move to `layer` when
+        given, like block contents drawn on the insert's layer, and entities without
+        a layout are tagged with `layout`.
+        """
+        store = self.copy()
+        sx, sy = scale
+        cos_a, sin_a = math.cos(math.radians(rotation)), math.sin(math.radians(rotation))
+        linear = math.sqrt(abs(sx * sy))
+        store.paths = self.paths.transformed(insert, scale, cos_a, sin_a, base_point)
+
+        for table in store._tables.values():
+            for name, column in table.columns.items():
+                kind, data = column
+                if kind not in (_NUM, _POINT) or not len(data):
+                    continue
+                values = np.array(data, dtype=np.float64)
+                if kind == _POINT:
+                    xy = values.reshape(-1, 2)
+                    if name != 'scale':
+                        xy = xy - base_point
+                    xy = xy * (sx, sy)
+                    if name != 'scale':
+                        x, y = xy[:, 0].copy(), xy[:, 1].copy()
+                        xy[:, 0] = x * cos_a - y * sin_a + insert[0]
+                        xy[:, 1] = x * sin_a + y * cos_a + insert[1]
+                    values = xy
+                elif name in LENGTH_FIELDS:
+                    values *= linear
+                elif name in AREA_FIELDS:
+                    values *= abs(sx * sy)
+                elif name in ANGLE_FIELDS:
+                    values = np.mod(values + rotation, 360.0)
+                else:
+                    continue
+                column[1] = array('d', values.tobytes())
+
+        if layer and '0' in store._layer_index:
+            codes = store.layer_codes.copy()
+            codes[codes == store._layer_index['0']] = store._intern(store.layer_names, store._layer_index, layer)
+            store._layer_codes = array('I', codes.tobytes())
+        if layout and '' in store._layout_index:
+            codes = store.layout_codes.copy()
+            codes[codes == store._layout_index['']] = store._intern(store.layout_names, store._layout_index, layout)
+            store._layout_codes = array('H', codes.tobytes())
+        return store
+
+    #----------------------------------------------------------------------------------------------
+    # Sequence protocol (legacy dict view)
+    #----------------------------------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._type_codes)
+
+    def record(self, index: int) -> Dict:
+        """Return entity `index` as a legacy-style dict."""
+        entity_type = self.type_names[self._type_codes[index]]
+        color = self._colors[index]
+        data = {
+            'type': entity_type,
+            'layer': self.layer_names[self._layer_codes[index]],
+            'color': None if color == NO_COLOR else color,
+        }
+        layout = self.layout_names[self._layout_codes[index]]
+        if layout:
+            data['layout'] = layout
+        data.update(self._tables[entity_type].row(self._rows[index]))
+        return data
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('entity index out of range')
+        return self.record(index)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (EntityStore, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    #----------------------------------------------------------------------------------------------
+    # Columnar access
+    #----------------------------------------------------------------------------------------------
+
+    @property
+    def type_codes(self) -> np.ndarray:
+        return np.frombuffer(self._type_codes, dtype=np.uint16) if len(self) else np.zeros(0, np.uint16)
+
+    @property
+    def layer_codes(self) -> np.ndarray:
+        return np.frombuffer(self._layer_codes, dtype=np.uint32) if len(self) else np.zeros(0, np.uint32)
+
+    @property
+    def layout_codes(self) -> np.ndarray:
+        return np.frombuffer(self._layout_codes, dtype=np.uint16) if len(self) else np.zeros(0, np.uint16)
+
+    @property
+    def colors(self) -> np.ndarray:
+        return np.frombuffer(self._colors, dtype=np.int16) if len(self) else np.zeros(0, np.int16)
+
+    @property
+    def rows(self) -> np.ndarray:
+        """Row number of each entity inside its type's columns (see column())."""
+        return np.frombuffer(self._rows, dtype=np.uint32) if len(self) else np.zeros(0, np.uint32)
+
+    def column_names(self, entity_type: str) -> List[str]:
+        """Names of the columns of an entity type, in record order."""
+        table = self._tables.get(entity_type)
+        return list(table.columns) if table else []
+
+    def column(self, entity_type: str, name: str) -> Union[np.ndarray, List]:
+        """
+        Return one column of an entity type.
+
+        Numeric columns come back as float64 arrays (points as shape (n, 2)) with NaN
+        for missing values; text columns as lists. The arrays share memory with the
+        store, so drop them before appending more entities.
+        """
+        table = self._tables.get(entity_type)
+        if table is None or name not in table.columns:
+            return np.zeros(0)
+        kind, data = table.columns[name]
+        if kind == _NUM:
+            return np.frombuffer(data, dtype=np.float64) if len(data) else np.zeros(0)
+        if kind == _POINT:
+            return np.frombuffer(data, dtype=np.float64).reshape(-1, 2) if len(data) else np.zeros((0, 2))
+        if kind == _NONE:
+            return np.full(data, np.nan)
+        return data
+
+    def type_counts(self) -> Dict[str, int]:
+        """Count entities per DXF type."""
+        counts = np.bincount(self.type_codes, minlength=len(self.type_names))
+        return {name: int(counts[code]) for code, name in enumerate(self.type_names) if counts[code]}
+
+    def value_range(self, entity_type: str, name: str) -> Optional[tuple]:
+        """(min, max) of a numeric column ignoring missing values, or None."""
+        values = self.column(entity_type, name)
+        if not isinstance(values, np.ndarray) or values.ndim != 1 or not values.size:
+            return None
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return None
+        return float(values.min()), float(values.max())
+
+    def indices(self, entity_types: Optional[Sequence[str]] = None,
+                layers: Optional[Sequence[str]] = None,
+                layouts: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Global entity indices matching the given types, layers and/or layouts, in entity order."""
+        mask = np.ones(len(self), dtype=bool)
+        if entity_types is not None:
+            codes = [self._type_index[t] for t in entity_types if t in self._type_index]
+            mask &= np.isin(self.type_codes, codes)
+        if layers is not None:
+            codes = [self._layer_index[l] for l in layers if l in self._layer_index]
+            mask &= np.isin(self.layer_codes, codes)
+        if layouts is not None:
+            codes = [self._layout_index[l] for l in layouts if l in self._layout_index]
+            mask &= np.isin(self.layout_codes, codes)
+        return np.nonzero(mask)[0]
+
+    def layout_counts(self, entity_types: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """Count entities (optionally only of the given types) per layout name."""
+        codes = self.layout_codes[self.indices(entity_types)]
+        counts = np.bincount(codes, minlength=len(self.layout_names))
+        return {name: int(counts[code]) for code, name in enumerate(self.layout_names) if counts[code]}
+
+    def texts(self, entity_types: Sequence[str] = ('TEXT', 'MTEXT'), field: str = 'text',
+              layouts: Optional[Sequence[str]] = None) -> List[str]:
+        """Text values of the given entity types, in entity order."""
+        result = []
+        for index in self.indices(entity_types, layouts=layouts):
+            table = self._tables[self.type_names[self._type_codes[index]]]
+            column = table.columns.get(field)
+            if column and column[0] == _STR:
+                value = column[1][self._rows[index]]
+                if value:
+                    result.append(value)
+        return result
+
+    def bounding_boxes(self) -> np.ndarray:
+        """
+        (n, 4) array of xmin, ymin, xmax, ymax per entity, NaN where no geometry is known.
+
+        Lines use their end points, circles and arcs their full circle, entities with
+        only a position (text, inserts) a point extended upwards by their height, and
+        polylines and hatches the extent of their vertices.
+        """
+        boxes = np.full((len(self), 4), np.nan)
+        for entity_type, table in self._tables.items():
+            rows = self.indices([entity_type])
+            columns = table.columns
+            if 'start' in columns and 'end' in columns:
+                start, end = self.column(entity_type, 'start'), self.column(entity_type, 'end')
+                if start.ndim == 2 and end.ndim == 2:
+                    boxes[rows, :2] = np.minimum(start, end)
+                    boxes[rows, 2:] = np.maximum(start, end)
+            elif 'center' in columns and 'radius' in columns:
+                center, radius = self.column(entity_type, 'center'), self.column(entity_type, 'radius')
+                if center.ndim == 2 and radius.ndim == 1:
+                    boxes[rows, :2] = center - radius[:, None]
+                    boxes[rows, 2:] = center + radius[:, None]
+            elif 'position' in columns:
+                position = self.column(entity_type, 'position')
+                if position.ndim == 2:
+                    boxes[rows, :2] = position
+                    boxes[rows, 2:] = position
+                    height = self.column(entity_type, 'height') if 'height' in columns else None
+                    if isinstance(height, np.ndarray) and height.ndim == 1 and height.size:
+                        boxes[rows, 3] += np.nan_to_num(height)
+        if len(self.paths):
+            path_boxes = self.paths.bounding_boxes(len(self))
+            known = ~np.isnan(path_boxes[:, 0])
+            boxes[known] = path_boxes[known]
+        return boxes
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the store's data."""
+        common = sum(a.itemsize * len(a) for a in (self._type_codes, self._layer_codes, self._layout_codes,
+                                                   self._colors, self._rows))
+        return common + sum(table.nbytes() for table in self._tables.values()) + self.paths.nbytes()
+
+
+def as_entity_store(entities: Union[EntityStore, Iterable[Dict]]) -> EntityStore:
+    """Return `entities` as an EntityStore, converting legacy dict lists."""
+    if isinstance(entities, EntityStore):
+        return entities
+    return EntityStore.from_records(entities)
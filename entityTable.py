@@ -0,0 +1,319 @@
+# entityTable.py
+#**************************************************************************************************
+#   Per-drawing binary copy of every extracted entity record, written once at ingest.
+#   Entities are fixed-width records (type, layer, layout and color codes plus the range of their
+#   values), values are fixed-width (field, kind, text, x, y) records and text lives in a string
+#   table. All arrays are saved as .npy files and memory-mapped on read, so selecting entities by
+#   type or layer and rendering the full CSV never touches the source drawing.
+#**************************************************************************************************
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from drawingStore import atomic_write, sidecar_path
+from entityStore import NO_COLOR, as_entity_store
+
+ENTITY_TABLE_FILE = 'entity_table.json'
+_ARRAY_FILES = {
+    'records': 'entity_records.npy',
+    'values': 'entity_values.npy',
+    'text': 'entity_text.npy',
+    'text_offsets': 'entity_text_offsets.npy',
+}
+
+# Bump when the record layout changes; older tables are then ignored
+ENTITY_TABLE_VERSION = 1
+
+RECORD_DTYPE = np.dtype([
+    ('type', '<u2'), ('layout', '<u2'), ('color', '<i2'), ('layer', '<u4'),
+    ('value_start', '<u8'), ('value_count', '<u2'),
+])
+VALUE_DTYPE = np.dtype([
+    ('field', '<u2'), ('kind', 'u1'), ('text', '<u4'), ('x', '<f8'), ('y', '<f8'),
+])
+
+# Value kinds
+_NUM = 1
+_POINT = 2
+_STR = 3
+
+
+class _StringTable:
+    """Interned UTF-8 strings, saved as one byte blob plus offsets."""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.encoded: List[bytes] = []
+
+    def add(self, value: str) -> int:
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.encoded)
+            self.encoded.append(value.encode('utf-8'))
+        return code
+
+    def to_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = np.zeros(len(self.encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(b) for b in self.encoded], out=offsets[1:])
+        return np.frombuffer(b''.join(self.encoded), dtype=np.uint8), offsets
+
+
+def _table_arrays(entities) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """Record, value and string arrays of an EntityStore, plus the value field names."""
+    entities = as_entity_store(entities)
+    count = len(entities)
+    strings = _StringTable()
+    field_names: List[str] = []
+    field_index: Dict[str, int] = {}
+    owners, orders, fields, kinds, texts, xs, ys = [], [], [], [], [], [], []
+
+    type_codes = entities.type_codes
+    rows = entities.rows
+    for code, entity_type in enumerate(entities.type_names):
+        members = np.nonzero(type_codes == code)[0]
+        if not len(members):
+            continue
+        member_rows = rows[members]
+        for order, name in enumerate(entities.column_names(entity_type)):
+            if name not in field_index:
+                field_index[name] = len(field_names)
+                field_names.append(name)
+            column = entities.column(entity_type, name)
+            if isinstance(column, np.ndarray):
+                values = column[member_rows]
+                if values.ndim == 2:
+                    present = ~np.isnan(values[:, 0])
+                    x, y, kind = values[present, 0], values[present, 1], _POINT
+                else:
+                    present = ~np.isnan(values)
+                    x, y, kind = values[present], np.zeros(int(present.sum())), _NUM
+                text = np.zeros(len(x), dtype=np.uint32)
+            else:
+                values = [column[row] for row in member_rows]
+                present = np.array([value is not None for value in values], dtype=bool)
+                text = np.array([strings.add(str(value)) for value in values if value is not None], dtype=np.uint32)
+                x = y = np.zeros(len(text))
+                kind = _STR
+            owners.append(members[present])
+            orders.append(np.full(len(text), order))
+            fields.append(np.full(len(text), field_index[name]))
+            kinds.append(np.full(len(text), kind))
+            texts.append(text)
+            xs.append(x)
+            ys.append(y)
+
+    if owners:
+        owner = np.concatenate(owners)
+        order = np.lexsort((np.concatenate(orders), owner))
+        owner = owner[order]
+    else:
+        owner = order = np.zeros(0, dtype=np.int64)
+    values = np.zeros(len(owner), dtype=VALUE_DTYPE)
+    if len(owner):
+        values['field'] = np.concatenate(fields)[order]
+        values['kind'] = np.concatenate(kinds)[order]
+        values['text'] = np.concatenate(texts)[order]
+        values['x'] = np.concatenate(xs)[order]
+        values['y'] = np.concatenate(ys)[order]
+
+    records = np.zeros(count, dtype=RECORD_DTYPE)
+    records['type'] = type_codes
+    records['layout'] = entities.layout_codes
+    records['color'] = entities.colors
+    records['layer'] = entities.layer_codes
+    value_count = np.bincount(owner, minlength=count)
+    records['value_count'] = value_count
+    records['value_start'] = np.concatenate(([0], np.cumsum(value_count)[:-1])) if count else []
+
+    text, text_offsets = strings.to_arrays()
+    arrays = {'records': records, 'values': values, 'text': text, 'text_offsets': text_offsets}
+    names = {
+        'type_names': list(entities.type_names),
+        'layer_names': list(entities.layer_names),
+        'layout_names': list(entities.layout_names),
+        'field_names': field_names,
+    }
+    return arrays, names
+
+
+class EntityTable:
+    """
+    Read-only, memory-mapped view of a drawing's saved entity records.
+
+    Behaves like a sequence of the legacy entity dicts (values formatted as by
+    EntityStore, missing values left out), with vectorized selection by entity
+    type, layer and layout.
+    """
+
+    def __init__(self, header: Dict, arrays: Dict[str, np.ndarray]):
+        self.header = header
+        self.records = arrays['records']
+        self.values = arrays['values']
+        self._text = arrays['text']
+        self._text_offsets = arrays['text_offsets']
+        self.type_names: List[str] = header['type_names']
+        self.layer_names: List[str] = header['layer_names']
+        self.layout_names: List[str] = header['layout_names']
+        self.field_names: List[str] = header['field_names']
+        self.layers: List[Dict] = header.get('layers', [])
+        self.blocks: List[Dict] = header.get('blocks', [])
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _string(self, code: int) -> str:
+        start, end = int(self._text_offsets[code]), int(self._text_offsets[code + 1])
+        return bytes(self._text[start:end]).decode('utf-8')
+
+    def record(self, index: int) -> Dict:
+        """Entity `index` as a legacy-style dict."""
+        entry = self.records[index]
+        color = int(entry['color'])
+        data = {
+            'type': self.type_names[entry['type']],
+            'layer': self.layer_names[entry['layer']],
+            'color': None if color == NO_COLOR else color,
+        }
+        layout = self.layout_names[entry['layout']]
+        if layout:
+            data['layout'] = layout
+        start = int(entry['value_start'])
+        for value in self.values[start:start + int(entry['value_count'])]:
+            kind = value['kind']
+            if kind == _NUM:
+                formatted = f"{value['x']:.2f}"
+            elif kind == _POINT:
+                formatted = f"{value['x']:.2f},{value['y']:.2f}"
+            else:
+                formatted = self._string(int(value['text']))
+            data[self.field_names[value['field']]] = formatted
+        return data
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('entity index out of range')
+        return self.record(index)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def indices(self, entity_types: Optional[Sequence[str]] = None,
+                layers: Optional[Sequence[str]] = None,
+                layouts: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Entity indices matching the given types, layers and/or layouts, in entity order."""
+        mask = np.ones(len(self), dtype=bool)
+        for field, names, wanted in (('type', self.type_names, entity_types),
+                                     ('layer', self.layer_names, layers),
+                                     ('layout', self.layout_names, layouts)):
+            if wanted is not None:
+                codes = [code for code, name in enumerate(names) if name in set(wanted)]
+                mask &= np.isin(self.records[field], codes)
+        return np.nonzero(mask)[0]
+
+    def select(self, entity_types: Optional[Sequence[str]] = None,
+               layers: Optional[Sequence[str]] = None,
+               layouts: Optional[Sequence[str]] = None,
+               offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """Records matching the filters (see indices()), paged by offset and limit."""
+        selected = self.indices(entity_types, layers, layouts)[offset:]
+        if limit is not None:
+            selected = selected[:limit]
+        return [self.record(int(i)) for i in selected]
+
+    def type_counts(self) -> Dict[str, int]:
+        """Count entities per DXF type."""
+        counts = np.bincount(self.records['type'], minlength=len(self.type_names))
+        return {name: int(counts[code]) for code, name in enumerate(self.type_names) if counts[code]}
+
+    def as_dwg_data(self) -> Dict:
+        """The entities, layers and blocks in the shape DWGProcessor.convert_to_csv() expects."""
+        return {'entities': self, 'layers': self.layers, 'blocks': self.blocks,
+                'metadata': {}, 'text_content': ''}
+
+    def matches_source(self, path: str) -> bool:
+        """True if `path` still has the size and modification time it had when the table was saved."""
+        source = self.header.get('source') or {}
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return source.get('size') == stat.st_size and source.get('mtime') == stat.st_mtime_ns
+
+
+#==================================================================================================
+# PER-DRAWING STORAGE
+#==================================================================================================
+
+def save_entity_table(drawing_id: str, dwg_data: Dict, source_path: Optional[str] = None) -> bool:
+    """
+    Save the entity records, layers and blocks of an extract_dwg_data() result.
+
+    The arrays are written first and the JSON header last, so a reader never sees a
+    header pointing at arrays of another revision with matching sizes.
+    """
+    try:
+        arrays, header = _table_arrays(dwg_data['entities'])
+        header.update({
+            'version': ENTITY_TABLE_VERSION,
+            'entity_count': len(arrays['records']),
+            'value_count': len(arrays['values']),
+            'layers': [{key: layer.get(key) for key in ('name', 'color', 'linetype', 'on')}
+                       for layer in dwg_data.get('layers', [])],
+            'blocks': [{'name': block['name'], 'entity_count': block.get('entity_count', 0)}
+                       for block in dwg_data.get('blocks', [])],
+        })
+        if source_path:
+            stat = os.stat(source_path)
+            header['source'] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        for name, filename in _ARRAY_FILES.items():
+            path = sidecar_path(drawing_id, filename, create=True)
+            atomic_write(path, lambda f, array=arrays[name]: np.save(f, array, allow_pickle=False))
+        header_path = sidecar_path(drawing_id, ENTITY_TABLE_FILE)
+        atomic_write(header_path, lambda f: f.write(json.dumps(header).encode('utf-8')))
+        _loaded.pop(drawing_id, None)
+        return True
+    except Exception:
+        return False
+
+
+# Recently opened tables, validated by header modification time
+_loaded: 'OrderedDict[str, Tuple[float, EntityTable]]' = OrderedDict()
+_MAX_LOADED = 8
+
+
+def load_entity_table(drawing_id: str) -> Optional[EntityTable]:
+    """Memory-map a drawing's saved entity table, or None if it has none."""
+    header_path = sidecar_path(drawing_id, ENTITY_TABLE_FILE)
+    try:
+        mtime = os.path.getmtime(header_path)
+    except OSError:
+        return None
+
+    cached = _loaded.get(drawing_id)
+    if cached and cached[0] == mtime:
+        _loaded.move_to_end(drawing_id)
+        return cached[1]
+
+    try:
+        with open(header_path, 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('version') != ENTITY_TABLE_VERSION:
+            return None
+        arrays = {name: np.load(sidecar_path(drawing_id, filename), mmap_mode='r', allow_pickle=False)
+                  for name, filename in _ARRAY_FILES.items()}
+    except (OSError, ValueError):
+        return None
+    if len(arrays['records']) != header['entity_count'] or len(arrays['values']) != header['value_count']:
+        return None  # interrupted rewrite
+
+    table = EntityTable(header, arrays)
+    _loaded[drawing_id] = (mtime, table)
+    while len(_loaded) > _MAX_LOADED:
+        _loaded.popitem(last=False)
+    return table
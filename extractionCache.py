@@ -0,0 +1,169 @@
+# extractionCache.py
+#**************************************************************************************************
+#   On-disk cache of extract_dwg_data() results, keyed by file content hash and extractor version.
+#   Re-indexing an unchanged drawing skips ODA conversion and DXF parsing entirely.
+#   Entries are compressed pickles; the cache is size-bounded with least-recently-used eviction.
+#**************************************************************************************************
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_MB
+
+CACHE_SUFFIX = '.extract'
+
+# Eviction trims the cache to this share of max_bytes, so the directory is not
+# rescanned on every put once the cache is full
+EVICT_TARGET = 0.9
+
+
+def hash_file_content(path: str, chunk_size: int = 1024 * 1024) -> Optional[str]:
+    """BLAKE2b digest of a file's content, or None if it cannot be read."""
+    try:
+        hasher = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+    except OSError:
+        return None
+
+
+class ExtractionCache:
+    """
+    Size-bounded LRU cache of extracted drawing data stored as one file per entry.
+
+    The total size is scanned from the directory once, then kept up to date by put()
+    and eviction; the directory is only rescanned when that total goes over budget.
+    """
+
+    def __init__(self, cache_dir=EXTRACTION_CACHE_DIR, max_mb: float = EXTRACTION_CACHE_MAX_MB):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._total: Optional[int] = None  # bytes in the cache, None until first scanned
+        # (path, size, mtime) -> content hash, so batch stages do not hash a file twice
+        self._hash_memo: Dict[tuple, str] = {}
+
+    def content_hash(self, path: str) -> Optional[str]:
+        """hash_file_content(), remembered while the file's size and mtime stay the same."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        stamp = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self._hash_memo.get(stamp)
+        if not content_hash:
+            content_hash = hash_file_content(path)
+            if content_hash:
+                self._hash_memo[stamp] = content_hash
+        return content_hash
+
+    def make_key(self, path: str, extractor_version: str, mode: str) -> Optional[str]:
+        """Cache key for a file: content hash plus extractor version and mode."""
+        content_hash = self.content_hash(path)
+        if not content_hash:
+            return None
+        return f"{content_hash}-{extractor_version}-{mode}"
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / (key + CACHE_SUFFIX)
+
+    def contains(self, key: str) -> bool:
+        """True if an entry exists for `key` (does not count as a hit or miss)."""
+        return self._entry_path(key).exists()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return cached data for `key`, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.loads(zlib.decompress(f.read()))
+        except Exception:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: Dict) -> bool:
+        """Store data for `key` and evict old entries if the cache is over budget."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            payload = zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), 3)
+            if len(payload) > self.max_bytes:
+                return False
+            total = self.size_bytes()
+            path = self._entry_path(key)
+            try:
+                replaced = path.stat().st_size
+            except OSError:
+                replaced = 0
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except Exception:
+            return False
+        self._total = total - replaced + len(payload)
+        if self._total > self.max_bytes:
+            self._evict()
+        return True
+
+    def _scan(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every entry on disk; also resets the running total."""
+        entries = []
+        for path in self.cache_dir.glob('*' + CACHE_SUFFIX):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        self._total = sum(size for _, size, _ in entries)
+        return entries
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits in EVICT_TARGET of max_bytes."""
+        entries = self._scan()  # other processes may share the directory
+        if self._total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TARGET
+        entries.sort()
+        for _, size, path in entries:
+            if self._total <= target:
+                break
+            try:
+                path.unlink()
+                self._total -= size
+            except OSError:
+                pass
+
+    def size_bytes(self) -> int:
+        """Total size of all cache entries (scanned on first use, then kept as a running total)."""
+        if self._total is None:
+            self._scan()
+        return self._total
+
+    def clear(self) -> int:
+        """Remove every cache entry. Returns the number of entries removed."""
+        removed = 0
+        for path in self.cache_dir.glob('*' + CACHE_SUFFIX):
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        self._total = None
+        return removed
+
+
+# Shared default cache
+extraction_cache = ExtractionCache()
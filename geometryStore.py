@@ -0,0 +1,322 @@
+# geometryStore.py
+#**************************************************************************************************
+#   Vertex geometry of polyline and hatch entities, kept in flat typed buffers.
+#   Every path is a run of (x, y, bulge) rows, where bulge is the DXF arc value (tangent of a
+#   quarter of the included angle) of the segment starting at that vertex, so arcs in polylines
+#   and hatch boundaries stay exact. Paths are owned by entity index and saved per drawing.
+#**************************************************************************************************
+import math
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from drawingStore import atomic_write, sidecar_path
+
+GEOMETRY_FILE = 'geometry.npz'
+
+# Straight segments used for ellipses and splines (entities and hatch boundary edges)
+CURVE_SEGMENTS = 16
+
+# A path: (n, 3) float64 array of x, y, bulge and whether it is closed
+Path = Tuple[np.ndarray, bool]
+
+
+#==================================================================================================
+# PATH EXTRACTION FROM EZDXF ENTITIES
+#==================================================================================================
+
+def lwpolyline_path(entity) -> Path:
+    """Path of an LWPOLYLINE, read straight from its packed point array."""
+    points = np.asarray(entity.lwpoints.values, dtype=np.float64).reshape(-1, 5)
+    return np.ascontiguousarray(points[:, (0, 1, 4)]), bool(entity.closed)
+
+
+def polyline_path(entity) -> Optional[Path]:
+    """Path of a 2D or 3D POLYLINE (None for polygon meshes and polyface meshes)."""
+    if not (entity.is_2d_polyline or entity.is_3d_polyline):
+        return None
+    vertices = np.array([(v.dxf.location[0], v.dxf.location[1], v.dxf.bulge) for v in entity.vertices],
+                        dtype=np.float64).reshape(-1, 3)
+    return vertices, bool(entity.is_closed)
+
+
+def _ellipse_points(ellipse, reverse: bool = False) -> list:
+    """CURVE_SEGMENTS + 1 points along a ConstructionEllipse from its start to its end parameter."""
+    end_param = ellipse.end_param if ellipse.end_param > ellipse.start_param else ellipse.end_param + math.tau
+    points = list(ellipse.vertices(np.linspace(ellipse.start_param, end_param, CURVE_SEGMENTS + 1)))
+    if reverse:
+        points.reverse()
+    return points
+
+
+def _point_path(points, closed: bool) -> Path:
+    """Path of straight segments through (x, y, ...) points."""
+    vertices = np.zeros((len(points), 3), dtype=np.float64)
+    if len(points):
+        vertices[:, :2] = np.array([(p[0], p[1]) for p in points], dtype=np.float64)
+    return vertices, closed
+
+
+def ellipse_path(entity) -> Path:
+    """Path of an ELLIPSE, closed when it is a full ellipse."""
+    ellipse = entity.construction_tool()
+    full = math.isclose((ellipse.end_param - ellipse.start_param) % math.tau, 0.0, abs_tol=1e-9)
+    points = _ellipse_points(ellipse)
+    return _point_path(points[:-1] if full else points, full)
+
+
+def spline_path(entity) -> Path:
+    """Path of a SPLINE, approximated by CURVE_SEGMENTS straight segments."""
+    points = list(entity.construction_tool().approximate(CURVE_SEGMENTS))
+    closed = bool(entity.closed)
+    return _point_path(points[:-1] if closed else points, closed)
+
+
+def leader_path(entity) -> Path:
+    """Path through the vertices of a LEADER."""
+    return _point_path(entity.vertices, False)
+
+
+def solid_path(entity) -> Path:
+    """Outline of a SOLID or TRACE (its vertices are stored in zig-zag order)."""
+    return _point_path(entity.vertices(), True)
+
+
+def _arc_vertices(edge) -> List[Tuple[float, float, float]]:
+    sweep = (edge.end_angle - edge.start_angle) % 360.0 or 360.0
+    direction = 1.0 if edge.ccw else -1.0
+    start = edge.real_start_point
+    if sweep > 359.999:
+        # Full circle: two half arcs
+        cx, cy = edge.center.x, edge.center.y
+        return [(start.x, start.y, direction), (2 * cx - start.x, 2 * cy - start.y, direction)]
+    return [(start.x, start.y, direction * math.tan(math.radians(sweep) / 4.0))]
+
+
+def _curve_vertices(points) -> List[Tuple[float, float, float]]:
+    return [(p.x, p.y, 0.0) for p in points][:-1]
+
+
+def _edge_path_vertices(path) -> np.ndarray:
+    vertices = []
+    for edge in path.edges:
+        kind = edge.EDGE_TYPE
+        if kind == 'LineEdge':
+            vertices.append((edge.start.x, edge.start.y, 0.0))
+        elif kind == 'ArcEdge':
+            vertices.extend(_arc_vertices(edge))
+        elif kind == 'EllipseEdge':
+            vertices.extend(_curve_vertices(_ellipse_points(edge.construction_tool(), reverse=not edge.ccw)))
+        elif kind == 'SplineEdge':
+            vertices.extend(_curve_vertices(list(edge.construction_tool().approximate(CURVE_SEGMENTS))))
+    return np.array(vertices, dtype=np.float64).reshape(-1, 3)
+
+
+def hatch_paths(entity) -> List[Path]:
+    """Boundary paths of a HATCH; every boundary is closed."""
+    paths = []
+    for path in entity.paths:
+        if hasattr(path, 'vertices'):
+            vertices = np.array(path.vertices, dtype=np.float64).reshape(-1, 3)
+        else:
+            vertices = _edge_path_vertices(path)
+        if len(vertices):
+            paths.append((vertices, True))
+    return paths
+
+
+#==================================================================================================
+# PATH BUFFER
+#==================================================================================================
+
+class PathBuffer:
+    """Paths of many entities in flat arrays, each path tagged with its owning entity index."""
+
+    def __init__(self):
+        self._vertices = array('d')  # x, y, bulge per vertex
+        self._counts = array('I')    # vertices per path
+        self._closed = array('B')
+        self._owners = array('I')    # entity index per path
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, entity_index: int, paths: Sequence[Path]) -> None:
+        for vertices, closed in paths:
+            if not len(vertices):
+                continue
+            self._vertices.frombytes(np.ascontiguousarray(vertices, dtype=np.float64).tobytes())
+            self._counts.append(len(vertices))
+            self._closed.append(1 if closed else 0)
+            self._owners.append(entity_index)
+
+    def copy(self) -> 'PathBuffer':
+        buffer = PathBuffer()
+        for name in ('_vertices', '_counts', '_closed', '_owners'):
+            setattr(buffer, name, getattr(self, name)[:])
+        return buffer
+
+    def extend(self, other: 'PathBuffer', entity_offset: int) -> None:
+        """Append the paths of another buffer whose entities start at `entity_offset`."""
+        if not len(other):
+            return
+        self._vertices.extend(other._vertices)
+        self._counts.extend(other._counts)
+        self._closed.extend(other._closed)
+        owners = np.frombuffer(other._owners, dtype=np.uint32).astype(np.int64) + entity_offset
+        self._owners.frombytes(owners.astype(np.uint32).tobytes())
+
+    def transformed(self, insert, scale, cos_a: float, sin_a: float, base_point=(0.0, 0.0)) -> 'PathBuffer':
+        """Copy scaled, rotated and moved like EntityStore.transformed(); mirroring flips bulges."""
+        buffer = self.copy()
+        if not len(self._vertices):
+            return buffer
+        vertices = self.vertices.copy()
+        x = (vertices[:, 0] - base_point[0]) * scale[0]
+        y = (vertices[:, 1] - base_point[1]) * scale[1]
+        vertices[:, 0] = x * cos_a - y * sin_a + insert[0]
+        vertices[:, 1] = x * sin_a + y * cos_a + insert[1]
+        if scale[0] * scale[1] < 0:
+            vertices[:, 2] = -vertices[:, 2]
+        buffer._vertices = array('d', vertices.tobytes())
+        return buffer
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """(n, 3) view of every vertex (x, y, bulge)."""
+        return np.frombuffer(self._vertices, dtype=np.float64).reshape(-1, 3) if len(self._vertices) else np.zeros((0, 3))
+
+    @property
+    def owners(self) -> np.ndarray:
+        return np.frombuffer(self._owners, dtype=np.uint32) if len(self) else np.zeros(0, np.uint32)
+
+    def _starts(self) -> np.ndarray:
+        counts = np.frombuffer(self._counts, dtype=np.uint32).astype(np.int64) if len(self) else np.zeros(0, np.int64)
+        return np.concatenate(([0], np.cumsum(counts)))
+
+    def paths(self, entity_index: int) -> List[Path]:
+        """Paths owned by one entity."""
+        starts = self._starts()
+        vertices = self.vertices
+        return [(vertices[starts[i]:starts[i + 1]], bool(self._closed[i]))
+                for i in np.nonzero(self.owners == entity_index)[0]]
+
+    def bounding_boxes(self, entity_count: int) -> np.ndarray:
+        """
+        (entity_count, 4) array of xmin, ymin, xmax, ymax over each entity's vertices,
+        NaN for entities without paths. Arcs bulging past their vertices are not included.
+        """
+        boxes = np.full((entity_count, 4), np.nan)
+        starts = self._starts()
+        keep = np.diff(starts) > 0
+        if not keep.any():
+            return boxes
+        xy = self.vertices[:, :2]
+        path_min = np.minimum.reduceat(xy, starts[:-1][keep])
+        path_max = np.maximum.reduceat(xy, starts[:-1][keep])
+        owners = self.owners[keep]
+        low = np.full((entity_count, 2), np.inf)
+        high = np.full((entity_count, 2), -np.inf)
+        np.minimum.at(low, owners, path_min)
+        np.maximum.at(high, owners, path_max)
+        known = np.isfinite(low[:, 0])
+        boxes[known, :2] = low[known]
+        boxes[known, 2:] = high[known]
+        return boxes
+
+    def measurements(self, entity_count: int) -> Dict[str, np.ndarray]:
+        """
+        Per-entity vertex_count, perimeter and area arrays computed over all paths at
+        once, counting arc segments exactly. Area is what closed paths enclose (NaN
+        for entities without one); entities without paths get NaN throughout.
+        """
+        vertex_count = np.full(entity_count, np.nan)
+        perimeter = np.full(entity_count, np.nan)
+        area = np.full(entity_count, np.nan)
+        if not len(self):
+            return {'vertex_count': vertex_count, 'perimeter': perimeter, 'area': area}
+
+        vertices = self.vertices
+        starts = self._starts()
+        counts = np.diff(starts)
+        closed = np.frombuffer(self._closed, dtype=np.uint8).astype(bool)
+        owners = self.owners
+
+        # Each vertex starts a segment to the next one; the last vertex of a closed path wraps around
+        following = np.arange(1, len(vertices) + 1)
+        last = starts[1:] - 1
+        following[last] = starts[:-1]
+        segment_open = np.ones(len(vertices), dtype=bool)
+        segment_open[last[~closed]] = False
+        end = vertices[following]
+
+        chord = np.hypot(end[:, 0] - vertices[:, 0], end[:, 1] - vertices[:, 1])
+        half_angle = 2.0 * np.arctan(vertices[:, 2])  # half the included angle of each arc
+        sin_half = np.sin(half_angle)
+        curved = np.abs(half_angle) > 1e-12
+        arc_factor = np.ones_like(chord)
+        arc_factor[curved] = half_angle[curved] / sin_half[curved]
+        length = np.where(segment_open, chord * arc_factor, 0.0)
+
+        # Shoelace term plus the circular segment between each chord and its arc
+        signed = 0.5 * (vertices[:, 0] * end[:, 1] - end[:, 0] * vertices[:, 1])
+        radius = np.zeros_like(chord)
+        radius[curved] = chord[curved] / (2.0 * sin_half[curved])
+        angle = 2.0 * half_angle
+        signed += 0.5 * radius ** 2 * (angle - np.sin(angle))
+
+        path_length = np.add.reduceat(length, starts[:-1])
+        path_area = np.abs(np.add.reduceat(signed, starts[:-1]))
+
+        vertex_count[np.unique(owners)] = 0.0
+        perimeter[np.unique(owners)] = 0.0
+        np.add.at(vertex_count, owners, counts)
+        np.add.at(perimeter, owners, path_length)
+        if closed.any():
+            area[np.unique(owners[closed])] = 0.0
+            np.add.at(area, owners[closed], path_area[closed])
+        return {'vertex_count': vertex_count, 'perimeter': perimeter, 'area': area}
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'vertices': self.vertices,
+            'counts': np.frombuffer(self._counts, dtype=np.uint32) if len(self) else np.zeros(0, np.uint32),
+            'closed': np.frombuffer(self._closed, dtype=np.uint8) if len(self) else np.zeros(0, np.uint8),
+            'owners': self.owners,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'PathBuffer':
+        buffer = cls()
+        buffer._vertices = array('d', np.ascontiguousarray(arrays['vertices'], dtype=np.float64).tobytes())
+        buffer._counts = array('I', np.asarray(arrays['counts'], dtype=np.uint32).tobytes())
+        buffer._closed = array('B', np.asarray(arrays['closed'], dtype=np.uint8).tobytes())
+        buffer._owners = array('I', np.asarray(arrays['owners'], dtype=np.uint32).tobytes())
+        return buffer
+
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self._vertices, self._counts, self._closed, self._owners))
+
+
+#==================================================================================================
+# PER-DRAWING STORAGE
+#==================================================================================================
+
+def save_drawing_geometry(drawing_id: str, paths: PathBuffer) -> bool:
+    """Store a drawing's polyline and hatch paths in its sidecar directory (uncompressed)."""
+    try:
+        path = sidecar_path(drawing_id, GEOMETRY_FILE, create=True)
+        atomic_write(path, lambda f: np.savez(f, **paths.to_arrays()))
+        return True
+    except Exception:
+        return False
+
+
+def load_drawing_geometry(drawing_id: str) -> Optional[PathBuffer]:
+    """Paths saved for a drawing, or None if there are none."""
+    try:
+        with np.load(sidecar_path(drawing_id, GEOMETRY_FILE)) as arrays:
+            return PathBuffer.from_arrays(arrays)
+    except (OSError, ValueError, KeyError):
+        return None
@@ -0,0 +1,192 @@
+# llmCache.py
+#**************************************************************************************************
+#   On-disk cache of AI chat responses in a SQLite file, keyed by the normalized prompt, model,
+#   temperature and max_tokens. Reprocessing a file sends the same prompts again; with the cache
+#   those calls are answered locally. Entries expire after a TTL and the file is size-bounded with
+#   least-recently-used eviction; hits and misses are counted for monitoring.
+#**************************************************************************************************
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import ENABLE_LLM_CACHE, LLM_CACHE_FILE, LLM_CACHE_MAX_MB, LLM_CACHE_TTL_DAYS
+
+_WHITESPACE = re.compile(r'\s+')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE INDEX IF NOT EXISTS responses_created ON responses (created);
+"""
+
+# Eviction trims the cache to this share of max_bytes, so a full cache is not swept on every put
+EVICT_TARGET = 0.9
+
+# Seconds between purges of expired entries while the cache is under budget
+PURGE_INTERVAL = 3600
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Prompt with runs of whitespace collapsed, so reformatting alone does not miss the cache."""
+    return _WHITESPACE.sub(' ', prompt).strip()
+
+
+def make_key(prompt: str, model: str, temperature: Optional[float] = None,
+             max_tokens: Optional[int] = None) -> str:
+    """Cache key of one chat request."""
+    request = json.dumps([normalize_prompt(prompt), model, temperature, max_tokens], ensure_ascii=False)
+    return hashlib.blake2b(request.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class LLMCache:
+    """
+    Size-bounded LRU cache of response texts in one SQLite file.
+
+    One connection per process is shared by all threads under a lock; a forked
+    child opens its own. Any database error makes get() a miss and put() a no-op.
+    The total size is summed once per connection and then kept up to date by put();
+    the table is only swept when that total goes over budget or every PURGE_INTERVAL.
+    """
+
+    def __init__(self, path=LLM_CACHE_FILE, max_mb: float = LLM_CACHE_MAX_MB,
+                 ttl_days: float = LLM_CACHE_TTL_DAYS, enabled: bool = ENABLE_LLM_CACHE):
+        self.path = Path(path)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl_days * 86400
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._total = 0
+        self._purged = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+            self._total = self._stored_size(conn)
+            self._purged = time.time()
+        return self._conn
+
+    @staticmethod
+    def _stored_size(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached response for `key`, or None on a miss or an expired entry."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute("SELECT response FROM responses WHERE key = ? AND created >= ?",
+                                   (key, now - self.ttl)).fetchone()
+                if row is not None:
+                    with conn:
+                        conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str, model: Optional[str] = None) -> bool:
+        """Store a response and evict expired and old entries if the cache is over budget."""
+        if not self.enabled or not response:
+            return False
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return False
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                with conn:
+                    row = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                    conn.execute("INSERT OR REPLACE INTO responses (key, model, response, size, created, accessed) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)", (key, model, response, size, now, now))
+                    self._total += size - (row[0] if row else 0)
+                    if self._total > self.max_bytes or now - self._purged >= PURGE_INTERVAL:
+                        self._evict(conn, now)
+            except sqlite3.Error:
+                try:
+                    if self._conn is not None:
+                        self._total = self._stored_size(self._conn)  # the transaction was rolled back
+                except sqlite3.Error:
+                    pass
+                return False
+        return True
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Delete expired entries, then least recently used ones down to EVICT_TARGET of max_bytes."""
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        self._purged = now
+        self._total = self._stored_size(conn)  # other processes may share the file
+        if self._total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TARGET
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if self._total <= target:
+                break
+            doomed.append((key,))
+            self._total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self) -> int:
+        """Delete every entry and reset the counters. Returns the number of entries removed."""
+        removed = 0
+        with self._lock:
+            try:
+                conn = self._connection()
+                with conn:
+                    removed = conn.execute("DELETE FROM responses").rowcount
+                self._total = 0
+            except sqlite3.Error:
+                pass
+            self.hits = self.misses = 0
+        return removed
+
+    def stats(self) -> Dict:
+        """hits, misses, hit_rate, entries and size_bytes."""
+        with self._lock:
+            try:
+                entries, size = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            except sqlite3.Error:
+                entries, size = 0, 0
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else None,
+                    'entries': entries, 'size_bytes': size}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+# Shared instance used by the AI helpers in utils
+llm_cache = LLMCache()
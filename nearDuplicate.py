@@ -0,0 +1,293 @@
+# nearDuplicate.py
+#**************************************************************************************************
+#   MinHash signatures of drawings and a banded LSH index over them, to find drawings that are
+#   nearly identical (a copy saved under another name, a moved title block, a re-export) without
+#   any AI call. Each entity becomes a position-independent feature (type, layer, rounded sizes
+#   and names) and each word of its text another one; the signature estimates the Jaccard
+#   similarity of two drawings' feature sets, and the LSH bands make a lookup touch only the
+#   drawings sharing at least one band instead of every stored signature.
+#**************************************************************************************************
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from drawingStore import atomic_write, shared_data_path
+from entityStore import as_entity_store
+
+NEAR_DUPLICATE_INDEX_FILE = 'near_duplicates.npz'
+
+# Signature length and its split into LSH bands (bands * rows == MINHASH_PERMUTATIONS). A pair with
+# similarity s shares a band with probability 1 - (1 - s**rows)**bands: about 0.99 at s=0.8.
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 32
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+# Significant digits kept of lengths, radii, areas and angles
+QUANTIZE_DIGITS = 2
+
+# Features hashed together per permutation block, bounding the temporary (permutations x chunk) array
+_FEATURE_CHUNK = 4096
+
+# Value fields carrying no shape information
+_SKIPPED_FIELDS = {'color', 'layout'}
+
+_TOKEN = re.compile(r'[A-Za-z0-9]+(?:[.\-/][A-Za-z0-9]+)*')
+
+_EMPTY = np.uint64(0xFFFFFFFFFFFFFFFF)
+_DUPLICATE_STEP = np.uint64(0x9E3779B97F4A7C15)
+_SEEDS = np.random.default_rng(0x5EED).integers(0, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, a cheap bijective 64-bit hash."""
+    with np.errstate(over='ignore'):
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+
+def _combine(hashes: np.ndarray, values: np.ndarray) -> np.ndarray:
+    with np.errstate(over='ignore'):
+        return _mix(hashes * np.uint64(31) + values.astype(np.uint64))
+
+
+def quantize(values: np.ndarray, digits: int = QUANTIZE_DIGITS) -> np.ndarray:
+    """
+    Integer codes of values rounded to `digits` significant digits (sign, exponent and
+    mantissa), so 12.34 and 12.29 share a code; NaN maps to a code of its own.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.zeros(values.shape, dtype=np.int64)
+    present = np.isfinite(values) & (values != 0)
+    magnitude = np.abs(values[present])
+    exponent = np.floor(np.log10(magnitude)).astype(np.int64) - (digits - 1)
+    mantissa = np.rint(magnitude / 10.0 ** exponent).astype(np.int64)
+    codes[present] = np.sign(values[present]).astype(np.int64) * (mantissa * 1024 + exponent + 512)
+    codes[np.isnan(values)] = -1
+    return codes
+
+
+def drawing_features(dwg_data: Dict) -> np.ndarray:
+    """
+    Feature hashes of an extract_dwg_data() result, as a multiset made into a set
+    (the k-th copy of a feature gets its own hash, as in entityFingerprint).
+
+    One feature per entity from its type, layer, quantized numeric values and names
+    (positions and colors are left out, so a moved or recolored copy still matches),
+    plus one per word of text, dimension text and attribute values.
+    """
+    entities = as_entity_store(dwg_data['entities'])
+    layer_hashes = np.array([_hash(name) for name in entities.layer_names], dtype=np.uint64)
+    type_codes, layer_codes, rows = entities.type_codes, entities.layer_codes, entities.rows
+    features = []
+    tokens = []
+
+    for code, entity_type in enumerate(entities.type_names):
+        members = np.nonzero(type_codes == code)[0]
+        if not len(members):
+            continue
+        member_rows = rows[members]
+        hashes = np.full(len(members), _hash(entity_type), dtype=np.uint64)
+        hashes = _combine(hashes, layer_hashes[layer_codes[members]])
+        for name in entities.column_names(entity_type):
+            if name in _SKIPPED_FIELDS:
+                continue
+            column = entities.column(entity_type, name)
+            if isinstance(column, np.ndarray):
+                if column.ndim != 1:
+                    continue  # points: positions
+                values = quantize(column[member_rows]).view(np.uint64)
+            elif name == 'text':
+                for row in member_rows:
+                    if column[row]:
+                        tokens.extend(_TOKEN.findall(column[row].lower()))
+                continue
+            else:
+                values = np.array([_hash(column[row] or '') for row in member_rows], dtype=np.uint64)
+            hashes = _combine(hashes, values ^ np.uint64(_hash(name)))
+        features.append(hashes)
+
+    if tokens:
+        features.append(np.array([_hash('\x1f' + token) for token in tokens], dtype=np.uint64))
+    if not features:
+        return np.zeros(0, dtype=np.uint64)
+
+    hashes = np.sort(np.concatenate(features))
+    run_start = np.r_[0, np.nonzero(np.diff(hashes))[0] + 1]
+    run_index = np.arange(len(hashes)) - np.repeat(run_start, np.diff(np.r_[run_start, len(hashes)]))
+    with np.errstate(over='ignore'):
+        return np.unique(hashes + run_index.astype(np.uint64) * _DUPLICATE_STEP)
+
+
+def minhash_signature(features: np.ndarray) -> np.ndarray:
+    """MINHASH_PERMUTATIONS minimum hashes of a feature set (all _EMPTY for an empty set)."""
+    signature = np.full(MINHASH_PERMUTATIONS, _EMPTY, dtype=np.uint64)
+    features = np.asarray(features, dtype=np.uint64)
+    for start in range(0, len(features), _FEATURE_CHUNK):
+        chunk = features[start:start + _FEATURE_CHUNK]
+        hashed = _mix(chunk[None, :] ^ _SEEDS[:, None])
+        np.minimum(signature, hashed.min(axis=1), out=signature)
+    return signature
+
+
+def drawing_signature(dwg_data: Dict) -> Optional[np.ndarray]:
+    """MinHash signature of a drawing, or None if it has no entities to compare."""
+    features = drawing_features(dwg_data)
+    return minhash_signature(features) if len(features) else None
+
+
+def estimate_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the feature sets behind two signatures."""
+    return float(np.mean(a == b))
+
+
+def _band_keys(signatures: np.ndarray) -> np.ndarray:
+    """(n, LSH_BANDS) keys, one hash per band of each signature."""
+    bands = signatures.reshape(len(signatures), LSH_BANDS, LSH_ROWS)
+    keys = np.zeros(bands.shape[:2], dtype=np.uint64)
+    for row in range(LSH_ROWS):
+        keys = _combine(keys, bands[:, :, row])
+    return keys
+
+
+class NearDuplicateIndex:
+    """
+    Signatures of stored drawings keyed by drawing id, with one hash table per LSH
+    band mapping a band key to the drawings sharing it.
+    """
+
+    def __init__(self, ids: Sequence[str] = (), signatures: Optional[np.ndarray] = None):
+        self.signatures: Dict[str, np.ndarray] = {}
+        self._keys: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[int, set]] = [{} for _ in range(LSH_BANDS)]
+        if len(ids):
+            keys = _band_keys(signatures)
+            for drawing_id, signature, drawing_keys in zip(ids, signatures, keys):
+                self._insert(drawing_id, signature, drawing_keys)
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def __contains__(self, drawing_id: str) -> bool:
+        return drawing_id in self.signatures
+
+    def _insert(self, drawing_id: str, signature: np.ndarray, keys: np.ndarray) -> None:
+        self.signatures[drawing_id] = signature
+        self._keys[drawing_id] = keys
+        for band, key in enumerate(keys.tolist()):
+            self._buckets[band].setdefault(key, set()).add(drawing_id)
+
+    def add(self, drawing_id: str, signature: np.ndarray) -> None:
+        """Add or replace the signature of a drawing."""
+        self.remove(drawing_id)
+        signature = np.asarray(signature, dtype=np.uint64)
+        self._insert(drawing_id, signature, _band_keys(signature[None, :])[0])
+
+    def remove(self, drawing_id: str) -> bool:
+        """Drop a drawing's signature. Returns True if it was indexed."""
+        keys = self._keys.pop(drawing_id, None)
+        if keys is None:
+            return False
+        del self.signatures[drawing_id]
+        for band, key in enumerate(keys.tolist()):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(drawing_id)
+                if not bucket:
+                    del self._buckets[band][key]
+        return True
+
+    def candidates(self, signature: np.ndarray) -> set:
+        """Drawings sharing at least one band with `signature`."""
+        found = set()
+        keys = _band_keys(np.asarray(signature, dtype=np.uint64)[None, :])[0]
+        for band, key in enumerate(keys.tolist()):
+            found.update(self._buckets[band].get(key, ()))
+        return found
+
+    def query(self, signature: np.ndarray, threshold: float,
+              exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Indexed drawings with an estimated similarity of at least `threshold`.
+
+        Returns:
+            List of (drawing id, similarity), most similar first
+        """
+        matches = []
+        for drawing_id in self.candidates(signature):
+            if drawing_id == exclude:
+                continue
+            similarity = estimate_similarity(signature, self.signatures[drawing_id])
+            if similarity >= threshold:
+                matches.append((drawing_id, similarity))
+        return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        ids = list(self.signatures)
+        signatures = (np.stack([self.signatures[i] for i in ids]) if ids
+                      else np.zeros((0, MINHASH_PERMUTATIONS), dtype=np.uint64))
+        return {'ids': np.array(ids, dtype=str), 'signatures': signatures}
+
+
+#==================================================================================================
+# SHARED INDEX
+#==================================================================================================
+
+# Loaded index, validated by path and modification time
+_loaded: Optional[Tuple[str, float, NearDuplicateIndex]] = None
+
+
+def load_near_duplicate_index() -> NearDuplicateIndex:
+    """The index of all stored drawing signatures (empty if none were saved)."""
+    global _loaded
+    path = shared_data_path(NEAR_DUPLICATE_INDEX_FILE)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return NearDuplicateIndex()
+    if _loaded and _loaded[:2] == (str(path), mtime):
+        return _loaded[2]
+    try:
+        with np.load(path) as arrays:
+            index = NearDuplicateIndex(arrays['ids'].tolist(), arrays['signatures'])
+    except (OSError, ValueError, KeyError):
+        return NearDuplicateIndex()
+    _loaded = (str(path), mtime, index)
+    return index
+
+
+def _save(index: NearDuplicateIndex) -> bool:
+    global _loaded
+    try:
+        path = shared_data_path(NEAR_DUPLICATE_INDEX_FILE)
+        atomic_write(path, lambda f: np.savez(f, **index.arrays()))
+        _loaded = (str(path), os.path.getmtime(path), index)
+        return True
+    except Exception:
+        return False
+
+
+def save_signature(drawing_id: str, signature: np.ndarray) -> bool:
+    """Add or replace a drawing's signature in the shared index."""
+    index = load_near_duplicate_index()
+    index.add(drawing_id, signature)
+    return _save(index)
+
+
+def remove_signature(drawing_id: str) -> bool:
+    """Drop a drawing from the shared index. Returns True if it was indexed."""
+    index = load_near_duplicate_index()
+    return index.remove(drawing_id) and _save(index)
+
+
+def find_near_duplicates(signature: np.ndarray, threshold: float,
+                         exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+    """Stored drawings nearly identical to `signature` (see NearDuplicateIndex.query)."""
+    return load_near_duplicate_index().query(signature, threshold, exclude=exclude)
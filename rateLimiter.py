@@ -0,0 +1,257 @@
+# rateLimiter.py
+#**************************************************************************************************
+#   Process-wide pacing of AI provider calls. Each provider has a token bucket for requests and
+#   one for (estimated) tokens per minute, a bound on requests in flight, and a retry loop with
+#   jittered exponential backoff that honours Retry-After. A rate-limited reply pauses every
+#   caller of that provider, so parallel ingestion slows down to just under the limit instead of
+#   retrying in lockstep.
+#**************************************************************************************************
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, Optional
+
+from config import (
+    AI_MAX_CONCURRENCY, AI_MAX_RETRIES, AI_BACKOFF_BASE, AI_BACKOFF_MAX,
+    GROK_REQUESTS_PER_MINUTE, GROK_TOKENS_PER_MINUTE,
+    OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE
+)
+
+# Seconds between checks of an async caller waiting for a free slot
+_ASYNC_POLL = 0.01
+
+
+class RetryableError(Exception):
+    """A provider call that may succeed when retried (rate limit, overload, network error)."""
+
+    def __init__(self, message: str = "", retry_after: Optional[float] = None, rate_limited: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delay in seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def estimate_tokens(prompt: str, max_tokens: Optional[int] = None) -> int:
+    """Tokens a request may use: about 4 characters per prompt token plus the reply limit."""
+    return len(prompt) // 4 + (max_tokens or 0)
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute` units a minute up to `capacity`. A reservation takes its
+    units at once and may leave the bucket in debt; the caller then waits until the
+    debt is repaid, so queued callers are spread out evenly. per_minute <= 0 is unlimited.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` units. Returns the seconds to wait before using them."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level -= amount
+            return max(0.0, -self.level / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Give back (positive) or take (negative) units after the actual use is known."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Request and token buckets, in-flight bound and retry policy of one provider.
+
+    call() runs a function under the limits and retries it while it raises
+    RetryableError; the last error is raised once `max_retries` retries are used up.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_concurrency: int = AI_MAX_CONCURRENCY, max_retries: int = AI_MAX_RETRIES,
+                 backoff_base: float = AI_BACKOFF_BASE, backoff_max: float = AI_BACKOFF_MAX):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._active = 0
+        self._counts = {'calls': 0, 'attempts': 0, 'retries': 0, 'rate_limited': 0, 'failures': 0,
+                        'peak_active': 0}
+        self._wait_seconds = 0.0
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry `attempt` (0-based): Retry-After if given, else jittered exponential."""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max) + random.uniform(0, self.backoff_base)
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller of this provider for `seconds`."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _delay(self, tokens: int) -> float:
+        """Seconds this caller must wait for the pause and both buckets."""
+        with self._lock:
+            paused = max(0.0, self._paused_until - time.monotonic())
+        return max(paused, self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def _enter(self, waited: float) -> None:
+        with self._lock:
+            self._active += 1
+            self._counts['attempts'] += 1
+            self._counts['peak_active'] = max(self._counts['peak_active'], self._active)
+            self._wait_seconds += waited
+
+    def _exit(self) -> None:
+        with self._lock:
+            self._active -= 1
+
+    @contextmanager
+    def slot(self, tokens: int = 0):
+        """Wait for a free in-flight slot and the buckets, then hold the slot."""
+        started = time.monotonic()
+        self._slots.acquire()
+        try:
+            delay = self._delay(tokens)
+            if delay:
+                time.sleep(delay)
+            self._enter(time.monotonic() - started)
+            try:
+                yield
+            finally:
+                self._exit()
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def aslot(self, tokens: int = 0):
+        """slot() for coroutines; waiting does not block the event loop."""
+        started = time.monotonic()
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(_ASYNC_POLL)
+        try:
+            delay = self._delay(tokens)
+            if delay:
+                await asyncio.sleep(delay)
+            self._enter(time.monotonic() - started)
+            try:
+                yield
+            finally:
+                self._exit()
+        finally:
+            self._slots.release()
+
+    def _failed(self, error: RetryableError, attempt: int) -> float:
+        """Record a retryable failure. Returns the backoff delay, or raises when out of retries."""
+        with self._lock:
+            if error.rate_limited:
+                self._counts['rate_limited'] += 1
+            if attempt >= self.max_retries:
+                self._counts['failures'] += 1
+                raise error
+            self._counts['retries'] += 1
+        delay = self.backoff(attempt, error.retry_after)
+        if error.rate_limited:
+            self.pause(delay)
+        return delay
+
+    def _count_call(self) -> None:
+        with self._lock:
+            self._counts['calls'] += 1
+
+    def call(self, func: Callable, tokens: int = 0):
+        """Run func() under the limits, retrying on RetryableError."""
+        self._count_call()
+        attempt = 0
+        while True:
+            try:
+                with self.slot(tokens):
+                    return func()
+            except RetryableError as e:
+                time.sleep(self._failed(e, attempt))
+                attempt += 1
+
+    async def acall(self, func: Callable, tokens: int = 0):
+        """call() for a coroutine function."""
+        self._count_call()
+        attempt = 0
+        while True:
+            try:
+                async with self.aslot(tokens):
+                    return await func()
+            except RetryableError as e:
+                await asyncio.sleep(self._failed(e, attempt))
+                attempt += 1
+
+    def record_usage(self, estimated: int, actual: Optional[int]) -> None:
+        """Correct the token bucket once a reply reports the tokens actually used."""
+        if actual is not None:
+            self.tokens.adjust(estimated - actual)
+
+    def metrics(self) -> Dict:
+        """calls, attempts, retries, rate_limited, failures, active, peak_active and wait_seconds."""
+        with self._lock:
+            return {'provider': self.name, 'max_concurrency': self.max_concurrency, 'active': self._active,
+                    'wait_seconds': self._wait_seconds, **self._counts}
+
+
+#==================================================================================================
+# SHARED LIMITERS
+#==================================================================================================
+
+# Provider -> (requests per minute, tokens per minute)
+PROVIDER_LIMITS = {
+    'grok': (GROK_REQUESTS_PER_MINUTE, GROK_TOKENS_PER_MINUTE),
+    'openai': (OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE),
+}
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """The process-wide limiter of a provider ('grok' or 'openai')."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            requests_per_minute, tokens_per_minute = PROVIDER_LIMITS.get(provider, (0, 0))
+            limiter = _limiters[provider] = RateLimiter(provider, requests_per_minute, tokens_per_minute)
+        return limiter
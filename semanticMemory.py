@@ -16,6 +16,8 @@ import logging
 
 # Import configuration
 from config import CHROMA_PERSIST_DIR, COLLECTION_NAME
+from drawingStore import remove_drawing_data
+from nearDuplicate import remove_signature
 
 # Silence ChromaDB logging noise
 logging.getLogger("chromadb").setLevel(logging.ERROR)
@@ -65,6 +67,25 @@ def file_exists_in_database(file_path: str) -> bool:
     except Exception:
         return False
 
+def get_stored_metadata(file_path: str) -> Optional[Dict]:
+    """
+    Metadata stored for a file, or None if it is not in the database.
+
+    Args:
+        file_path: Path to file
+
+    Returns:
+        Metadata dict of the file's record
+    """
+    try:
+        embedding_id = generate_embedding_id(file_path)
+        results = collection.get(ids=[embedding_id], include=["metadatas"])
+        if results and results.get("ids"):
+            return (results.get("metadatas") or [{}])[0] or {}
+    except Exception:
+        pass
+    return None
+
 def add_to_database(file_path: str, description: str, specs: Dict, silent: bool = False) -> bool:
     """
     Add a file to the collection if not already present.
@@ -197,6 +218,8 @@ def remove_from_database(filename_or_path: str) -> bool:
 
         embedding_id = generate_embedding_id(abs_path)
         collection.delete(ids=[embedding_id])
+        remove_drawing_data(embedding_id)
+        remove_signature(embedding_id)
         print(Fore.GREEN + f"✓ Removed: {os.path.basename(filename_or_path)}" + Style.RESET_ALL)
         return True
     except Exception as e:
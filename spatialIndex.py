@@ -0,0 +1,306 @@
+# spatialIndex.py
+#**************************************************************************************************
+#   Uniform-grid spatial index over the bounding boxes of extracted drawing entities.
+#   The index is saved per drawing as a compressed .npz sidecar next to the entity labels it
+#   needs to answer region queries, so "what is inside this rectangle" never re-reads the DXF.
+#**************************************************************************************************
+import math
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from blockLibrary import BlockLibrary
+from drawingStore import atomic_write, sidecar_path
+from entityStore import as_entity_store
+
+SPATIAL_INDEX_FILE = 'spatial_index.npz'
+
+# Query modes: entities touching the region, or lying completely inside it
+QUERY_MODES = ('intersects', 'within')
+
+# Entities covering more grid cells than this are kept in a separate list checked on every query
+MAX_CELLS_PER_ENTITY = 64
+
+# Upper bound on grid cells per axis
+MAX_GRID_SIZE = 2048
+
+
+class SpatialIndex:
+    """
+    Uniform grid over axis-aligned boxes.
+
+    Cells are stored row-major in CSR form (cell_starts / cell_items), so the
+    candidates of one grid row of a query are a single contiguous slice.
+    """
+
+    def __init__(self, boxes: np.ndarray, origin, cell_size, shape,
+                 cell_starts: np.ndarray, cell_items: np.ndarray, large_items: np.ndarray):
+        self.boxes = boxes
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.cell_size = (float(cell_size[0]), float(cell_size[1]))
+        self.shape = (int(shape[0]), int(shape[1]))  # (columns, rows)
+        self.cell_starts = cell_starts
+        self.cell_items = cell_items
+        self.large_items = large_items
+
+    @classmethod
+    def build(cls, boxes: np.ndarray, target_per_cell: int = 4) -> 'SpatialIndex':
+        """Index (n, 4) xmin, ymin, xmax, ymax boxes; rows containing NaN are left out."""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        ids = np.nonzero(~np.isnan(boxes).any(axis=1))[0]
+        if not len(ids):
+            return cls(boxes, (0.0, 0.0), (1.0, 1.0), (1, 1), np.zeros(2, np.int64),
+                       np.zeros(0, np.int64), np.zeros(0, np.int64))
+
+        valid = boxes[ids]
+        origin = valid[:, :2].min(axis=0)
+        span = np.maximum(valid[:, 2:].max(axis=0) - origin, 1e-9)
+
+        # Roughly target_per_cell entities per cell, cells about square
+        cells = max(1, len(ids) // target_per_cell)
+        nx = int(min(MAX_GRID_SIZE, max(1, math.ceil(math.sqrt(cells * span[0] / span[1])))))
+        ny = int(min(MAX_GRID_SIZE, max(1, math.ceil(cells / nx))))
+        cell_size = span / (nx, ny)
+
+        ix0, iy0 = cls._cell_coords(valid[:, :2], origin, cell_size, nx, ny)
+        ix1, iy1 = cls._cell_coords(valid[:, 2:], origin, cell_size, nx, ny)
+        widths = ix1 - ix0 + 1
+        counts = widths * (iy1 - iy0 + 1)
+
+        large = counts > MAX_CELLS_PER_ENTITY
+        small = ~large
+        counts, widths = counts[small], widths[small]
+        ix0, iy0 = ix0[small], iy0[small]
+
+        # One (cell, entity) pair per covered cell
+        total = int(counts.sum())
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        step = np.arange(total) - first
+        width = np.repeat(widths, counts)
+        cells_x = np.repeat(ix0, counts) + step % width
+        cells_y = np.repeat(iy0, counts) + step // width
+        cell_ids = cells_y * nx + cells_x
+        items = np.repeat(ids[small], counts)
+
+        order = np.argsort(cell_ids, kind='stable')
+        cell_starts = np.zeros(nx * ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell_ids, minlength=nx * ny), out=cell_starts[1:])
+        return cls(boxes, origin, cell_size, (nx, ny), cell_starts,
+                   items[order].astype(np.int64), ids[large].astype(np.int64))
+
+    @staticmethod
+    def _cell_coords(points: np.ndarray, origin, cell_size, nx: int, ny: int) -> Tuple[np.ndarray, np.ndarray]:
+        cells = np.floor((points - origin) / cell_size).astype(np.int64)
+        return np.clip(cells[:, 0], 0, nx - 1), np.clip(cells[:, 1], 0, ny - 1)
+
+    def query(self, xmin: float, ymin: float, xmax: float, ymax: float,
+              mode: str = 'intersects') -> np.ndarray:
+        """Sorted ids of the boxes that intersect (or lie within) the query rectangle."""
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Unknown query mode: {mode}")
+        xmin, xmax = min(xmin, xmax), max(xmin, xmax)
+        ymin, ymax = min(ymin, ymax), max(ymin, ymax)
+
+        nx, ny = self.shape
+        (x0, x1), (y0, y1) = self._cell_coords(np.array([[xmin, ymin], [xmax, ymax]]),
+                                               self.origin, self.cell_size, nx, ny)
+        gx0, gy0 = self.origin
+        outside = (xmax < gx0 or ymax < gy0 or
+                   xmin > gx0 + self.cell_size[0] * nx or ymin > gy0 + self.cell_size[1] * ny)
+
+        parts = [self.large_items]
+        if not outside:
+            for row in range(int(y0), int(y1) + 1):
+                start = self.cell_starts[row * nx + x0]
+                end = self.cell_starts[row * nx + x1 + 1]
+                parts.append(self.cell_items[start:end])
+        candidates = np.unique(np.concatenate(parts))
+        if not len(candidates):
+            return candidates
+
+        boxes = self.boxes[candidates]
+        if mode == 'within':
+            hit = (boxes[:, 0] >= xmin) & (boxes[:, 1] >= ymin) & (boxes[:, 2] <= xmax) & (boxes[:, 3] <= ymax)
+        else:
+            hit = (boxes[:, 0] <= xmax) & (boxes[:, 2] >= xmin) & (boxes[:, 1] <= ymax) & (boxes[:, 3] >= ymin)
+        return candidates[hit]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'boxes': self.boxes,
+            'origin': np.array(self.origin),
+            'cell_size': np.array(self.cell_size),
+            'shape': np.array(self.shape),
+            'cell_starts': self.cell_starts,
+            'cell_items': self.cell_items,
+            'large_items': self.large_items,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays) -> 'SpatialIndex':
+        return cls(arrays['boxes'], arrays['origin'], arrays['cell_size'], arrays['shape'],
+                   arrays['cell_starts'], arrays['cell_items'], arrays['large_items'])
+
+
+#==================================================================================================
+# PER-DRAWING INDEX
+#==================================================================================================
+
+def _encode_strings(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack strings into one UTF-8 byte buffer plus offsets."""
+    encoded = [(value or '').encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_string(blob: np.ndarray, offsets: np.ndarray, index: int) -> str:
+    return blob[offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+
+class DrawingIndex:
+    """Spatial index of one drawing plus the entity labels needed to answer region queries."""
+
+    def __init__(self, index: SpatialIndex, arrays):
+        self.index = index
+        self.type_codes = arrays['type_codes']
+        self.layer_codes = arrays['layer_codes']
+        self.layout_codes = arrays['layout_codes']
+        self.type_names = [str(name) for name in arrays['type_names']]
+        self.layer_names = [str(name) for name in arrays['layer_names']]
+        self.layout_names = [str(name) for name in arrays['layout_names']]
+        self.label_blob = arrays['label_blob']
+        self.label_offsets = arrays['label_offsets']
+
+    @classmethod
+    def from_dwg_data(cls, dwg_data: Dict) -> 'DrawingIndex':
+        """Build the index of an extract_dwg_data() result."""
+        arrays = _index_arrays(dwg_data)
+        return cls(SpatialIndex.from_arrays(arrays), arrays)
+
+    def query(self, bbox: Sequence[float], mode: str = 'intersects',
+              entity_types: Optional[Sequence[str]] = None,
+              layouts: Optional[Sequence[str]] = None) -> List[Dict]:
+        """
+        Entities inside a region, in entity order.
+
+        Args:
+            bbox: (xmin, ymin, xmax, ymax) in drawing units
+            mode: 'intersects' or 'within'
+            entity_types: Only return these DXF types
+            layouts: Only return entities of these layouts
+
+        Returns:
+            List of dicts with index, type, layer, layout, bbox and the entity's
+            text (TEXT/MTEXT) or block_name (INSERT) when it has one
+        """
+        ids = self.index.query(*bbox, mode=mode)
+        if entity_types is not None:
+            codes = [i for i, name in enumerate(self.type_names) if name in entity_types]
+            ids = ids[np.isin(self.type_codes[ids], codes)]
+        if layouts is not None:
+            codes = [i for i, name in enumerate(self.layout_names) if name in layouts]
+            ids = ids[np.isin(self.layout_codes[ids], codes)]
+
+        results = []
+        for index in ids:
+            entity_type = self.type_names[self.type_codes[index]]
+            result = {
+                'index': int(index),
+                'type': entity_type,
+                'layer': self.layer_names[self.layer_codes[index]],
+                'layout': self.layout_names[self.layout_codes[index]],
+                'bbox': [round(float(v), 4) for v in self.index.boxes[index]],
+            }
+            label = _decode_string(self.label_blob, self.label_offsets, index)
+            if label:
+                result['block_name' if entity_type == 'INSERT' else 'text'] = label
+            results.append(result)
+        return results
+
+
+def _index_arrays(dwg_data: Dict) -> Dict[str, np.ndarray]:
+    """Arrays saved in the spatial index sidecar of a drawing."""
+    entities = as_entity_store(dwg_data['entities'])
+    labels = [''] * len(entities)
+    for entity_type, field in (('TEXT', 'text'), ('MTEXT', 'text'), ('INSERT', 'block_name')):
+        values = entities.column(entity_type, field)
+        if isinstance(values, list):
+            for index, value in zip(entities.indices([entity_type]), values):
+                labels[index] = value or ''
+    label_blob, label_offsets = _encode_strings(labels)
+    arrays = {
+        'type_codes': entities.type_codes.copy(),
+        'layer_codes': entities.layer_codes.copy(),
+        'layout_codes': entities.layout_codes.copy(),
+        'type_names': np.array(entities.type_names, dtype=str),
+        'layer_names': np.array(entities.layer_names, dtype=str),
+        'layout_names': np.array(entities.layout_names, dtype=str),
+        'label_blob': label_blob,
+        'label_offsets': label_offsets,
+    }
+
+    # Inserts cover their transformed block extents where the block geometry is known
+    boxes = entities.bounding_boxes()
+    insert_rows = entities.indices(['INSERT'])
+    if len(insert_rows) and dwg_data.get('block_definitions'):
+        insert_boxes = BlockLibrary.from_dwg_data(dwg_data).insert_boxes(entities)
+        known = ~np.isnan(insert_boxes).any(axis=1)
+        boxes[insert_rows[known]] = insert_boxes[known]
+    arrays.update(SpatialIndex.build(boxes).to_arrays())
+    return arrays
+
+
+def save_drawing_index(drawing_id: str, dwg_data: Dict) -> Optional[str]:
+    """Build and save the spatial index sidecar of a drawing. Returns its path, or None on failure."""
+    try:
+        path = sidecar_path(drawing_id, SPATIAL_INDEX_FILE, create=True)
+        arrays = _index_arrays(dwg_data)
+        atomic_write(path, lambda f: np.savez_compressed(f, **arrays))
+        _loaded.pop(drawing_id, None)
+        return str(path)
+    except Exception:
+        return None
+
+
+# Recently queried drawing indexes, validated by file modification time
+_loaded: 'OrderedDict[str, Tuple[float, DrawingIndex]]' = OrderedDict()
+_MAX_LOADED = 8
+
+
+def load_drawing_index(drawing_id: str) -> Optional[DrawingIndex]:
+    """Load a drawing's saved spatial index, or None if it has none."""
+    path = sidecar_path(drawing_id, SPATIAL_INDEX_FILE)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _loaded.get(drawing_id)
+    if cached and cached[0] == mtime:
+        _loaded.move_to_end(drawing_id)
+        return cached[1]
+
+    with np.load(path) as arrays:
+        arrays = {name: arrays[name] for name in arrays.files}
+    drawing_index = DrawingIndex(SpatialIndex.from_arrays(arrays), arrays)
+    _loaded[drawing_id] = (mtime, drawing_index)
+    while len(_loaded) > _MAX_LOADED:
+        _loaded.popitem(last=False)
+    return drawing_index
+
+
+def query_drawing_region(drawing_id: str, bbox: Sequence[float], mode: str = 'intersects',
+                         entity_types: Optional[Sequence[str]] = None,
+                         layouts: Optional[Sequence[str]] = None) -> Optional[List[Dict]]:
+    """
+    Entities of an indexed drawing inside a region (see DrawingIndex.query).
+
+    Returns None if the drawing has no saved spatial index.
+    """
+    drawing_index = load_drawing_index(drawing_id)
+    if drawing_index is None:
+        return None
+    return drawing_index.query(bbox, mode=mode, entity_types=entity_types, layouts=layouts)
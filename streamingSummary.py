@@ -0,0 +1,203 @@
+# streamingSummary.py
+#**************************************************************************************************
+#   Fixed-memory summary statistics of a stream of extracted entity records.
+#   Descriptions only need aggregates (counts per type, value ranges and quantiles, a sample of
+#   the text), so a summary can replace the full entity list for drawings too large to hold in
+#   memory. Numeric values go through reservoir sketches and text through a reservoir sample,
+#   both sized from a memory budget; records are measured in small batches and then dropped.
+#**************************************************************************************************
+import random
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from entityHandlers import TEXT_CONTENT_TYPES
+from entityStore import EntityStore
+
+# Summarized values: name -> (entity types, record field)
+SUMMARY_FIELDS: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    'circle_radius': (('CIRCLE',), 'radius'),
+    'line_length': (('LINE',), 'length'),
+    'polyline_perimeter': (('LWPOLYLINE', 'POLYLINE'), 'perimeter'),
+    'polyline_vertices': (('LWPOLYLINE', 'POLYLINE'), 'vertex_count'),
+    'polyline_area': (('LWPOLYLINE', 'POLYLINE'), 'area'),
+    'hatch_area': (('HATCH',), 'area'),
+}
+
+# Quantiles reported for every summarized value
+QUANTILES = (0.1, 0.5, 0.9)
+
+# Records measured together before being folded into the summary
+SUMMARY_BATCH_SIZE = 4096
+
+# Text items kept in drawing order before sampling starts, and the length each is cut to
+TEXT_HEAD = 20
+MAX_TEXT_CHARS = 256
+
+# Bytes per sampled text item assumed when sizing the text sample from the budget
+_TEXT_ITEM_BYTES = 4 * MAX_TEXT_CHARS
+
+
+class ValueSketch:
+    """Exact count, min, max and sum plus a fixed-size reservoir sample for quantiles."""
+
+    def __init__(self, size: int, seed: int = 0):
+        self.size = max(1, size)
+        self.sample = np.empty(self.size)
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sum = 0.0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.sum += float(values.sum())
+
+        # Fill the reservoir first, then item t replaces a random slot with probability size / (t + 1)
+        filled = min(max(self.size - self.count, 0), values.size)
+        self.sample[self.count:self.count + filled] = values[:filled]
+        rest = values[filled:]
+        if rest.size:
+            seen = self.count + filled + np.arange(rest.size)
+            slots = (self._rng.random(rest.size) * (seen + 1)).astype(np.int64)
+            keep = slots < self.size
+            self.sample[slots[keep]] = rest[keep]  # later items win, as in a sequential pass
+        self.count += values.size
+
+    def result(self) -> Optional[Dict]:
+        """count, min, max, sum and QUANTILES (as p10, p50, ...), or None if nothing was seen."""
+        if not self.count:
+            return None
+        sample = self.sample[:min(self.count, self.size)]
+        result = {'count': self.count, 'min': self.min, 'max': self.max, 'sum': self.sum}
+        for q, value in zip(QUANTILES, np.quantile(sample, QUANTILES)):
+            result[f"p{int(q * 100)}"] = float(value)
+        return result
+
+
+class TextSample:
+    """The first `head` text items in order, then a reservoir sample of the rest."""
+
+    def __init__(self, size: int, head: int = TEXT_HEAD, seed: int = 0):
+        self.size = max(0, size)
+        self.head_size = head
+        self.head: List[str] = []
+        self.reservoir: List[Tuple[int, str]] = []
+        self.count = 0
+        self._rng = random.Random(seed)
+
+    def add(self, text: str) -> None:
+        text = text[:MAX_TEXT_CHARS]
+        if len(self.head) < self.head_size:
+            self.head.append(text)
+        elif len(self.reservoir) < self.size:
+            self.reservoir.append((self.count, text))
+        else:
+            slot = self._rng.randrange(self.count - self.head_size + 1)
+            if slot < self.size:
+                self.reservoir[slot] = (self.count, text)
+        self.count += 1
+
+    def texts(self) -> List[str]:
+        """Kept items in drawing order."""
+        return self.head + [text for _, text in sorted(self.reservoir)]
+
+
+class StreamingSummary:
+    """
+    Summary of entity records added one at a time, in memory bounded by `memory_budget_mb`.
+
+    Half of the budget goes to the value sketches and a quarter to the text sample;
+    the rest covers the batch of records waiting to be measured.
+    """
+
+    def __init__(self, memory_budget_mb: float = 64, batch_size: int = SUMMARY_BATCH_SIZE, seed: int = 0):
+        budget = int(memory_budget_mb * 1024 * 1024)
+        sketch_size = budget // 2 // (8 * len(SUMMARY_FIELDS))
+        self.sketches = {name: ValueSketch(sketch_size, seed + i) for i, name in enumerate(SUMMARY_FIELDS)}
+        self.text_sample = TextSample(budget // 4 // _TEXT_ITEM_BYTES, seed=seed)
+        self.batch_size = batch_size
+        self.type_counts: Counter = Counter()
+        self.layout_counts: Counter = Counter()
+        self.layout_text_counts: Counter = Counter()
+        self.insert_counts: Counter = Counter()
+        self.layers = set()
+        self._batch = EntityStore()
+
+    def add(self, record: Dict) -> None:
+        """Add one record as returned by entityHandlers.extract_entity()."""
+        entity_type = record['type']
+        layout = record.get('layout', '')
+        self.type_counts[entity_type] += 1
+        self.layout_counts[layout] += 1
+        self.layers.add(record.get('layer') or '')
+        if entity_type in TEXT_CONTENT_TYPES and record.get('text'):
+            self.text_sample.add(record['text'])
+        if entity_type in ('TEXT', 'MTEXT'):
+            self.layout_text_counts[layout] += 1
+        elif entity_type == 'INSERT':
+            self.insert_counts[record['block_name']] += 1
+
+        if any(entity_type in types for types, _ in SUMMARY_FIELDS.values()):
+            self._batch.append_record(record)
+            if len(self._batch) >= self.batch_size:
+                self._flush()
+
+    def _flush(self) -> None:
+        batch = self._batch
+        batch.measure_paths()
+        for name, (types, field) in SUMMARY_FIELDS.items():
+            for entity_type in types:
+                values = batch.column(entity_type, field)
+                if isinstance(values, np.ndarray) and values.ndim == 1:
+                    self.sketches[name].update(values)
+        self._batch = EntityStore()
+
+    def finish(self) -> Dict:
+        """
+        The summary as plain data.
+
+        Returns:
+            Dict with entity_count, type_counts, layout_counts ({layout: {entity_count,
+            text_count}}), insert_counts, layers, fields (ValueSketch.result() per
+            SUMMARY_FIELDS name, or None) and texts (the text sample, in drawing order)
+        """
+        if len(self._batch):
+            self._flush()
+        return {
+            'entity_count': sum(self.type_counts.values()),
+            'type_counts': dict(self.type_counts),
+            'layout_counts': {layout: {'entity_count': count, 'text_count': self.layout_text_counts[layout]}
+                              for layout, count in self.layout_counts.items()},
+            'insert_counts': dict(self.insert_counts),
+            'layers': sorted(self.layers),
+            'fields': {name: sketch.result() for name, sketch in self.sketches.items()},
+            'texts': self.text_sample.texts(),
+        }
+
+
+def summarize_entities(entities: EntityStore, quantiles: Sequence[float] = QUANTILES) -> Dict:
+    """
+    Exact value statistics of a complete EntityStore, in the shape of
+    StreamingSummary.finish()['fields'].
+    """
+    fields = {}
+    for name, (types, field) in SUMMARY_FIELDS.items():
+        columns = [entities.column(entity_type, field) for entity_type in types]
+        values = np.concatenate([c for c in columns if isinstance(c, np.ndarray) and c.ndim == 1] or [np.zeros(0)])
+        values = values[~np.isnan(values)]
+        if not values.size:
+            fields[name] = None
+            continue
+        fields[name] = {'count': int(values.size), 'min': float(values.min()), 'max': float(values.max()),
+                        'sum': float(values.sum())}
+        for q, value in zip(quantiles, np.quantile(values, quantiles)):
+            fields[name][f"p{int(q * 100)}"] = float(value)
+    return fields
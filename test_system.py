@@ -7,19 +7,44 @@ import unittest
 import os
 import tempfile
 import shutil
+import sys
+import time
 from pathlib import Path
 import json
+from unittest import mock
 
+import ezdxf
+import numpy as np
 from colorama import init, Fore, Style
 init(autoreset=True)
 
 # Import modules to test
+import DWG_Processor
 from DWG_Processor import DWGProcessor  # Changed to match your filename
 from semanticMemory import (
     add_to_database, get_from_database, search_similar_files,
     file_exists_in_database, get_database_stats, generate_embedding_id
 )
-from utils import clean_specs, is_valid_specs
+from entityStore import EntityStore
+from extractionCache import ExtractionCache
+from blockLibrary import BlockLibrary, expand_inserts
+from spatialIndex import SpatialIndex, query_drawing_region, save_drawing_index
+from entityFingerprint import save_fingerprints
+import dxfPartition
+import entityHandlers
+from entityTable import load_entity_table, save_entity_table
+from geometryStore import load_drawing_geometry, save_drawing_geometry
+from streamingSummary import ValueSketch, summarize_entities
+from conversionService import ConversionService
+from drawingProbe import probe_drawing
+from nearDuplicate import estimate_similarity, load_near_duplicate_index, remove_signature
+import drawingStore
+from utils import GrokClient, clean_specs, is_valid_specs
+from llmCache import LLMCache, make_key
+from rateLimiter import RateLimiter, TokenBucket, parse_retry_after
+from drawingClassifier import classify_pdf_text, confusion_matrix
+import utils
+import PDF_Analyzer
 from config import validate_config
 
 class TestDWGProcessor(unittest.TestCase):
@@ -27,8 +52,9 @@ class TestDWGProcessor(unittest.TestCase):
     
     def setUp(self):
         """Set up test environment."""
-        self.processor = DWGProcessor()
         self.test_dir = tempfile.mkdtemp()
+        self.cache = ExtractionCache(os.path.join(self.test_dir, 'cache'))
+        self.processor = DWGProcessor(cache=self.cache)
     
     def tearDown(self):
         """Clean up test environment."""
@@ -48,6 +74,43 @@ class TestDWGProcessor(unittest.TestCase):
         # For now, test that the method exists
         self.assertTrue(hasattr(self.processor, '_extract_entity_data'))
     
+    def test_entity_handler_registry(self):
+        """Test curve, leader, solid and attribute handlers and registering a new entity type."""
+        doc = ezdxf.new()
+        tag = doc.blocks.new('TAG')
+        tag.add_attdef('NUM', (0, 0))
+        msp = doc.modelspace()
+        msp.add_ellipse((0, 0), major_axis=(2, 0), ratio=0.5)
+        msp.add_spline([(0, 0), (1, 2), (3, 1), (4, 4)])
+        msp.add_leader([(0, 0), (3, 4), (6, 4)])
+        msp.add_solid([(0, 0), (2, 0), (0, 1), (2, 1)])
+        msp.add_blockref('TAG', (5, 5)).add_attrib('NUM', 'A-101', (5, 5))
+        msp.add_point((7, 7))
+        
+        records = list(entityHandlers.extract_entities(msp))
+        self.assertEqual([r['type'] for r in records], ['ELLIPSE', 'SPLINE', 'LEADER', 'SOLID', 'INSERT', 'ATTRIB'])
+        self.assertEqual((records[0]['major_radius'], records[0]['minor_radius']), (2.0, 1.0))
+        self.assertEqual((records[5]['tag'], records[5]['text']), ('NUM', 'A-101'))
+        
+        store = EntityStore()
+        for record in records:
+            store.append_record(record)
+        store.measure_paths()
+        self.assertEqual(store.column('LEADER', 'perimeter')[0], 8.0)
+        self.assertEqual(store.column('SOLID', 'area')[0], 2.0)
+        self.assertTrue(np.allclose(store.bounding_boxes()[1], (0, 0, 4, 4)))
+        
+        # A registered handler is picked up by the processor without other changes
+        handlers = dict(entityHandlers.ENTITY_HANDLERS)
+        try:
+            entityHandlers.register_entity_handler('POINT')(
+                lambda entity, dxf: {'position': (dxf.location.x, dxf.location.y)})
+            self.assertIn('POINT', self.processor.supported_entities)
+            self.assertEqual(self.processor._extract_entity_data(msp[-1])['position'], (7.0, 7.0))
+        finally:
+            entityHandlers.ENTITY_HANDLERS.clear()
+            entityHandlers.ENTITY_HANDLERS.update(handlers)
+    
     def test_csv_conversion_structure(self):
         """Test CSV conversion with mock data."""
         mock_data = {
@@ -69,6 +132,772 @@ class TestDWGProcessor(unittest.TestCase):
         self.assertIsInstance(csv_output, str)
         self.assertIn('LINE', csv_output)
         self.assertIn('Layer1', csv_output)
+    
+    def _make_sample_dxf(self):
+        """Write a small DXF drawing to the test directory."""
+        doc = ezdxf.new()
+        doc.layers.add('WALLS', color=3)
+        block = doc.blocks.new('BOLT')
+        block.add_circle((0, 0), 1)
+        block.add_mtext('M10 BOLT')
+        msp = doc.modelspace()
+        msp.add_line((0, 0), (3, 4), dxfattribs={'layer': 'WALLS'})
+        msp.add_circle((1, 1), 2.5)
+        msp.add_text('GENERAL NOTES', dxfattribs={'height': 2.5}).set_placement((1, 2))
+        msp.add_blockref('BOLT', (5, 5))
+        path = os.path.join(self.test_dir, 'sample.dxf')
+        doc.saveas(path)
+        return path
+    
+    def test_streaming_extraction_matches_full(self):
+        """Test streaming mode produces the same data as a full document load."""
+        path = self._make_sample_dxf()
+        full = self.processor.extract_dwg_data(path, silent=True, mode='full')
+        streamed = self.processor.extract_dwg_data(path, silent=True, mode='streaming')
+        
+        self.assertEqual(streamed['entities'], full['entities'])
+        self.assertEqual(streamed['blocks'], full['blocks'])
+        self.assertEqual(streamed['text_content'], full['text_content'])
+        by_name = lambda layers: sorted(layers, key=lambda l: l['name'])
+        self.assertEqual(by_name(streamed['layers']), by_name(full['layers']))
+        self.assertEqual(streamed['metadata']['extraction_mode'], 'streaming')
+        self.assertIn('M10 BOLT', full['text_content'])
+    
+    def test_partitioned_extraction_matches_sequential(self):
+        """Test splitting one drawing across worker processes gives the sequential result."""
+        doc = ezdxf.new()
+        tag = doc.blocks.new('TAG')
+        tag.add_attdef('NUM', (0, 0))
+        msp = doc.modelspace()
+        for i in range(300):
+            msp.add_line((i, 0), (i, 1), dxfattribs={'layer': f"L{i % 3}"})
+            msp.add_polyline2d([(i, 0), (i + 1, 0), (i + 1, 1)])
+            msp.add_blockref('TAG', (i, 2)).add_attrib('NUM', f"P-{i}", (i, 2))
+        doc.layouts.get('Layout1').add_text('SHEET TITLE')
+        path = os.path.join(self.test_dir, 'survey.dxf')
+        doc.saveas(path)
+        
+        ranges = dxfPartition.partition_entities_section(path, 8, min_bytes=1)
+        self.assertEqual(len(ranges), 8)
+        self.assertTrue(all(a[1] == b[0] for a, b in zip(ranges, ranges[1:])))
+        
+        sequential = self.processor.extract_dwg_data(path, silent=True, mode='streaming', use_cache=False)
+        self.processor.extract_workers = 3
+        with mock.patch.object(dxfPartition, 'MIN_PARTITION_BYTES', 1):
+            partitioned = self.processor.extract_dwg_data(path, silent=True, mode='streaming', use_cache=False)
+        
+        self.assertEqual(len(partitioned['entities']), 1200)
+        self.assertEqual(partitioned['entities'], sequential['entities'])
+        self.assertEqual(partitioned['text_content'], sequential['text_content'])
+        self.assertEqual(partitioned['entities'].paths.to_arrays()['owners'].tolist(),
+                         sequential['entities'].paths.to_arrays()['owners'].tolist())
+    
+    def test_paperspace_layouts_extracted(self):
+        """Test entities of every layout are extracted and tagged with their layout name."""
+        doc = ezdxf.new()
+        doc.modelspace().add_line((0, 0), (1, 0))
+        doc.layouts.get('Layout1').add_text('SHEET 1 TITLE')
+        sheet2 = doc.layouts.new('Sheet2')
+        sheet2.add_text('REV B')
+        sheet2.add_circle((0, 0), 1)
+        path = os.path.join(self.test_dir, 'sheets.dxf')
+        doc.saveas(path)
+        
+        data = self.processor.extract_dwg_data(path, silent=True, mode='full')
+        layouts = data['metadata']['layouts']
+        self.assertEqual(layouts['Model'], {'entity_count': 1, 'text_count': 0})
+        self.assertEqual(layouts['Layout1'], {'entity_count': 1, 'text_count': 1})
+        self.assertEqual(layouts['Sheet2'], {'entity_count': 2, 'text_count': 1})
+        self.assertEqual([e['layout'] for e in data['entities']], ['Model', 'Layout1', 'Sheet2', 'Sheet2'])
+        self.assertEqual(data['text_content'], 'SHEET 1 TITLE REV B')
+        
+        csv_output = self.processor.convert_to_csv(data)
+        self.assertIn('layout,Sheet2', csv_output)
+        self.assertNotIn('layout,Model', csv_output)
+    
+    def test_insert_expansion(self):
+        """Test nested block inserts expand to world coordinates with each definition walked once."""
+        doc = ezdxf.new()
+        nut = doc.blocks.new('NUT')
+        nut.add_line((0, 0), (1, 0))
+        bolt = doc.blocks.new('BOLT')
+        bolt.add_circle((0, 0), 1)
+        bolt.add_blockref('NUT', (1, 0))
+        msp = doc.modelspace()
+        msp.add_blockref('BOLT', (10, 0), dxfattribs={'xscale': 2, 'yscale': 2, 'rotation': 90, 'layer': 'PARTS'})
+        for x in range(50):
+            msp.add_blockref('BOLT', (x, 100))
+        path = os.path.join(self.test_dir, 'nested.dxf')
+        doc.saveas(path)
+        
+        data = self.processor.extract_dwg_data(path, silent=True, mode='full')
+        blocks = {b['name']: b for b in data['blocks']}
+        self.assertEqual(blocks['BOLT']['insert_count'], 51)
+        self.assertEqual(blocks['BOLT']['block_refs'], ['NUT'])
+        
+        library = BlockLibrary(data['block_definitions'])
+        with mock.patch.object(library, 'expand', wraps=library.expand) as expand:
+            world = library.expand(data['entities'])
+        self.assertEqual(expand.call_count, 2)  # modelspace + BOLT definition once
+        self.assertEqual(world.type_counts(), {'CIRCLE': 51, 'INSERT': 51, 'LINE': 51})
+        
+        first_line = world[world.indices(['LINE'])[0]]
+        self.assertEqual((first_line['start'], first_line['end'], first_line['length']),
+                         ('10.00,2.00', '10.00,4.00', '2.00'))
+        self.assertEqual(first_line['layer'], 'PARTS')
+        self.assertEqual(len(expand_inserts(data, ['NUT'])), 0)
+    
+    def test_block_base_point_matches_virtual_entities(self):
+        """Test inserts of blocks with a non-zero base point expand like ezdxf virtual_entities()."""
+        doc = ezdxf.new()
+        pin = doc.blocks.new('PIN', base_point=(5, 5))
+        pin.add_circle((6, 5), 1)
+        plate = doc.blocks.new('PLATE', base_point=(100, 50))
+        plate.add_line((100, 50), (110, 50))
+        plate.add_blockref('PIN', (104, 52), dxfattribs={'rotation': 30})
+        msp = doc.modelspace()
+        msp.add_blockref('PLATE', (0, 0))
+        msp.add_blockref('PLATE', (20, 30), dxfattribs={'xscale': 2, 'yscale': 2, 'rotation': 90})
+        path = os.path.join(self.test_dir, 'based.dxf')
+        doc.saveas(path)
+        
+        def reference(entities):
+            lines, centers = [], []
+            for entity in entities:
+                if entity.dxftype() == 'INSERT':
+                    more_lines, more_centers = reference(entity.virtual_entities())
+                    lines += more_lines
+                    centers += more_centers
+                elif entity.dxftype() == 'LINE':
+                    lines.append((*entity.dxf.start.vec2, *entity.dxf.end.vec2))
+                else:
+                    centers.append(tuple(entity.dxf.center.vec2))
+            return lines, centers
+        
+        expected_lines, expected_centers = reference(msp)
+        data = self.processor.extract_dwg_data(path, silent=True, mode='full')
+        self.assertEqual({b['name']: b['base_point'] for b in data['blocks']},
+                         {'PIN': (5.0, 5.0), 'PLATE': (100.0, 50.0)})
+        world = expand_inserts(data)
+        lines = np.hstack([world.column('LINE', 'start'), world.column('LINE', 'end')])
+        np.testing.assert_allclose(lines, np.array(expected_lines), atol=1e-9)
+        np.testing.assert_allclose(world.column('CIRCLE', 'center'), np.array(expected_centers), atol=1e-9)
+        np.testing.assert_allclose(lines[0], (0, 0, 10, 0), atol=1e-9)
+    
+    def test_polyline_and_hatch_geometry(self):
+        """Test polyline and hatch vertices are kept with exact arc measurements and saved per drawing."""
+        doc = ezdxf.new()
+        msp = doc.modelspace()
+        msp.add_lwpolyline([(0, 0), (10, 0), (10, 5), (0, 5)], close=True)
+        msp.add_lwpolyline([(0, 0, 1), (1, 0, 1)], format='xyb', close=True)  # circle of diameter 1
+        msp.add_polyline2d([(0, 0), (3, 4)])
+        hatch = msp.add_hatch()
+        hatch.paths.add_edge_path().add_arc((20, 20), 2, 0, 360)
+        path = os.path.join(self.test_dir, 'outline.dxf')
+        doc.saveas(path)
+        
+        data = self.processor.extract_dwg_data(path, silent=True, mode='full')
+        entities = data['entities']
+        measured = [(e['vertex_count'], e['perimeter'], e['area']) for e in entities]
+        self.assertEqual(measured, [('4.00', '30.00', '50.00'), ('2.00', '3.14', '0.79'),
+                                    ('2.00', '5.00', None), ('2.00', '12.57', '12.57')])
+        self.assertEqual(entities.bounding_boxes()[3].tolist(), [18.0, 20.0, 22.0, 20.0])
+        self.assertIn('2 closed outlines enclosing 0.79 to 50.00 square units',
+                      self.processor.csv_to_natural_language(data))
+        
+        with mock.patch.object(drawingStore, 'DRAWING_DATA_DIR', self.test_dir):
+            self.assertTrue(save_drawing_geometry('outline', entities.paths))
+            saved = load_drawing_geometry('outline')
+        vertices, closed = saved.paths(1)[0]
+        self.assertTrue(closed)
+        self.assertEqual(vertices.tolist(), [[0.0, 0.0, 1.0], [1.0, 0.0, 1.0]])
+    
+    def test_entity_table_round_trip(self):
+        """Test the saved entity table reproduces the records and CSV and selects by type and layer."""
+        path = self._make_sample_dxf()
+        data = self.processor.extract_dwg_data(path, silent=True, mode='full')
+        
+        with mock.patch.object(drawingStore, 'DRAWING_DATA_DIR', self.test_dir):
+            self.assertTrue(save_entity_table('sample', data, source_path=path))
+            table = load_entity_table('sample')
+        
+        self.assertIsInstance(table.records, np.memmap)
+        expected = [{k: v for k, v in record.items() if v is not None} for record in data['entities']]
+        self.assertEqual(list(table), expected)
+        self.assertEqual(self.processor.convert_to_csv(table.as_dwg_data()), self.processor.convert_to_csv(data))
+        self.assertEqual([e['type'] for e in table.select(layers=['WALLS'])], ['LINE'])
+        self.assertEqual([e['text'] for e in table.select(entity_types=['TEXT', 'INSERT'])[:1]], ['GENERAL NOTES'])
+        self.assertTrue(table.matches_source(path))
+    
+    def test_extraction_cache_reuses_unchanged_content(self):
+        """Test a second extraction of identical content comes from the cache."""
+        path = self._make_sample_dxf()
+        copy_path = os.path.join(self.test_dir, 'renamed.dxf')
+        shutil.copy(path, copy_path)
+        
+        first = self.processor.extract_dwg_data(path, silent=True, mode='full')
+        with mock.patch.object(DWG_Processor.ezdxf, 'readfile') as readfile:
+            cached = self.processor.extract_dwg_data(copy_path, silent=True, mode='full')
+            readfile.assert_not_called()
+        
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(cached['entities'], first['entities'])
+        self.assertEqual(cached['metadata']['filename'], 'renamed.dxf')
+    
+    def test_extraction_cache_size_budget(self):
+        """Test the cache stays within budget and only rescans its directory when over it."""
+        cache = ExtractionCache(os.path.join(self.test_dir, 'bounded'), max_mb=0.2)
+        def on_disk():
+            return sum(p.stat().st_size for p in cache.cache_dir.glob('*.extract'))
+        
+        with mock.patch.object(cache, '_scan', wraps=cache._scan) as scan:
+            for i in range(80):
+                self.assertTrue(cache.put(f'key{i}', {'payload': os.urandom(4000)}))
+                self.assertEqual(cache.size_bytes(), on_disk())
+                self.assertLessEqual(cache.size_bytes(), cache.max_bytes)
+            cache.put('key79', {'payload': os.urandom(2000)})  # replacing an entry
+            self.assertEqual(cache.size_bytes(), on_disk())
+        
+        self.assertLess(scan.call_count, 10)
+        self.assertIsNone(cache.get('key0'))
+        self.assertIsNotNone(cache.get('key79'))
+    
+    def test_parallel_batch_results(self):
+        """Test parallel processing writes once per good file and reports failures."""
+        good = self._make_sample_dxf()
+        bad = os.path.join(self.test_dir, 'broken.dwg')
+        with open(bad, 'w') as f:
+            f.write('not a drawing')
+        
+        data_dir = os.path.join(self.test_dir, 'worker_data')
+        with mock.patch.object(DWG_Processor, 'write_database_entry') as writer:
+            success, failed, results = DWG_Processor.process_dwg_files_parallel(
+                [good, bad], workers=2, file_timeout=120, silent=True, data_dir=data_dir)
+        
+        self.assertEqual((success, failed), (1, 1))
+        self.assertEqual(writer.call_count, 1)
+        statuses = {os.path.basename(r['filepath']): r['status'] for r in results}
+        self.assertEqual(statuses, {'sample.dxf': 'added', 'broken.dwg': 'failed'})
+        
+        # Worker sidecars and cache entries went to the test directory
+        entry = writer.call_args[0][0]
+        self.assertTrue(os.path.isdir(os.path.join(data_dir, 'drawing_data', entry['id'])))
+        self.assertTrue(os.listdir(os.path.join(data_dir, 'extraction_cache')))
+    
+    def test_revision_delta_reuses_ai_analysis(self):
+        """Test a geometry-only revision keeps the AI analysis and a text change redoes it."""
+        def save_revision(doc, stamp):
+            doc.saveas(path)
+            os.utime(path, ns=(stamp, stamp))
+        
+        doc = ezdxf.new()
+        msp = doc.modelspace()
+        line = msp.add_line((0, 0), (3, 4))
+        msp.add_line((0, 0), (3, 4))
+        note = msp.add_text('GENERAL NOTES')
+        path = os.path.join(self.test_dir, 'revised.dxf')
+        save_revision(doc, 10**18)
+        
+        processor = self.processor
+        with mock.patch.object(drawingStore, 'DRAWING_DATA_DIR', self.test_dir), \
+             mock.patch.object(processor, 'create_description', return_value='Notes sheet') as describe, \
+             mock.patch.object(processor, 'extract_specs_with_ai', return_value={'title': 'NOTES'}):
+            first = processor.build_database_entry(path, silent=True)
+            save_fingerprints(first['id'], first['fingerprints'])
+            self.assertEqual(processor.check_revision(path, first['metadata']), 'unchanged')
+            os.utime(path, ns=(2 * 10**18, 2 * 10**18))
+            self.assertEqual(processor.check_revision(path, first['metadata']), 'touched')
+            
+            line.dxf.end = (6, 8)
+            save_revision(doc, 3 * 10**18)
+            self.assertEqual(processor.check_revision(path, first['metadata']), 'changed')
+            moved = processor.build_database_entry(path, silent=True, previous=first['metadata'])
+            self.assertEqual(describe.call_count, 1)
+            save_fingerprints(moved['id'], moved['fingerprints'])
+            
+            note.dxf.text = 'GENERAL NOTES REV B'
+            save_revision(doc, 4 * 10**18)
+            retexted = processor.build_database_entry(path, silent=True, previous=moved['metadata'])
+            self.assertEqual(describe.call_count, 2)
+        
+        meta = moved['metadata']
+        self.assertEqual((meta['revision'], meta['delta_added'], meta['delta_removed']), (2, 1, 1))
+        self.assertFalse(meta['material_change'])
+        self.assertEqual(meta['description'], 'Notes sheet')
+        self.assertEqual(json.loads(meta['specs'])['title'], 'NOTES')
+        self.assertEqual(json.loads(meta['specs'])['entity_count'], 3)
+        self.assertTrue(retexted['metadata']['material_change'])
+        self.assertEqual(retexted['metadata']['revision'], 3)
+        self.assertEqual(len(set(first['fingerprints']['fingerprints'])), 3)  # duplicate lines kept apart
+    
+    def test_near_duplicate_reuses_ai_analysis(self):
+        """Test a moved copy of an indexed drawing reuses its AI analysis and another drawing does not."""
+        def save_drawing(name, offset, extra=0, seed=0):
+            rng = np.random.default_rng(seed)
+            doc = ezdxf.new()
+            msp = doc.modelspace()
+            for i in range(40):
+                x, y = rng.uniform(0, 100, 2) + offset
+                msp.add_line((x, y), (x + rng.uniform(1, 20), y), dxfattribs={'layer': 'WALLS'})
+                msp.add_circle((x, y), rng.uniform(1, 5), dxfattribs={'layer': 'HOLES'})
+            for i in range(extra):
+                msp.add_line((0, 0), (1, 1))
+            msp.add_text('BRACKET ASSEMBLY SCALE 1:2').set_placement(tuple(offset))
+            path = os.path.join(self.test_dir, name)
+            doc.saveas(path)
+            return path
+        
+        original = save_drawing('original.dxf', np.array([0.0, 0.0]))
+        moved = save_drawing('moved_copy.dxf', np.array([500.0, -20.0]), extra=2)
+        other = save_drawing('other.dxf', np.array([0.0, 0.0]), seed=1)
+        
+        processor = self.processor
+        with mock.patch.object(drawingStore, 'DRAWING_DATA_DIR', self.test_dir), \
+             mock.patch.object(processor, 'create_description', return_value='Bracket') as describe, \
+             mock.patch.object(processor, 'extract_specs_with_ai', return_value={'title': 'BRACKET'}), \
+             mock.patch.object(DWG_Processor, 'collection') as collection:
+            first = processor.build_database_entry(original, silent=True)
+            DWG_Processor.write_database_entry(first)
+            collection.get.return_value = {'ids': [first['id']], 'metadatas': [first['metadata']]}
+            
+            copy = processor.build_database_entry(moved, silent=True)
+            self.assertEqual(describe.call_count, 1)
+            unrelated = processor.build_database_entry(other, silent=True)
+            self.assertEqual(describe.call_count, 2)
+            
+            self.assertEqual(load_near_duplicate_index().query(copy['signature'], 0.9),
+                             [(first['id'], copy['metadata']['near_duplicate_similarity'])])
+            self.assertTrue(remove_signature(first['id']))
+            self.assertEqual(len(load_near_duplicate_index()), 0)
+        
+        self.assertEqual(copy['metadata']['near_duplicate_of'], os.path.abspath(original))
+        self.assertGreaterEqual(copy['metadata']['near_duplicate_similarity'], 0.9)
+        self.assertEqual(json.loads(copy['metadata']['specs'])['title'], 'BRACKET')
+        self.assertEqual(json.loads(copy['metadata']['specs'])['entity_count'], 83)
+        self.assertNotIn('near_duplicate_of', unrelated['metadata'])
+        self.assertLess(estimate_similarity(first['signature'], unrelated['signature']), 0.5)
+    
+    def test_header_probe(self):
+        """Test the header probe reads DXF header variables and DWG version bytes only."""
+        doc = ezdxf.new('R2010')
+        doc.header['$INSUNITS'] = 4
+        doc.header['$EXTMIN'] = (0, 0, 0)
+        doc.header['$EXTMAX'] = (420, 297, 0)
+        doc.modelspace().add_line((0, 0), (420, 297))
+        doc.update_extents = lambda: None  # keep the extents set above when saving
+        ascii_path = os.path.join(self.test_dir, 'sheet.dxf')
+        binary_path = os.path.join(self.test_dir, 'sheet_bin.dxf')
+        doc.saveas(ascii_path)
+        doc.saveas(binary_path, fmt='bin')
+        dwg_path = os.path.join(self.test_dir, 'sheet.dwg')
+        with open(dwg_path, 'wb') as f:
+            f.write(b'AC1032' + bytes(5) + b'\x21' + bytes(20))
+        
+        for path, file_format in ((ascii_path, 'dxf'), (binary_path, 'dxf-binary')):
+            probe = probe_drawing(path)
+            self.assertEqual(probe['format'], file_format)
+            self.assertEqual((probe['version'], probe['release']), ('AC1024', 'R2010'))
+            self.assertEqual((probe['units'], probe['units_name']), (4, 'Millimeters'))
+            self.assertEqual(probe['extents'], (0.0, 0.0, 420.0, 297.0))
+            self.assertEqual(probe['handle_seed'], int(doc.header['$HANDSEED'], 16))
+            self.assertTrue(probe['last_saved'])
+        
+        dwg = probe_drawing(dwg_path)
+        self.assertEqual((dwg['format'], dwg['release'], dwg['maintenance_release']), ('dwg', 'R2018', 0x21))
+        self.assertIsNone(dwg['units'])
+        self.assertIn('error', probe_drawing(os.path.join(self.test_dir, 'missing.dwg')))
+    
+    def test_format_sniffing_routes_files(self):
+        """Test a DWG skips ezdxf.readfile and a damaged DXF is recovered without conversion."""
+        dwg_path = os.path.join(self.test_dir, 'binary.dwg')
+        with open(dwg_path, 'wb') as f:
+            f.write(b'AC1032' + bytes(64))
+        with mock.patch.object(DWG_Processor.ezdxf, 'readfile') as readfile, \
+             mock.patch.object(self.processor, '_convert_dwg_to_dxf', return_value=None) as convert:
+            self.assertIsNone(self.processor.extract_dwg_data(dwg_path, silent=True, mode='full'))
+        readfile.assert_not_called()
+        convert.assert_called_once()
+        
+        unknown_path = os.path.join(self.test_dir, 'unknown.dwg')
+        with open(unknown_path, 'wb') as f:
+            f.write(b'\x00\xffNOT A KNOWN HEADER' + bytes(64))
+        with mock.patch.object(self.processor, '_convert_dwg_to_dxf', return_value=None) as convert:
+            self.assertIsNone(self.processor.extract_dwg_data(unknown_path, silent=True, mode='full'))
+        convert.assert_called_once()  # unrecognized bytes fall back to conversion
+        
+        doc = ezdxf.new()
+        doc.modelspace().add_line((0, 0), (1, 1))
+        doc.modelspace().add_circle((0, 0), 2)
+        damaged_path = os.path.join(self.test_dir, 'damaged.dxf')
+        doc.saveas(damaged_path)
+        with open(damaged_path, 'r') as f:
+            content = f.read()
+        circle = content.index('CIRCLE')
+        with open(damaged_path, 'w') as f:
+            f.write(content[:circle] + content[circle:].replace(' 40\n', '4x0\n', 1))  # invalid group code
+        with mock.patch.object(self.processor, '_convert_dwg_to_dxf') as convert:
+            data = self.processor.extract_dwg_data(damaged_path, silent=True, mode='full', use_cache=False)
+        convert.assert_not_called()
+        self.assertEqual([e['type'] for e in data['entities']], ['LINE', 'CIRCLE'])
+    
+    def test_text_mode_indexes_annotations_only(self):
+        """Test text mode collects all annotation text and counts geometry it does not decode."""
+        doc = ezdxf.new()
+        tag = doc.blocks.new('TAG')
+        tag.add_attdef('NUM', (0, 0))
+        msp = doc.modelspace()
+        msp.add_line((0, 0), (3, 4))
+        msp.add_text('GENERAL NOTES', dxfattribs={'layer': 'ANNO'})
+        msp.add_mtext('ALL DIMS IN MM')
+        msp.add_linear_dim(base=(0, 5), p1=(0, 0), p2=(3, 0)).render()
+        msp.add_linear_dim(base=(0, 8), p1=(0, 0), p2=(5, 0), text='OVERALL').render()
+        msp.add_blockref('TAG', (5, 5)).add_attrib('NUM', 'A-101', (5, 5))
+        for x in range(20):
+            msp.add_lwpolyline([(x, 0), (x + 1, 1), (x, 2)])
+        doc.layouts.get('Layout1').add_text('SHEET TITLE')
+        path = os.path.join(self.test_dir, 'annotated.dxf')
+        doc.saveas(path)
+
+        full = self.processor.extract_dwg_data(path, silent=True, mode='full')
+        text = self.processor.extract_dwg_data(path, silent=True, mode='text')
+
+        self.assertEqual(text['text_content'], 'GENERAL NOTES ALL DIMS IN MM OVERALL A-101 SHEET TITLE')
+        self.assertEqual(text['entities'].type_counts(), {'TEXT': 2, 'MTEXT': 1, 'DIMENSION': 2, 'INSERT': 1, 'ATTRIB': 1})
+        self.assertEqual(text['metadata']['entity_types']['LWPOLYLINE'], 20)
+        self.assertEqual(text['metadata']['entity_count'], full['metadata']['entity_count'])
+        self.assertEqual(text['metadata']['extraction_mode'], 'text')
+
+        # A full pass over a text-mode record counts as a change, unless text mode is asked for
+        stored = {'content_hash': self.cache.content_hash(path), 'extraction_mode': 'text'}
+        self.assertEqual(self.processor.check_revision(path, stored, mode='full'), 'changed')
+        self.assertNotEqual(self.processor.check_revision(path, stored, mode='text'), 'changed')
+
+    def _make_stub_converter(self, template_dxf):
+        """Write a stand-in ODA File Converter that copies a DXF for each matching input."""
+        script = os.path.join(self.test_dir, 'ODAFileConverter')
+        log_path = os.path.join(self.test_dir, 'oda_calls.log')
+        with open(script, 'w') as f:
+            f.write(f"""#!{sys.executable}
+import fnmatch, os, shutil, sys
+src, dst, pattern = sys.argv[1], sys.argv[2], sys.argv[7]
+with open({log_path!r}, 'a') as log:
+    log.write(pattern + '\\n')
+for name in os.listdir(src):
+    if not fnmatch.fnmatch(name.upper(), pattern.upper()):
+        continue
+    if pattern == '*.DWG' and name.startswith('flaky'):
+        continue  # only converts when run on its own
+    shutil.copy({template_dxf!r}, os.path.join(dst, os.path.splitext(name)[0] + '.dxf'))
+""")
+        os.chmod(script, 0o755)
+        return script, log_path
+    
+    def test_batch_conversion_one_run_per_folder(self):
+        """Test DWG files are converted per folder and failures are retried singly."""
+        template = self._make_sample_dxf()
+        script, log_path = self._make_stub_converter(template)
+        folder = os.path.join(self.test_dir, 'drawings')
+        os.makedirs(folder)
+        paths = []
+        for name in ('a.dwg', 'b.dwg', 'flaky.dwg', 'skipped.dwg'):
+            path = os.path.join(folder, name)
+            with open(path, 'wb') as f:
+                f.write(b'AC1032' + name.encode())
+            paths.append(path)
+    
+        with mock.patch.object(DWG_Processor, 'get_oda_converter_path', return_value=script):
+            converted = self.processor.convert_dwg_batch(paths[:3] + [template], silent=True)
+            data = self.processor.extract_dwg_data(paths[0], silent=True, converted_path=converted[paths[0]])
+    
+        with open(log_path) as f:
+            calls = f.read().split()
+        self.assertEqual(calls, ['*.DWG', 'flaky.dwg'])  # one staged batch, one retry
+        self.assertEqual(sorted(converted), sorted(paths[:3]))
+        self.assertTrue(all(converted.values()))
+        self.assertEqual(data['metadata']['filename'], 'a.dwg')
+        self.assertEqual(data['metadata']['entity_count'], 4)
+        self.assertFalse(os.path.exists(converted[paths[0]]))
+    
+    def test_oda_discovery_is_remembered(self):
+        """Test the converter search runs once and its result is reused until the file changes."""
+        script = os.path.join(self.test_dir, 'ODAFileConverter')
+        with open(script, 'w') as f:
+            f.write('stub')
+        cache_file = os.path.join(self.test_dir, 'oda_converter.json')
+        
+        def lookup():
+            with mock.patch.object(DWG_Processor, '_oda_lookup_done', False), \
+                 mock.patch.object(DWG_Processor, '_oda_converter_path', None):
+                return DWG_Processor.get_oda_converter_path()
+        
+        with mock.patch.object(DWG_Processor, 'ODA_CONVERTER_PATH', ''), \
+             mock.patch.object(DWG_Processor, 'ODA_CACHE_FILE', cache_file), \
+             mock.patch.object(DWG_Processor, 'find_oda_converter', return_value=script) as search:
+            self.assertEqual(lookup(), script)
+            self.assertEqual(lookup(), script)
+            self.assertEqual(search.call_count, 1)
+            
+            with open(script, 'a') as f:
+                f.write(' updated')  # stamp no longer matches
+            self.assertEqual(lookup(), script)
+            self.assertEqual(search.call_count, 2)
+        
+        with mock.patch.object(DWG_Processor, 'ODA_CONVERTER_PATH', script), \
+             mock.patch.object(DWG_Processor, 'find_oda_converter') as search:
+            self.assertEqual(lookup(), script)
+            search.assert_not_called()
+    
+    def test_oda_miss_is_retried(self):
+        """Test a failed converter search is not cached for the life of the process."""
+        script = os.path.join(self.test_dir, 'ODAFileConverter')
+        with open(script, 'w') as f:
+            f.write('stub')
+        
+        with mock.patch.object(DWG_Processor, '_oda_lookup_done', False), \
+             mock.patch.object(DWG_Processor, '_oda_converter_path', None), \
+             mock.patch.object(DWG_Processor, '_oda_missed_at', None), \
+             mock.patch.object(DWG_Processor, 'ODA_CONVERTER_PATH', ''), \
+             mock.patch.object(DWG_Processor, 'ODA_CACHE_FILE', os.path.join(self.test_dir, 'oda.json')), \
+             mock.patch.object(DWG_Processor, 'find_oda_converter', return_value=None) as search:
+            self.assertIsNone(DWG_Processor.get_oda_converter_path())
+            self.assertIsNone(DWG_Processor.get_oda_converter_path())
+            self.assertEqual(search.call_count, 1)  # misses are remembered briefly
+            
+            search.return_value = script  # converter installed later
+            with mock.patch.object(DWG_Processor, 'ODA_LOOKUP_RETRY_SECONDS', 0):
+                self.assertEqual(DWG_Processor.get_conversion_service().converter(), script)
+            self.assertEqual(DWG_Processor.get_oda_converter_path(), script)
+            self.assertEqual(search.call_count, 2)
+
+class TestConversionService(unittest.TestCase):
+    """Test the bounded DWG conversion worker pool with a stand-in converter."""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir, True)
+        self.pid_file = os.path.join(self.test_dir, 'hang.pid')
+        self.script = os.path.join(self.test_dir, 'ODAFileConverter')
+        with open(self.script, 'w') as f:
+            f.write(f"""#!{sys.executable}
+import os, sys, time
+src, dst, name = sys.argv[1], sys.argv[2], sys.argv[7]
+if name.startswith('hang'):
+    with open({self.pid_file!r}, 'w') as pid:
+        pid.write(str(os.getpid()))
+    time.sleep(60)
+if name.startswith('broken'):
+    sys.exit(3)
+time.sleep(0.2)
+with open(os.path.join(dst, os.path.splitext(name)[0] + '.dxf'), 'w') as out:
+    out.write('converted ' + name)
+""")
+        os.chmod(self.script, 0o755)
+    
+    def make_dwg(self, name):
+        path = os.path.join(self.test_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'AC1032')
+        return path
+    
+    def test_concurrency_limit_and_metrics(self):
+        """Test no more than max_workers conversions run at once and every job is accounted for."""
+        service = ConversionService(self.script, max_workers=2, timeout=30)
+        self.addCleanup(service.shutdown)
+        futures = [service.submit(self.make_dwg(f"part{i}.dwg")) for i in range(5)]
+        futures.append(service.submit(self.make_dwg('broken.dwg')))
+        results = [future.result(timeout=60) for future in futures]
+        
+        for i, result in enumerate(results[:5]):
+            self.assertEqual(result['status'], 'converted')
+            with open(result['dxf_path']) as f:
+                self.assertEqual(f.read(), f"converted part{i}.dwg")
+        self.assertEqual((results[5]['status'], results[5]['returncode'], results[5]['dxf_path']), ('failed', 3, None))
+        
+        metrics = service.metrics()
+        self.assertEqual(metrics['peak_active'], 2)
+        self.assertEqual((metrics['queue_depth'], metrics['active']), (0, 0))
+        self.assertEqual((metrics['submitted'], metrics['converted'], metrics['failed']), (6, 5, 1))
+        self.assertGreater(metrics['wait_ms']['p95'], 0)  # later jobs waited for a free worker
+        self.assertGreaterEqual(metrics['run_ms']['p50'], 200)
+    
+    def test_timeout_kills_converter_and_restarts_worker(self):
+        """Test a hung converter is killed at the job timeout and the worker keeps serving jobs."""
+        service = ConversionService(self.script, max_workers=1, timeout=30)
+        self.addCleanup(service.shutdown)
+        hung = service.submit(self.make_dwg('hang.dwg'), timeout=1)
+        after = service.submit(self.make_dwg('after.dwg'))
+        
+        self.assertEqual(hung.result(timeout=30)['status'], 'timeout')
+        with open(self.pid_file) as f:
+            with self.assertRaises(ProcessLookupError):
+                os.kill(int(f.read()), 0)
+        self.assertEqual(after.result(timeout=30)['status'], 'converted')
+        metrics = service.metrics()
+        self.assertEqual((metrics['timeout'], metrics['restarts'], metrics['converted']), (1, 1, 1))
+    
+    def test_processor_converts_through_service(self):
+        """Test DWGProcessor single-file conversion goes through the shared service."""
+        service = ConversionService(self.script, max_workers=1, timeout=30)
+        self.addCleanup(service.shutdown)
+        processor = DWGProcessor(cache=ExtractionCache(os.path.join(self.test_dir, 'cache')))
+        with mock.patch.object(DWG_Processor, 'get_conversion_service', return_value=service), \
+             mock.patch.object(DWG_Processor, 'is_dwg_conversion_available', return_value=True):
+            dxf_path = processor._convert_dwg_to_dxf(self.make_dwg('upload.dwg'), silent=True)
+        self.assertTrue(dxf_path.startswith(service.output_dir))
+        self.assertEqual(service.metrics()['converted'], 1)
+        
+class TestEntityStore(unittest.TestCase):
+    """Test columnar entity storage."""
+    
+    def test_legacy_records_round_trip(self):
+        """Test legacy dict records come back unchanged."""
+        records = [
+            {'type': 'LINE', 'layer': 'A', 'color': 7, 'start': '0.00,0.00', 'end': '3.00,4.00', 'length': '5.00'},
+            {'type': 'TEXT', 'layer': 'B', 'color': None, 'text': '100', 'height': None, 'position': '1.00,2.00'},
+        ]
+        store = EntityStore.from_records(records)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(list(store), records)
+        self.assertEqual(store[-1]['text'], '100')
+    
+    def test_vectorized_statistics(self):
+        """Test counts and ranges keep full precision."""
+        store = EntityStore()
+        for radius in (1.004, 2.5, 7.25):
+            store.append('CIRCLE', 'HOLES', 1, {'center': (0.0, 0.0), 'radius': radius})
+        store.append('TEXT', 'NOTES', 7, {'text': 'DRILL THRU'})
+        
+        self.assertEqual(store.type_counts(), {'CIRCLE': 3, 'TEXT': 1})
+        self.assertEqual(store.value_range('CIRCLE', 'radius'), (1.004, 7.25))
+        self.assertEqual(store.column('CIRCLE', 'center').shape, (3, 2))
+        self.assertEqual(store.texts(), ['DRILL THRU'])
+        self.assertEqual(list(store.indices(layers=['NOTES'])), [3])
+
+class TestStreamingSummary(unittest.TestCase):
+    """Test fixed-memory summaries of streamed entities."""
+    
+    def test_sketch_quantiles_within_budget(self):
+        """Test the reservoir sketch keeps exact extremes and close quantiles in fixed memory."""
+        values = np.random.default_rng(7).normal(10.0, 2.0, 200000)
+        sketch = ValueSketch(2048)
+        for chunk in np.array_split(values, 37):
+            sketch.update(chunk)
+        
+        result = sketch.result()
+        self.assertEqual(sketch.sample.size, 2048)
+        self.assertEqual(result['count'], values.size)
+        self.assertEqual((result['min'], result['max']), (values.min(), values.max()))
+        self.assertAlmostEqual(result['sum'], values.sum(), places=3)
+        for q in (10, 50, 90):
+            self.assertLess(abs(result[f"p{q}"] - np.percentile(values, q)), 0.2)
+    
+    def test_sample_mode_matches_full_statistics(self):
+        """Test sample mode describes a drawing like full extraction without keeping entities."""
+        test_dir = tempfile.mkdtemp()
+        try:
+            doc = ezdxf.new()
+            msp = doc.modelspace()
+            for i in range(3000):
+                msp.add_line((0, 0), (i % 17 + 1, 0))
+                msp.add_circle((i, 0), 0.5 + i % 5)
+                msp.add_lwpolyline([(i, 0), (i + 1, 0), (i, 2)], close=True)
+                msp.add_text(f"NOTE {i}")
+            path = os.path.join(test_dir, 'large.dxf')
+            doc.saveas(path)
+            
+            processor = DWGProcessor(cache=ExtractionCache(os.path.join(test_dir, 'cache')))
+            processor.sample_memory_mb = 0.25
+            full = processor.extract_dwg_data(path, silent=True, mode='full')
+            sample = processor.extract_dwg_data(path, silent=True, mode='sample')
+        finally:
+            shutil.rmtree(test_dir)
+        
+        self.assertEqual(len(sample['entities']), 0)
+        self.assertEqual(sample['metadata']['entity_count'], 12000)
+        self.assertEqual(sample['metadata']['entity_types'], full['entities'].type_counts())
+        self.assertEqual(processor.csv_to_natural_language(sample), processor.csv_to_natural_language(full))
+        
+        exact = summarize_entities(full['entities'])
+        for name, stats in sample['summary']['fields'].items():
+            if stats:
+                self.assertEqual((stats['count'], stats['min'], stats['max']),
+                                 (exact[name]['count'], exact[name]['min'], exact[name]['max']))
+        texts = sample['summary']['texts']
+        self.assertEqual(texts[:3], ['NOTE 0', 'NOTE 1', 'NOTE 2'])
+        self.assertLess(len(texts), 100)  # sampled within the budget
+
+class TestSpatialIndex(unittest.TestCase):
+    """Test the grid spatial index and per-drawing region queries."""
+    
+    def test_grid_matches_brute_force(self):
+        """Test grid queries return exactly the boxes a full scan finds."""
+        rng = np.random.default_rng(7)
+        corners = rng.uniform(0, 100, (2000, 2))
+        boxes = np.hstack([corners, corners + rng.exponential(1.5, (2000, 2))])
+        boxes[:5, 2:] += 80  # a few very large entities
+        boxes[10] = np.nan
+        index = SpatialIndex.build(boxes)
+        
+        for query in [(10, 10, 20, 30), (-5, -5, 0.5, 0.5), (150, 150, 160, 160), (0, 0, 200, 200)]:
+            for mode in ('intersects', 'within'):
+                with np.errstate(invalid='ignore'):
+                    if mode == 'within':
+                        hit = ((boxes[:, 0] >= query[0]) & (boxes[:, 1] >= query[1]) &
+                               (boxes[:, 2] <= query[2]) & (boxes[:, 3] <= query[3]))
+                    else:
+                        hit = ((boxes[:, 0] <= query[2]) & (boxes[:, 2] >= query[0]) &
+                               (boxes[:, 1] <= query[3]) & (boxes[:, 3] >= query[1]))
+                self.assertEqual(list(index.query(*query, mode=mode)), list(np.nonzero(hit)[0]))
+    
+    def test_drawing_region_query(self):
+        """Test a saved drawing index answers region queries with text and block inserts."""
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir)
+        doc = ezdxf.new()
+        block = doc.blocks.new('TITLE')
+        block.add_line((0, 0), (40, 10))
+        msp = doc.modelspace()
+        msp.add_line((0, 0), (10, 0))
+        msp.add_text('DETAIL A', dxfattribs={'height': 1}).set_placement((50, 50))
+        msp.add_blockref('TITLE', (100, 0))
+        path = os.path.join(test_dir, 'plan.dxf')
+        doc.saveas(path)
+        
+        processor = DWGProcessor(cache=ExtractionCache(os.path.join(test_dir, 'cache')))
+        data = processor.extract_dwg_data(path, silent=True, mode='full')
+        with mock.patch.object(drawingStore, 'DRAWING_DATA_DIR', test_dir):
+            self.assertIsNone(query_drawing_region('plan', (0, 0, 1, 1)))
+            self.assertTrue(save_drawing_index('plan', data))
+            detail = query_drawing_region('plan', (45, 45, 55, 55))
+            title = query_drawing_region('plan', (130, 5, 131, 6), entity_types=['INSERT'])
+            nothing = query_drawing_region('plan', (45, 45, 55, 55), mode='within', layouts=['Layout1'])
+        
+        self.assertEqual([(e['type'], e.get('text')) for e in detail], [('TEXT', 'DETAIL A')])
+        self.assertEqual(detail[0]['bbox'], [50.0, 50.0, 50.0, 51.0])
+        self.assertEqual([(e['block_name'], e['bbox']) for e in title], [('TITLE', [100.0, 0.0, 140.0, 10.0])])
+        self.assertEqual(nothing, [])
+    
+    def test_region_query_offset_block(self):
+        """Test an insert of a block drawn away from its origin is found where it is drawn."""
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir)
+        doc = ezdxf.new()
+        block = doc.blocks.new('STAMP', base_point=(500, 200))
+        block.add_line((500, 200), (520, 210))
+        doc.modelspace().add_blockref('STAMP', (10, 10), dxfattribs={'rotation': 90})
+        path = os.path.join(test_dir, 'stamp.dxf')
+        doc.saveas(path)
+        
+        processor = DWGProcessor(cache=ExtractionCache(os.path.join(test_dir, 'cache')))
+        data = processor.extract_dwg_data(path, silent=True, mode='full')
+        with mock.patch.object(drawingStore, 'DRAWING_DATA_DIR', test_dir):
+            self.assertTrue(save_drawing_index('stamp', data))
+            hits = query_drawing_region('stamp', (0, 15, 5, 25), entity_types=['INSERT'])
+            misses = query_drawing_region('stamp', (500, 200, 520, 210), entity_types=['INSERT'])
+        
+        self.assertEqual(len(hits), 1)
+        np.testing.assert_allclose(hits[0]['bbox'], [0.0, 10.0, 10.0, 30.0], atol=1e-9)
+        self.assertEqual(misses, [])
 
 class TestSemanticMemory(unittest.TestCase):
     """Test ChromaDB vector database functionality."""
@@ -131,6 +960,432 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(is_valid_specs(valid_specs))
         self.assertFalse(is_valid_specs(empty_specs))
         self.assertFalse(is_valid_specs(all_empty))
+    
+    def test_grok_client_reuses_connections(self):
+        """GrokClient keeps one pooled connection open across calls and fails softly."""
+        import asyncio
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        clients = []
+        
+        class ChatHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                clients.append(self.client_address)
+                status = 500 if request['messages'][0]['content'] == 'fail' else 200
+                body = json.dumps({'choices': [{'message': {'content': request['model']}}]}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(('127.0.0.1', 0), ChatHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        endpoint = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+        client = GrokClient('key', endpoint=endpoint, timeout=5, rate_limiter=RateLimiter('test', max_retries=0))
+        try:
+            for _ in range(3):
+                resp = client.chat([{'role': 'user', 'content': 'hi'}], model='m1')
+                self.assertEqual(resp['choices'][0]['message']['content'], 'm1')
+            self.assertEqual(len(set(clients)), 1)
+            self.assertIsNone(client.chat([{'role': 'user', 'content': 'fail'}]))
+            
+            async def run_async():
+                try:
+                    return await asyncio.gather(*[
+                        client.achat([{'role': 'user', 'content': 'hi'}], model=f"a{i}") for i in range(4)])
+                finally:
+                    await client.aclose()
+            
+            results = asyncio.run(run_async())
+            self.assertEqual([r['choices'][0]['message']['content'] for r in results], ['a0', 'a1', 'a2', 'a3'])
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+        
+        refused = GrokClient('key', endpoint=endpoint, timeout=2, rate_limiter=RateLimiter('test', max_retries=0))
+        self.assertIsNone(refused.chat([{'role': 'user', 'content': 'hi'}]))
+        refused.close()
+
+class TestLLMCache(unittest.TestCase):
+    """Test the AI response cache."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = LLMCache(Path(self.temp_dir) / 'llm.sqlite', max_mb=1, ttl_days=1, enabled=True)
+    
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_keys_hits_ttl_and_eviction(self):
+        """Keys ignore whitespace only; entries expire and old ones are evicted over budget."""
+        key = make_key("Describe  this\n drawing", 'm', 0.3, 200)
+        self.assertEqual(key, make_key("Describe this drawing ", 'm', 0.3, 200))
+        self.assertNotEqual(key, make_key("Describe this drawing", 'm', 0.2, 200))
+        self.assertNotEqual(key, make_key("Describe this drawing", 'other', 0.3, 200))
+        
+        self.assertIsNone(self.cache.get(key))
+        self.assertTrue(self.cache.put(key, 'A floor plan.', 'm'))
+        self.assertEqual(self.cache.get(key), 'A floor plan.')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+        
+        with mock.patch('llmCache.time.time', return_value=time.time() + 2 * 86400):
+            self.assertIsNone(self.cache.get(key))
+        
+        big = 'x' * (300 * 1024)
+        for i in range(3):
+            self.cache.put(f"k{i}", big)
+            time.sleep(0.01)
+        self.cache.get('k0')  # recently used, survives eviction
+        time.sleep(0.01)
+        self.cache.put('k3', big)
+        self.assertLessEqual(self.cache.stats()['size_bytes'], self.cache.max_bytes)
+        self.assertIsNotNone(self.cache.get('k0'))
+        self.assertIsNone(self.cache.get('k1'))
+        
+        entries = self.cache.stats()['entries']
+        self.assertEqual(self.cache.clear(), entries)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+    
+    def test_put_keeps_a_running_size(self):
+        """Puts under budget neither sum nor sweep the table; expired entries go on the purge timer."""
+        with mock.patch.object(LLMCache, '_stored_size', wraps=LLMCache._stored_size) as summed:
+            for i in range(20):
+                self.assertTrue(self.cache.put(f"k{i}", f"reply {i}"))
+            self.cache.put('k0', 'a longer reply')  # replacing an entry
+            self.assertEqual(summed.call_count, 1)  # once, when the connection opened
+        self.assertEqual(self.cache._total, self.cache.stats()['size_bytes'])
+        
+        later = time.time() + 2 * 86400
+        with mock.patch('llmCache.time.time', return_value=later):
+            self.cache.put('fresh', 'new reply')
+        self.assertEqual(self.cache.stats()['entries'], 1)
+    
+    def test_repeated_prompts_make_no_network_calls(self):
+        """Reprocessing the same PDF text answers the AI calls from the cache."""
+        grok = mock.Mock()
+        grok.chat.return_value = {'choices': [{'message': {'content': '{"title": "PUMP HOUSING"}'}}]}
+        text = "PUMP HOUSING  DWG NO 4711  SCALE 1:2"
+        with mock.patch.object(utils, 'llm_cache', self.cache), \
+             mock.patch.object(utils, 'grok_client', grok), \
+             mock.patch.object(PDF_Analyzer, 'grok_client', grok):
+            first = PDF_Analyzer.extract_specs_with_ai(text, silent=True)
+            second = PDF_Analyzer.extract_specs_with_ai(text, silent=True)
+        self.assertEqual(first, {'title': 'PUMP HOUSING'})
+        self.assertEqual(second, first)
+        self.assertEqual(grok.chat.call_count, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+class TestPDFAnalyzer(unittest.TestCase):
+    """Test the PDF analysis pipeline."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.pdf_path = os.path.join(self.temp_dir, 'bracket.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.4')
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _process(self, replies):
+        """Run process_pdf with AI replies taken in order; returns (result, prompts sent, database call)."""
+        prompts = []
+        
+        def complete(prompt, **kwargs):
+            prompts.append(prompt)
+            return replies[len(prompts) - 1]
+        
+        with mock.patch.object(PDF_Analyzer, 'grok_client', object()), \
+             mock.patch.object(PDF_Analyzer, 'openai_client', None), \
+             mock.patch.object(PDF_Analyzer, 'grok_complete', side_effect=complete), \
+             mock.patch.object(PDF_Analyzer, 'file_exists_in_database', return_value=False), \
+             mock.patch.object(PDF_Analyzer, 'extract_text', return_value='BRACKET DWG NO 12 SCALE 1:1'), \
+             mock.patch.object(PDF_Analyzer, 'add_to_database', return_value=True) as add, \
+             mock.patch.object(PDF_Analyzer, 'classify_pdf', return_value={'label': 'ambiguous', 'score': 0.4}):
+            result = PDF_Analyzer.process_pdf(self.pdf_path, silent=True)
+        return result, prompts, add
+    
+    def test_single_combined_call(self):
+        """One JSON reply classifies, extracts specs and describes the drawing."""
+        reply = '```json\n{"is_drawing": true, "specs": {"title": "BRACKET", "scale": "1:1"}, ' \
+                '"description": "Bracket detail."}\n```'
+        result, prompts, add = self._process([reply])
+        self.assertTrue(result)
+        self.assertEqual(len(prompts), 1)
+        add.assert_called_once_with(self.pdf_path, "Bracket detail.", {'title': 'BRACKET', 'scale': '1:1'},
+                                    silent=True)
+        
+        result, prompts, add = self._process(['{"is_drawing": false}'])
+        self.assertFalse(result)
+        self.assertEqual(len(prompts), 1)
+        add.assert_not_called()
+    
+    def test_invalid_reply_falls_back_to_three_calls(self):
+        """A reply that is not the expected JSON falls back to the step-by-step calls."""
+        result, prompts, add = self._process(['Sure! It is a drawing.', 'Yes', '{"title": "BRACKET"}',
+                                              'Bracket detail.'])
+        self.assertTrue(result)
+        self.assertEqual(len(prompts), 4)
+        add.assert_called_once_with(self.pdf_path, "Bracket detail.", {'title': 'BRACKET'}, silent=True)
+        self.assertIsNone(PDF_Analyzer.parse_drawing_analysis('{"is_drawing": true, "specs": {}}'))
+
+class TestRateLimiter(unittest.TestCase):
+    """Test AI request pacing and retries against a local stand-in server."""
+    
+    def setUp(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        self.statuses = []  # replies to send first, then 200
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+        lock = threading.Lock()
+        test = self
+        
+        class ChatHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                with lock:
+                    test.requests += 1
+                    test.active += 1
+                    test.peak = max(test.peak, test.active)
+                    status = test.statuses.pop(0) if test.statuses else 200
+                time.sleep(0.05)
+                body = json.dumps({'choices': [{'message': {'content': 'ok'}}],
+                                   'usage': {'total_tokens': 10}}).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', '0.3')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with lock:
+                    test.active -= 1
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ChatHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def _client(self, limiter):
+        return GrokClient('key', endpoint=self.endpoint, timeout=5, rate_limiter=limiter)
+    
+    def test_retry_after_and_backoff(self):
+        """A 429 is retried after its Retry-After delay; persistent errors give up after max_retries."""
+        limiter = RateLimiter('test', max_retries=3, backoff_base=0.01)
+        client = self._client(limiter)
+        self.statuses = [429]
+        started = time.monotonic()
+        resp = client.chat([{'role': 'user', 'content': 'hi'}])
+        self.assertEqual(resp['choices'][0]['message']['content'], 'ok')
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        metrics = limiter.metrics()
+        self.assertEqual((metrics['rate_limited'], metrics['retries'], metrics['attempts']), (1, 1, 2))
+        
+        self.statuses = [503] * 10
+        self.requests = 0
+        self.assertIsNone(client.chat([{'role': 'user', 'content': 'hi'}]))
+        self.assertEqual(self.requests, 4)
+        self.assertEqual(limiter.metrics()['failures'], 1)
+        client.close()
+        
+        self.assertEqual(parse_retry_after('2'), 2.0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertAlmostEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+    
+    def test_pacing_and_concurrency(self):
+        """Buckets spread requests evenly and at most max_concurrency are in flight."""
+        import threading
+        
+        bucket = TokenBucket(600, capacity=1)  # 10 a second, no burst
+        waits = [bucket.reserve(1) for _ in range(4)]
+        self.assertEqual(waits[0], 0.0)
+        for expected, wait in zip((0.1, 0.2, 0.3), waits[1:]):
+            self.assertAlmostEqual(wait, expected, delta=0.02)
+        self.assertEqual(TokenBucket(0).reserve(10 ** 6), 0.0)
+        
+        limiter = RateLimiter('test', requests_per_minute=1200, max_concurrency=2)
+        client = self._client(limiter)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.chat([{'role': 'user', 'content': 'hi'}])))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        client.close()
+        self.assertEqual(len([r for r in results if r]), 6)
+        self.assertLessEqual(self.peak, 2)
+        self.assertEqual(limiter.metrics()['peak_active'], 2)
+
+# Labelled PDF text samples (text, first page size in points) for the drawing classifier
+CLASSIFIER_DRAWINGS = [
+    ("""MOUNTING BRACKET
+UNLESS OTHERWISE SPECIFIED DIMENSIONS ARE IN MM
+TOLERANCES: X.X ±0.1  X.XX ±0.05  ANGLES ±0.5°
+4X Ø8.5 THRU  R12  2X M10x1.5  120  85.50  45°
+MATERIAL: AL 6061-T6  FINISH: ANODIZE BLACK
+DRAWN BY: JT  CHECKED: RK  APPROVED: MP  DATE: 2023-04-11
+DWG NO: MB-1042-01  REV B  SHEET 1 OF 1  SCALE 1:2
+THIRD ANGLE PROJECTION  DO NOT SCALE DRAWING""", (1191, 842)),
+    ("""FIRST FLOOR PLAN
+SCALE: 1/4" = 1'-0"
+12'-6" 10'-0" 3'-4 1/2"
+BEDROOM 1  KITCHEN  LIVING ROOM  BATH
+GENERAL NOTES: 1. ALL DIMENSIONS TO FACE OF STUD
+PROJECT: SMITH RESIDENCE  SHEET A-101  DRAWN: KL  DATE: 06/12/22
+ISSUED FOR CONSTRUCTION""", (2592, 1728)),
+    ("""E-201 SINGLE LINE DIAGRAM
+480V MCC-1  400A  3P  TRANSFORMER T1 75KVA
+PANEL LP-1 SCHEDULE  CKT 1 20A  CKT 2 20A
+REVISIONS  REV DESCRIPTION DATE BY
+0 ISSUED FOR BID 01/05/21 JR
+SCALE: NTS  CHECKED BY: AM  ENGINEER: P. SINGH""", (1224, 792)),
+    ("""SECTION A-A
+DETAIL B SCALE 2:1
+Ø25 H7  Ø40  R2 TYP  1.5 x 45° CHAMFER
+BREAK ALL SHARP EDGES  DEBURR
+PART NO 55-2031-00  QTY 4
+BILL OF MATERIALS ITEM NO DESCRIPTION QTY MATERIAL""", None),
+    ("""SHAFT
+100 +0.00/-0.02  Ø20 h6  Ø18  M8  12 mm  30 mm
+DRAWN  CHECKED  TITLE  SCALE 1:1  REV A  DWG NO 7781-004
+A4 PORTRAIT DETAIL SHEET""", (595, 842)),
+    ("""SITE PLAN
+NORTH  PROPERTY LINE 125.00'  SETBACK 25'-0"
+PARKING 24 SPACES  SCALE 1" = 20'
+C-100  CIVIL  REV 2  DATE 2020-09-01  PROJECT NO 19-221""", (3168, 2448)),
+]
+CLASSIFIER_DOCUMENTS = [
+    ("""Dear Mr. Thompson,
+Thank you for your letter of March 3. We have reviewed the proposal and we would like to
+schedule a meeting with your team to discuss the next steps. Please let us know which dates
+work for you. We look forward to hearing from you.
+Sincerely, Anna Miller""", (612, 792)),
+    ("""INVOICE  No. 2023-0412
+Bill to: Acme Corp, 12 Main Street
+Item  Qty  Unit price  Amount
+Consulting services  10  150.00  1,500.00
+Subtotal 1,500.00  Tax 120.00  Total due 1,620.00
+Payment is due within 30 days of the invoice date.""", (612, 792)),
+    ("""Quarterly Report
+In the third quarter, revenue grew by 12% compared to the same period last year. The growth
+was driven by strong demand in the construction segment and by the launch of two new
+products. Operating costs remained stable, and the company expects that the trend will
+continue in the coming months as new contracts are signed.""", (595, 842)),
+    ("""Meeting minutes - project kickoff
+Attendees: J. Smith, R. Lee, M. Gomez
+1. The team reviewed the schedule and agreed that the design phase will end in May.
+2. R. Lee will send the updated budget to all members by Friday.
+3. The next meeting is on the 14th at 10:00 in room 3.""", (612, 792)),
+    ("""Installation Manual
+Before you begin, read all of the instructions in this manual. Make sure that the power is
+turned off at the breaker. Remove the cover by loosening the four screws, and then connect
+the wires as shown in the figure. If you have any questions, contact our support team.""", (612, 792)),
+    ("""Curriculum Vitae
+Jane Doe - Mechanical Engineer
+Experience: 2015-2021 Design engineer at Example Ltd., where I was responsible for the
+development of new products and for the coordination with suppliers.
+Education: MSc in Mechanical Engineering, 2014. Skills: AutoCAD, SolidWorks, project management.""", (595, 842)),
+]
+CLASSIFIER_AMBIGUOUS = [
+    ("""Product Data Sheet - Ball Valve BV-200
+The BV-200 is a full port ball valve for water and oil. Body material: brass. Sizes 1/2" to 2".
+Dimensions: A 65 mm, B 48 mm, C 90 mm. Max pressure 40 bar. Weight 0.8 kg.
+Please see the installation manual for details.""", (595, 842)),
+]
+# Not used when the thresholds and weights were tuned, so they check that the classifier generalizes
+CLASSIFIER_HELD_OUT = [
+    ("""P&ID - COOLING WATER SYSTEM
+P-101A/B CW PUMP 250 m3/h  TK-201 EXPANSION TANK
+6"-CW-1001-A1  4"-CW-1002-A1  FV-1003  PT-1004  TIC-1005
+LEGEND: GATE VALVE  CHECK VALVE  CONTROL VALVE
+DRG NO: 4410-PID-003  REV C  SHEET 3 OF 7  NOT TO SCALE
+DESIGNED BY: HN  CHECKED BY: OB  APPROVED BY: SV  ISSUED FOR CONSTRUCTION""", (1684, 1191), True),
+    ("""WELDMENT - BASE FRAME
+ALL WELDS 6 mm FILLET UNLESS NOTED  HSS 100x100x6  PL 12 x 200 x 300
+1800  950  4X Ø18 HOLES  2X 45°
+PAINT: PRIMER + 2 COATS ENAMEL  WEIGHT: 142 kg
+ITEM NO  PART NUMBER  DESCRIPTION  QTY
+DWG. NO. BF-2200-00  SCALE 1:10  SHEET 1 OF 2""", (1191, 842), True),
+    ("""Purchase Order Terms and Conditions
+1. Acceptance. This order becomes a binding contract when the seller accepts it in writing or
+begins performance. 2. Delivery. Time is of the essence, and the buyer may cancel any part of
+this order that is not delivered on the agreed date. 3. Warranty. The seller warrants that all
+goods are free from defects in material and workmanship for a period of one year.""", (612, 792), False),
+    ("""Safety Data Sheet
+Section 1: Identification. Product name: Industrial Degreaser.
+Section 2: Hazard identification. Causes skin irritation. Keep away from heat and open flames.
+Section 4: First aid measures. If on skin, wash with plenty of water. If you feel unwell, call a
+poison center or a doctor.""", (595, 842), False),
+]
+
+class TestDrawingClassifier(unittest.TestCase):
+    """Test the local drawing pre-classifier against a labelled sample."""
+    
+    def test_confusion_matrix(self):
+        """Clear drawings and documents are decided locally; the in-between sample is escalated."""
+        samples = ([(text, size, True) for text, size in CLASSIFIER_DRAWINGS] +
+                   [(text, size, False) for text, size in CLASSIFIER_DOCUMENTS + CLASSIFIER_AMBIGUOUS])
+        matrix = confusion_matrix(samples)
+        self.assertEqual((matrix['true_positive'], matrix['true_negative']), (6, 6))
+        self.assertEqual((matrix['false_positive'], matrix['false_negative']), (0, 0))
+        self.assertEqual(matrix['escalated_negative'] + matrix['escalated_positive'], 1)
+        self.assertEqual(classify_pdf_text('')['label'], 'not_drawing')
+    
+    def test_held_out_samples(self):
+        """Drawings and documents the thresholds were not tuned on are decided correctly."""
+        for text, size, is_drawing in CLASSIFIER_HELD_OUT:
+            self.assertEqual(classify_pdf_text(text, size)['label'], 'drawing' if is_drawing else 'not_drawing',
+                             text.splitlines()[0])
+        matrix = confusion_matrix(CLASSIFIER_HELD_OUT)
+        self.assertEqual((matrix['precision'], matrix['recall'], matrix['accuracy']), (1.0, 1.0, 1.0))
+    
+    def test_only_ambiguous_pdfs_reach_the_ai(self):
+        """find_pdf asks the AI about ambiguous PDFs only; process_pdf rejects clear non-drawings locally."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            texts = {}
+            for name, (text, _) in zip(('drawing', 'letter', 'datasheet'),
+                                       (CLASSIFIER_DRAWINGS[0], CLASSIFIER_DOCUMENTS[0], CLASSIFIER_AMBIGUOUS[0])):
+                path = os.path.join(temp_dir, name + '.pdf')
+                with open(path, 'wb') as f:
+                    f.write(b'%PDF-1.4')
+                texts[path] = text
+            
+            with mock.patch.object(PDF_Analyzer, 'file_exists_in_database', return_value=False), \
+                 mock.patch.object(PDF_Analyzer, 'extract_text', side_effect=lambda path, silent: texts[path]), \
+                 mock.patch.object(PDF_Analyzer, 'ai_is_autocad_drawing', return_value=True) as ask, \
+                 mock.patch.object(PDF_Analyzer, 'analyze_drawing_with_ai') as analyze:
+                found = PDF_Analyzer.find_pdf(root=temp_dir)
+                self.assertEqual(sorted(os.path.basename(p) for p in found), ['datasheet.pdf', 'drawing.pdf'])
+                self.assertEqual(ask.call_count, 1)
+                
+                self.assertFalse(PDF_Analyzer.process_pdf(os.path.join(temp_dir, 'letter.pdf'), silent=True))
+                analyze.assert_not_called()
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
 class TestConfiguration(unittest.TestCase):
     """Test configuration validation."""
@@ -179,8 +1434,16 @@ def run_test_suite():
     
     # Add all test classes
     suite.addTests(loader.loadTestsFromTestCase(TestDWGProcessor))
+    suite.addTests(loader.loadTestsFromTestCase(TestConversionService))
+    suite.addTests(loader.loadTestsFromTestCase(TestEntityStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestStreamingSummary))
+    suite.addTests(loader.loadTestsFromTestCase(TestSpatialIndex))
     suite.addTests(loader.loadTestsFromTestCase(TestSemanticMemory))
     suite.addTests(loader.loadTestsFromTestCase(TestUtils))
+    suite.addTests(loader.loadTestsFromTestCase(TestLLMCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestPDFAnalyzer))
+    suite.addTests(loader.loadTestsFromTestCase(TestRateLimiter))
+    suite.addTests(loader.loadTestsFromTestCase(TestDrawingClassifier))
     suite.addTests(loader.loadTestsFromTestCase(TestConfiguration))
     suite.addTests(loader.loadTestsFromTestCase(TestEndToEndWorkflow))
     
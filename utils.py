@@ -10,36 +10,223 @@ import hashlib
 import httpx
 import time
 import re
+import asyncio
+import threading
+import weakref
 from colorama import Fore, Style
+import openai
 from openai import OpenAI
 
+from config import (
+    GROK_ENDPOINT, GROK_MODEL, GROK_TIMEOUT, GROK_HTTP2,
+    GROK_MAX_CONNECTIONS, GROK_MAX_KEEPALIVE, GROK_KEEPALIVE_EXPIRY,
+    OPENAI_MODEL, DEFAULT_TEMPERATURE, DEFAULT_MAX_TOKENS
+)
+from llmCache import llm_cache, make_key
+from rateLimiter import RetryableError, estimate_tokens, get_rate_limiter, parse_retry_after
+
+try:
+    import h2  # HTTP/2 support of httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GROK_API_KEY = os.getenv("GROK_API_KEY")
 
-openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# Retries are left to the shared rate limiter
+openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0) if OPENAI_API_KEY else None
+
+# HTTP statuses worth retrying: rate limited, or the service is briefly unavailable
+RETRY_STATUSES = (429, 500, 502, 503, 504)
 
 class GrokClient:
-    def __init__(self, api_key):
+    """
+    Grok chat completions over pooled, keep-alive HTTP connections.
+
+    One httpx.Client serves chat() from any thread and one httpx.AsyncClient per
+    event loop serves achat(), so repeated calls reuse open connections instead of
+    paying a TCP and TLS handshake each. Requests are paced and retried by the
+    shared 'grok' RateLimiter. Both return the response JSON, or None when the
+    request fails for good or the response is not JSON.
+    """
+
+    def __init__(self, api_key, endpoint=GROK_ENDPOINT, timeout=GROK_TIMEOUT, http2=GROK_HTTP2,
+                 max_connections=GROK_MAX_CONNECTIONS, max_keepalive_connections=GROK_MAX_KEEPALIVE,
+                 keepalive_expiry=GROK_KEEPALIVE_EXPIRY, rate_limiter=None):
         self.api_key = api_key
-        self.endpoint = "https://api.x.ai/v1/chat/completions"
+        self.endpoint = endpoint
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.timeout = timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry)
+        self._lock = threading.Lock()
+        self._client = None
+        self._client_pid = None
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncClient
+        self.rate_limiter = rate_limiter or get_rate_limiter('grok')
 
-    def chat(self, messages, model="grok-3-fast-beta"):
+    def _client_options(self):
+        return {"headers": self.headers, "timeout": self.timeout, "limits": self.limits, "http2": self.http2}
+
+    @property
+    def client(self):
+        """The shared httpx.Client (a forked process gets its own, the sockets are not shareable)."""
+        with self._lock:
+            if self._client is None or self._client_pid != os.getpid():
+                self._client = httpx.Client(**self._client_options())
+                self._client_pid = os.getpid()
+            return self._client
+
+    def async_client(self):
+        """The httpx.AsyncClient of the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = httpx.AsyncClient(**self._client_options())
+        return client
+
+    @staticmethod
+    def _payload(messages, model, temperature, max_tokens):
         payload = {"model": model, "messages": messages}
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        return payload
+
+    @staticmethod
+    def _estimate_tokens(messages, max_tokens):
+        prompt = "".join(str(message.get("content", "")) for message in messages)
+        return estimate_tokens(prompt, max_tokens or DEFAULT_MAX_TOKENS)
+
+    @staticmethod
+    def _check(response):
+        """Raise RetryableError for a status worth retrying, httpx.HTTPStatusError for other errors."""
+        if response.status_code in RETRY_STATUSES:
+            raise RetryableError(f"Grok returned HTTP {response.status_code}",
+                                 retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                                 rate_limited=response.status_code == 429)
+        response.raise_for_status()
+        return response.json()
+
+    def _record_usage(self, tokens, data):
+        usage = data.get("usage") if isinstance(data, dict) else None
+        self.rate_limiter.record_usage(tokens, usage.get("total_tokens") if isinstance(usage, dict) else None)
+
+    def chat(self, messages, model=GROK_MODEL, temperature=None, max_tokens=None):
+        payload = self._payload(messages, model, temperature, max_tokens)
+        tokens = self._estimate_tokens(messages, max_tokens)
+
+        def send():
+            try:
+                response = self.client.post(self.endpoint, json=payload)
+            except httpx.TransportError as e:
+                raise RetryableError(str(e)) from e
+            return self._check(response)
+
+        try:
+            data = self.rate_limiter.call(send, tokens)
+        except (RetryableError, httpx.HTTPError, ValueError):
+            return None
+        self._record_usage(tokens, data)
+        return data
+
+    async def achat(self, messages, model=GROK_MODEL, temperature=None, max_tokens=None):
+        """Async chat(), so several AI calls can be in flight at once."""
+        payload = self._payload(messages, model, temperature, max_tokens)
+        tokens = self._estimate_tokens(messages, max_tokens)
+
+        async def send():
+            try:
+                response = await self.async_client().post(self.endpoint, json=payload)
+            except httpx.TransportError as e:
+                raise RetryableError(str(e)) from e
+            return self._check(response)
+
         try:
-            response = httpx.post(self.endpoint, headers=self.headers, json=payload, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except:
+            data = await self.rate_limiter.acall(send, tokens)
+        except (RetryableError, httpx.HTTPError, ValueError):
             return None
+        self._record_usage(tokens, data)
+        return data
+
+    def close(self):
+        """Close the pooled connections of chat()."""
+        with self._lock:
+            if self._client is not None and self._client_pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        """Close the pooled connections of achat() on the running event loop."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
 
 grok_client = GrokClient(GROK_API_KEY) if GROK_API_KEY else None
 
+def grok_complete(prompt, model=GROK_MODEL, temperature=None, max_tokens=None):
+    """
+    Grok's answer to a single-message prompt, from llm_cache when the same request
+    was answered before. Returns None if Grok is unavailable or the call failed.
+    """
+    key = make_key(prompt, model, temperature, max_tokens)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+    if not grok_client:
+        return None
+    resp = grok_client.chat([{"role": "user", "content": prompt}], model=model,
+                            temperature=temperature, max_tokens=max_tokens)
+    if not (resp and resp.get("choices")):
+        return None
+    result = (resp["choices"][0]["message"]["content"] or "").strip()
+    llm_cache.put(key, result, model)
+    return result
+
+def openai_complete(prompt, model=OPENAI_MODEL, temperature=DEFAULT_TEMPERATURE, max_tokens=DEFAULT_MAX_TOKENS):
+    """
+    OpenAI's answer to a single-message prompt, from llm_cache when the same request
+    was answered before. Returns None if OpenAI is not configured; API errors, and
+    RetryableError once the rate limiter gives up, propagate.
+    """
+    key = make_key(prompt, model, temperature, max_tokens)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+    if not openai_client:
+        return None
+    limiter = get_rate_limiter('openai')
+    tokens = estimate_tokens(prompt, max_tokens)
+
+    def send():
+        try:
+            return openai_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        except openai.RateLimitError as e:
+            raise RetryableError(str(e), retry_after=parse_retry_after(e.response.headers.get("retry-after")),
+                                 rate_limited=True) from e
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            raise RetryableError(str(e)) from e
+
+    resp = limiter.call(send, tokens)
+    limiter.record_usage(tokens, resp.usage.total_tokens if resp.usage else None)
+    result = (resp.choices[0].message.content or "").strip()
+    llm_cache.put(key, result, model)
+    return result
+
 CACHE_FILE = os.path.join(os.path.dirname(__file__), "description_cache.json")
 
 def load_cache():
@@ -105,16 +292,13 @@ def clean_specs(specs):
     return cleaned
 
 def chat_with_ai(prompt, model="grok-3-fast-beta", temperature=0.4, max_tokens=300, silent=False):
-    """Try Grok first, then OpenAI."""
-    messages = [{"role": "user", "content": prompt}]
-    
+    """Try Grok first, then OpenAI (answers come from llm_cache when possible)."""
     if grok_client:
         try:
             if not silent:
                 print(Fore.BLUE + "Using Grok..." + Style.RESET_ALL)
-            resp = grok_client.chat(messages, model=model)
-            if resp and "choices" in resp and len(resp["choices"]) > 0:
-                result = resp["choices"][0]["message"]["content"].strip()
+            result = grok_complete(prompt, model=model)
+            if result is not None:
                 if not silent:
                     print(Fore.GREEN + "Grok responded" + Style.RESET_ALL)
                 return result
@@ -127,13 +311,7 @@ def chat_with_ai(prompt, model="grok-3-fast-beta", temperature=0.4, max_tokens=3
         try:
             if not silent:
                 print(Fore.BLUE + "Using OpenAI..." + Style.RESET_ALL)
-            resp = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            result = resp.choices[0].message.content.strip()
+            result = openai_complete(prompt, model="gpt-4o-mini", temperature=temperature, max_tokens=max_tokens)
             if not silent:
                 print(Fore.GREEN + "OpenAI responded" + Style.RESET_ALL)
             return result